@@ -0,0 +1,145 @@
+'''
+Loopback benchmark for remote process watching (see remote.py): a hub, on a scan worker
+thread as in the notifier, and several agents on this machine, each with a synthetic
+process table (benchmarks/fake_psutil.py), connected over 127.0.0.1. Every step churns
+the agents' tables and sends the deltas; the agents send their checksums every
+--checksum-every steps. Reports the bytes sent per step, which should follow the churn
+and not the table size, and checks that the hub's index matches every agent's table.
+
+--lose-every N withholds one delta of every N steps from the hub, as a bug could, so the
+next checksum doesn't match and the hub has to ask for a snapshot.
+
+Examples:
+    python benchmarks/bench_remote.py
+    python benchmarks/bench_remote.py --agents 5 --processes 1000,100000 --changes 20 --steps 100
+    python benchmarks/bench_remote.py --lose-every 7   # exit status 1 if the hub doesn't catch up
+'''
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from remote import Agent, RemoteHub  # noqa: E402
+from scan_worker import ScanWorker  # noqa: E402
+from stats import Stats  # noqa: E402
+from fake_psutil import FakePsutil  # noqa: E402
+
+SETTLE_TIMEOUT_SECONDS = 10
+
+
+def int_list(text):
+    return [int(value) for value in text.split(",")]
+
+
+def hub_matches(hub, tracker, agents):
+    """
+    Checks if the hub's copy of every agent's table, and its index, match the agents' tables.
+    """
+    hosts = hub.remote_hosts
+    for agent in agents:
+        host = hosts.get(agent.host_name)
+        if host is None or host.processes != agent.table:
+            return False
+    return len(tracker.remote) == sum(len(agent.table) for agent in agents)
+
+
+def wait_for(condition, agents):
+    """
+    Waits until the condition holds, answering the hub's resync requests meanwhile. Returns False on timeout.
+    """
+    deadline = time.monotonic() + SETTLE_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        for agent in agents:
+            if agent.selector.select(0):
+                agent.receive()
+        if condition():
+            return True
+        time.sleep(0.001)
+    return False
+
+
+def run_case(agent_count, process_count, changes, steps, checksum_every, lose_every):
+    stats = Stats()
+    hub = RemoteHub(("127.0.0.1", 0), stats=stats)
+    hub.listen()
+    worker = ScanWorker(1, use_process_events=False, backend=FakePsutil(0), hub=hub)
+    worker.start()
+    try:
+        while worker.tracker is None:
+            time.sleep(0.001)
+        address = hub.listener.getsockname()[:2]
+        agents = []
+        for i in range(agent_count):
+            backend = FakePsutil(process_count, churn=(changes // 2 + 0.5) / process_count, seed=i)
+            agent = Agent(address, f"host{i}", backend=backend)
+            agent.scan()
+            agent.connect()
+            agents.append(agent)
+        connected = wait_for(lambda: hub_matches(hub, worker.tracker, agents), agents)
+        snapshot_bytes = sum(agent.bytes_sent for agent in agents) / agent_count
+
+        sent_before = sum(agent.bytes_sent for agent in agents)
+        changed = 0
+        started = time.perf_counter()
+        for step in range(1, steps + 1):
+            for agent in agents:
+                agent.tracker.backend.step()
+                if lose_every and step % lose_every == 0:
+                    sock, agent.sock = agent.sock, None # The delta isn't sent
+                    changed += len(agent.scan())
+                    agent.sock = sock
+                else:
+                    changed += len(agent.scan())
+                if step % checksum_every == 0:
+                    agent.send_checksum()
+            if step % checksum_every == 0:
+                wait_for(lambda: hub_matches(hub, worker.tracker, agents), agents)
+        consistent = wait_for(lambda: hub_matches(hub, worker.tracker, agents), agents)
+        elapsed = time.perf_counter() - started
+        sent = sum(agent.bytes_sent for agent in agents) - sent_before
+        for agent in agents:
+            agent.disconnect()
+    finally:
+        worker.stop()
+        worker.join()
+
+    return {
+        "agents": agent_count,
+        "processes": process_count,
+        "changes_per_step": changed / steps / agent_count,
+        "snapshot_bytes": snapshot_bytes,
+        "bytes_per_step": sent / steps / agent_count,
+        "bytes_per_change": sent / changed if changed else 0.0,
+        "steps_per_second": steps / elapsed,
+        "resyncs": stats.counters["remote_resyncs_total"],
+        "consistent": connected and consistent,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", type=int, default=3, help="agents (default: %(default)s)")
+    parser.add_argument("--processes", type=int_list, default=[100, 1000, 10000], help="processes per agent (comma separated)")
+    parser.add_argument("--changes", type=int_list, default=[0, 10], help="process starts and exits per agent and step (comma separated)")
+    parser.add_argument("--steps", type=int, default=50, help="steps per case (default: %(default)s)")
+    parser.add_argument("--checksum-every", type=int, default=10, help="steps between checksums (default: %(default)s)")
+    parser.add_argument("--lose-every", type=int, default=0, help="withhold one delta every N steps (default: never)")
+    args = parser.parse_args(argv)
+
+    print(f"{'agents':>6} {'procs':>7} {'chg/step':>8} | {'snapshot B':>10} {'B/step':>8} {'B/change':>8} | {'steps/s':>8} {'resyncs':>7} {'match':>5}")
+    failed = False
+    for process_count in args.processes:
+        for changes in args.changes:
+            result = run_case(args.agents, process_count, changes, args.steps, args.checksum_every, args.lose_every)
+            print(f"{result['agents']:>6} {result['processes']:>7} {result['changes_per_step']:>8.1f} | {result['snapshot_bytes']:>10.0f} "
+                  f"{result['bytes_per_step']:>8.1f} {result['bytes_per_change']:>8.1f} | {result['steps_per_second']:>8.0f} "
+                  f"{result['resyncs']:>7} {'yes' if result['consistent'] else 'NO':>5}")
+            failed = failed or not result["consistent"]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
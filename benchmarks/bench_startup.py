@@ -0,0 +1,206 @@
+'''
+Startup benchmark: launches the notifier in fresh interpreters and measures, from the
+moment each process is spawned, how long until
+- the modules are imported
+- the window is built (its widgets created and the timers loaded)
+- the window is first painted (the first Expose of the main window, once drawn)
+- the scan worker has published its first process scan
+- the engine has applied that scan (the timers know which processes are running)
+
+The real psutil and the real process table are used. The window needs a display; without
+one (or with --mock-tk), the window is started against a stubbed Tk instead: a bare Tcl
+interpreter in which every Tk command does nothing. All of the window's startup code runs,
+on a real Tcl event loop, but nothing is drawn, so there is no paint to measure. With
+--headless, the headless runner is measured.
+The "Timers loaded" dialog is suppressed, so it doesn't wait for a click.
+
+Examples:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --mock-tk   # the window's startup, without a display
+    python benchmarks/bench_startup.py --runs 20 --timers 1000 --headless
+    python benchmarks/bench_startup.py --max-first-paint-ms 300   # for CI
+'''
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MILESTONES = ("imported", "window_built", "first_paint", "first_scan", "scan_applied")
+CHILD_TIMEOUT_SECONDS = 30
+MODE_FLAGS = {"window": [], "mock-tk": ["--mock-tk"], "headless": ["--headless"]}
+
+
+def has_display():
+    return sys.platform in ("win32", "darwin") or bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+
+def write_timers(path, count):
+    with open(path, "w") as f:
+        for i in range(count):
+            f.write(f"bench{i % 50}.exe,{30 + i % 30},Timer {i},True\n")
+
+
+def stub_tk():
+    """
+    Makes tkinter.Tk create a bare Tcl interpreter, without Tk, in which every unknown
+    command (that is, every Tk command) does nothing and returns 0.
+    """
+    import tkinter
+    tk_init = tkinter.Tk.__init__
+    def init(self, *args, **kwargs):
+        tk_init(self, useTk=False)
+        self.tk.eval("proc unknown args { return 0 }")
+    tkinter.Tk.__init__ = init
+
+
+def child_gui(timers_file, times, mock_tk=False):
+    if mock_tk:
+        stub_tk()
+    import gui
+    times["imported"] = time.monotonic()
+    gui.messagebox.showinfo = gui.messagebox.showwarning = lambda *args, **kwargs: None
+    app = gui.ProcessMonitorApp(timers_file, watch_timers_file=False)
+    times["window_built"] = time.monotonic()
+
+    if mock_tk:
+        times["first_paint"] = None # Nothing is drawn
+    else:
+        def on_expose(event):
+            if event.widget is app and "first_paint" not in times:
+                app.update_idletasks()
+                times["first_paint"] = time.monotonic()
+        app.bind("<Expose>", on_expose, add="+")
+    watch_engine(app.engine, times)
+
+    def close():
+        app.on_close()
+        app.quit() # Ends the mocked loop, which has no window to wait for
+    def check():
+        if len(times) == len(MILESTONES):
+            close()
+        else:
+            app.after(5, check)
+    app.after(5, check)
+    app.after(CHILD_TIMEOUT_SECONDS * 1000, close)
+    # Without Tk there are no windows, so keep looping until quit() rather than while one is open
+    app.tk.mainloop(-1) if mock_tk else app.mainloop()
+
+
+def child_headless(timers_file, times):
+    import headless
+    from engine import TimerEngine
+    times["imported"] = time.monotonic()
+    times["window_built"] = times["first_paint"] = None
+    loop = headless.HeadlessLoop()
+    engine = TimerEngine(loop, lambda timer, pid=None: None, timers_file, watch_timers_file=False)
+    engine.load_timers()
+    watch_engine(engine, times)
+
+    def check():
+        if len(times) == len(MILESTONES):
+            loop.stop()
+        else:
+            loop.call_later(0.005, check)
+    loop.call_later(0.005, check)
+    loop.call_later(CHILD_TIMEOUT_SECONDS, loop.stop)
+    engine.start()
+    loop.run()
+    engine.stop()
+
+
+def watch_engine(engine, times):
+    """
+    Records when the scan worker publishes its first result, and when the engine applies it.
+    """
+    worker = engine.scan_worker
+    publish = worker.publish
+    def first_publish(*args):
+        times.setdefault("first_scan", time.monotonic())
+        worker.publish = publish
+        publish(*args)
+    worker.publish = first_publish
+
+    def on_tick():
+        if "scan_applied" not in times and engine.process_snapshot.pids_by_name:
+            times["scan_applied"] = time.monotonic()
+    engine.tick_listeners.append(on_tick)
+
+
+def run_child(args):
+    sys.path.insert(0, ROOT)
+    times = {}
+    if args.headless:
+        child_headless(args.timers_file, times)
+    else:
+        child_gui(args.timers_file, times, args.mock_tk)
+    print(json.dumps(times))
+    return 0
+
+
+def run_once(timers_file, mode):
+    """
+    Starts one notifier process and returns the milliseconds from its spawn to each milestone.
+    """
+    command = [sys.executable, os.path.abspath(__file__), "--child", timers_file] + MODE_FLAGS[mode]
+    spawned = time.monotonic()
+    output = subprocess.run(command, capture_output=True, text=True, timeout=CHILD_TIMEOUT_SECONDS * 2, cwd=os.path.dirname(timers_file))
+    if output.returncode != 0:
+        raise RuntimeError(f"the notifier failed to start:\n{output.stderr}")
+    times = json.loads(output.stdout.strip().splitlines()[-1])
+    return {milestone: None if times.get(milestone) is None else (times[milestone] - spawned) * 1000 for milestone in MILESTONES}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="launches to measure (default: %(default)s)")
+    parser.add_argument("--timers", type=int, default=100, help="timers in the timers file (default: %(default)s)")
+    parser.add_argument("--headless", action="store_true", help="measure the headless runner")
+    parser.add_argument("--mock-tk", action="store_true", help="measure the window against a stubbed Tk, nothing drawn (the default without a display)")
+    parser.add_argument("--json", metavar="FILE", help="also append the result as a JSON line to FILE")
+    parser.add_argument("--max-first-paint-ms", type=float, help="exit with status 1 if the median time to first paint is above this")
+    parser.add_argument("--max-first-scan-ms", type=float, help="exit with status 1 if the median time to the first scan is above this")
+    parser.add_argument("--child", metavar="TIMERS_FILE", dest="timers_file", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.timers_file is not None:
+        return run_child(args)
+    if args.headless:
+        mode = "headless"
+    elif args.mock_tk or not has_display():
+        mode = "mock-tk"
+    else:
+        mode = "window"
+
+    with tempfile.TemporaryDirectory() as workdir:
+        timers_file = os.path.join(workdir, "timers.txt")
+        write_timers(timers_file, args.timers)
+        runs = [run_once(timers_file, mode) for _ in range(args.runs)]
+
+    print(f"{mode}, {args.timers} timers, {args.runs} runs (ms from spawn)")
+    print(f"{'milestone':>13} | {'median':>8} {'min':>8} {'max':>8}")
+    result = {"mode": mode, "timers": args.timers, "runs": args.runs, "ms": {}}
+    for milestone in MILESTONES:
+        values = [run[milestone] for run in runs if run[milestone] is not None]
+        if not values:
+            continue
+        result["ms"][milestone] = {"median": statistics.median(values), "min": min(values), "max": max(values)}
+        print(f"{milestone:>13} | {statistics.median(values):8.1f} {min(values):8.1f} {max(values):8.1f}")
+    if args.json:
+        with open(args.json, "a") as f:
+            f.write(json.dumps(result) + "\n")
+
+    failed = False
+    for milestone, limit in (("first_paint", args.max_first_paint_ms), ("first_scan", args.max_first_scan_ms)):
+        if limit is not None and milestone in result["ms"] and result["ms"][milestone]["median"] > limit:
+            print(f"The median {milestone} ({result['ms'][milestone]['median']:.1f} ms) is above {limit:g} ms", file=sys.stderr)
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,252 @@
+'''
+Synthetic-load benchmark for the engine's tick: process scan, applying the scan results
+(and firing due timers), and rendering the timers listbox. Also reports the memory the
+engine keeps per loaded timer.
+
+Runs headless: psutil is replaced by benchmarks/fake_psutil.py, and the listbox by a fake
+one backed by a real Tcl interpreter (no display needed), so the Tcl calls are real.
+
+Examples:
+    python benchmarks/bench_tick.py
+    python benchmarks/bench_tick.py --processes 100,50000 --timers 1,10000 --churn 0.05 --patterns shared
+    python benchmarks/bench_tick.py --max-p99-ms 50 --json results.jsonl   # for CI
+'''
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tkinter
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import TimerEngine  # noqa: E402
+from timer_view import TimerListView, timer_row_text  # noqa: E402
+from fake_psutil import FakePsutil  # noqa: E402
+
+SHARED_NAME = "RobloxPlayerBeta.exe"
+VISIBLE_ROWS = 20
+ROW_PIXELS = 16
+
+
+class BenchLoop:
+    """
+    An engine loop whose clock only moves when the benchmark says so. Callbacks are
+    never run by the loop itself; the benchmark drives the engine directly.
+    """
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def call_later(self, delay, callback):
+        return callback
+
+    def cancel(self, handle):
+        pass
+
+
+class CountingTk:
+    """
+    Wraps a Tcl interpreter and counts the calls made through it.
+    """
+    def __init__(self, tkapp):
+        self.tkapp = tkapp
+        self.calls = 0
+
+    def call(self, *args):
+        self.calls += 1
+        return self.tkapp.call(*args)
+
+    def __getattr__(self, name):
+        return getattr(self.tkapp, name)
+
+
+class FakeListbox:
+    """
+    Just enough of tk.Listbox for TimerListView, storing the rows in a real Tcl list variable.
+    """
+    def __init__(self, visible_rows=VISIBLE_ROWS):
+        self.interp = tkinter.Tcl()
+        self.tk = CountingTk(self.interp.tk)
+        self.visible_rows = visible_rows
+        self.var = None
+
+    def _root(self):
+        return self
+
+    def config(self, listvariable=None, **options):
+        self.var = str(listvariable)
+
+    def bind(self, *args, **kwargs):
+        pass
+
+    def after_idle(self, callback):
+        pass
+
+    def winfo_height(self):
+        return self.visible_rows * ROW_PIXELS
+
+    def nearest(self, y):
+        size = int(self.tk.call("llength", self.tk.call("set", self.var)))
+        return min(y // ROW_PIXELS, max(size - 1, 0))
+
+    def delete(self, first, last=None):
+        rows = self.tk.call("set", self.var)
+        self.tk.call("set", self.var, self.tk.call("lreplace", rows, first, "end"))
+
+    def insert(self, index, *items):
+        self.tk.call("lappend", self.var, *items)
+
+
+def timer_names(pattern, timer_count):
+    """
+    Returns (the process name of each timer, the names to put in the process table, their weights).
+    """
+    if pattern == "shared":
+        return [SHARED_NAME] * timer_count, [SHARED_NAME], [0.01]
+    unique = [f"app{i}.exe" for i in range(timer_count)]
+    if pattern == "unique":
+        return unique, unique, [0.5 / timer_count] * timer_count
+    if pattern == "mixed":
+        names = [SHARED_NAME if i % 2 else unique[i] for i in range(timer_count)]
+        table_names = unique[::2] + [SHARED_NAME]
+        return names, table_names, [0.25 / len(unique[::2])] * len(unique[::2]) + [0.01]
+    raise ValueError(f"unknown pattern: {pattern}")
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    def pick(fraction):
+        return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+    return {"p50": pick(0.50), "p90": pick(0.90), "p99": pick(0.99), "max": ordered[-1], "mean": statistics.fmean(ordered)}
+
+
+def run_case(process_count, timer_count, churn, pattern, ticks, tick_seconds, interval_minutes, workdir):
+    names, table_names, weights = timer_names(pattern, timer_count)
+    backend = FakePsutil(process_count, table_names, weights, churn)
+
+    timers_file = os.path.join(workdir, f"timers_{process_count}_{timer_count}_{pattern}.txt")
+    with open(timers_file, "w") as f:
+        for i, name in enumerate(names):
+            f.write(f"{name},{interval_minutes},Timer {i},True\n")
+
+    loop = BenchLoop()
+    firings = []
+    engine = TimerEngine(loop, lambda timer, pid=None: firings.append(timer), timers_file, use_process_events=False, process_backend=backend)
+    # Memory the engine keeps per loaded timer: the timers and everything indexing them
+    tracemalloc.start()
+    engine.load_timers()
+    bytes_per_timer = tracemalloc.get_traced_memory()[0] / timer_count
+    tracemalloc.stop()
+    listbox = FakeListbox()
+    view = TimerListView(listbox, lambda i, timer: timer_row_text(engine, i, timer))
+
+    def tick():
+        backend.step(tick_seconds)
+        loop.now += tick_seconds
+        started = time.perf_counter()
+        engine.scan_worker.scan()
+        scanned = time.perf_counter()
+        engine.update_watched_names()
+        engine.drain_scan_results()
+        deadline = engine.scheduler.next_deadline()
+        if deadline is not None and deadline <= loop.now:
+            engine.fire_due_timers()
+        applied = time.perf_counter()
+        view.render(engine.timers)
+        rendered = time.perf_counter()
+        return scanned - started, applied - scanned, rendered - applied
+
+    tick()  # The first scan sees every process as new; don't count it
+
+    samples = {"scan": [], "apply": [], "render": [], "total": []}
+    psutil_calls = []
+    tcl_calls = []
+    for _ in range(ticks):
+        calls_before = sum(backend.calls.values())
+        tcl_before = listbox.tk.calls
+        scan, apply, render = tick()
+        samples["scan"].append(scan * 1000)
+        samples["apply"].append(apply * 1000)
+        samples["render"].append(render * 1000)
+        samples["total"].append((scan + apply + render) * 1000)
+        psutil_calls.append(sum(backend.calls.values()) - calls_before)
+        tcl_calls.append(listbox.tk.calls - tcl_before)
+
+    # Allocations are measured in a separate pass, tracemalloc skews the timings
+    allocated = []
+    tracemalloc.start()
+    for _ in range(min(ticks, 20)):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        tick()
+        allocated.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+
+    engine.state_store.close()
+    return {
+        "processes": process_count,
+        "timers": timer_count,
+        "churn": churn,
+        "pattern": pattern,
+        "ticks": ticks,
+        "latency_ms": {phase: percentiles(values) for phase, values in samples.items()},
+        "psutil_calls_per_tick": statistics.fmean(psutil_calls),
+        "tcl_calls_per_tick": statistics.fmean(tcl_calls),
+        "peak_alloc_kib_per_tick": statistics.fmean(allocated) / 1024,
+        "bytes_per_timer": bytes_per_timer,
+        "firings": len(firings),
+    }
+
+
+def print_result(result):
+    total = result["latency_ms"]["total"]
+    print(f"{result['processes']:>7} {result['timers']:>6} {result['pattern']:>7} {result['churn']:>6.3f} | "
+          f"{total['p50']:8.3f} {total['p90']:8.3f} {total['p99']:8.3f} {total['max']:8.3f} | "
+          f"{result['latency_ms']['scan']['p50']:7.3f} {result['latency_ms']['apply']['p50']:7.3f} {result['latency_ms']['render']['p50']:7.3f} | "
+          f"{result['psutil_calls_per_tick']:9.1f} {result['tcl_calls_per_tick']:6.1f} {result['peak_alloc_kib_per_tick']:9.1f} {result['bytes_per_timer']:8.0f}")
+
+
+def int_list(value):
+    return [int(item) for item in value.split(",")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int_list, default=[100, 1000, 10000], help="process table sizes (comma separated)")
+    parser.add_argument("--timers", type=int_list, default=[1, 100, 1000], help="timer counts (comma separated)")
+    parser.add_argument("--churn", type=float, default=0.01, help="fraction of the process table replaced every tick")
+    parser.add_argument("--patterns", default="unique,shared", help="name collision patterns: unique, shared, mixed")
+    parser.add_argument("--ticks", type=int, default=50, help="measured ticks per case")
+    parser.add_argument("--tick-seconds", type=float, default=1.0, help="simulated time between ticks")
+    parser.add_argument("--interval", type=int, default=1, help="timer interval in minutes")
+    parser.add_argument("--json", metavar="FILE", help="also append every result as a JSON line to FILE")
+    parser.add_argument("--max-p99-ms", type=float, help="exit with status 1 if any case's p99 tick latency is above this")
+    args = parser.parse_args(argv)
+
+    print(f"{'procs':>7} {'timers':>6} {'pattern':>7} {'churn':>6} | {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8} | "
+          f"{'scan':>7} {'apply':>7} {'render':>7} | {'psutil/t':>9} {'tcl/t':>6} {'KiB/tick':>9} {'B/timer':>8}")
+    failed = False
+    with tempfile.TemporaryDirectory() as workdir:
+        for pattern in args.patterns.split(","):
+            for process_count in args.processes:
+                for timer_count in args.timers:
+                    result = run_case(process_count, timer_count, args.churn, pattern, args.ticks,
+                                      args.tick_seconds, args.interval, workdir)
+                    print_result(result)
+                    if args.json:
+                        with open(args.json, "a") as f:
+                            f.write(json.dumps(result) + "\n")
+                    if args.max_p99_ms is not None and result["latency_ms"]["total"]["p99"] > args.max_p99_ms:
+                        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,92 @@
+'''
+Checks the webhook sink (see sinks.py) against a stub HTTP server on 127.0.0.1 that
+answers with a scripted sequence of responses: a 200, a 500, a garbage status line, and
+so on. Every case submits one notification and checks how the sink's metrics moved:
+delivered on the first try, delivered after retrying, or dropped once the retries ran
+out. The sink's thread must survive all of them.
+
+Example:
+    python benchmarks/check_webhook.py   # exit status 1 if a case fails
+'''
+
+import http.server
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sinks  # noqa: E402
+from stats import Stats  # noqa: E402
+
+CASE_TIMEOUT_SECONDS = 10
+OK, ERROR, GARBAGE, HANG_UP = "200", "500", "garbage", "hang up"
+
+# (name, responses of the stub server, expected (delivered, retries, failed) increments)
+CASES = [
+    ("200", [OK], (1, 0, 0)),
+    ("500 then 200", [ERROR, OK], (1, 1, 0)),
+    ("garbage status line then 200", [GARBAGE, OK], (1, 1, 0)),
+    ("closed without a response then 200", [HANG_UP, OK], (1, 1, 0)),
+    ("garbage status line on every try", [GARBAGE] * (sinks.SINK_RETRIES + 1), (0, sinks.SINK_RETRIES, 1)),
+    ("200 after the drops", [OK], (1, 0, 0)),
+]
+
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        response = self.server.responses.pop(0) if self.server.responses else OK
+        self.server.requests += 1
+        if response == GARBAGE:
+            self.wfile.write(b"NOT HTTP AT ALL\r\n\r\n")
+        elif response == HANG_UP:
+            self.close_connection = True
+        else:
+            self.send_response(int(response))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def counts(stats, sink):
+    return tuple(stats.counters[sink.metric + suffix] for suffix in ("delivered_total", "retries_total", "failed_total"))
+
+
+def main():
+    sinks.SINK_RETRY_BASE_SECONDS = 0.01 # Retry right away, the stub answers instantly
+    server = http.server.HTTPServer(("127.0.0.1", 0), StubHandler)
+    server.responses = []
+    server.requests = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    stats = Stats()
+    sink = sinks.WebhookSink("webhook", f"http://127.0.0.1:{server.server_port}/notify", stats)
+    sink.start()
+
+    failed = False
+    try:
+        for name, responses, expected in CASES:
+            server.responses = list(responses)
+            before = counts(stats, sink)
+            sink.submit({"message": name})
+            deadline = time.monotonic() + CASE_TIMEOUT_SECONDS
+            # Done once the notification was delivered or dropped
+            while time.monotonic() < deadline and counts(stats, sink)[0::2] == before[0::2]:
+                time.sleep(0.01)
+            time.sleep(0.05) # Nothing else should happen
+            moved = tuple(after - start for after, start in zip(counts(stats, sink), before))
+            ok = moved == expected and sink.is_alive()
+            failed = failed or not ok
+            print(f"{'ok  ' if ok else 'FAIL'} {name}: delivered {moved[0]}, retries {moved[1]}, failed {moved[2]}"
+                  + ("" if ok else f" (expected {expected}, sink thread {'alive' if sink.is_alive() else 'dead'})"))
+    finally:
+        sink.close()
+        server.shutdown()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
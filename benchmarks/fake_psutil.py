@@ -0,0 +1,129 @@
+'''
+A synthetic stand-in for the parts of psutil the notifier uses, for the benchmarks.
+It holds an in-memory process table, can churn it between ticks and counts every call.
+'''
+
+from collections import Counter
+from contextlib import contextmanager
+import random
+
+
+class NoSuchProcess(Exception):
+    pass
+
+
+class AccessDenied(Exception):
+    pass
+
+
+class FakeProcess:
+    def __init__(self, backend, pid):
+        backend.calls["Process"] += 1
+        if pid not in backend.table:
+            raise NoSuchProcess(pid)
+        self.backend = backend
+        self.pid = pid
+        self._create_time = backend.table[pid][1] # psutil identifies a process by it
+
+    def _entry(self):
+        entry = self.backend.table.get(self.pid)
+        if entry is None:
+            raise NoSuchProcess(self.pid)
+        return entry
+
+    def name(self):
+        self.backend.calls["name"] += 1
+        return self._entry()[0]
+
+    def create_time(self):
+        self.backend.calls["create_time"] += 1
+        return self._entry()[1]
+
+    def is_running(self):
+        self.backend.calls["is_running"] += 1
+        entry = self.backend.table.get(self.pid)
+        return entry is not None and entry[1] == self._create_time
+
+    @contextmanager
+    def oneshot(self):
+        self.backend.calls["oneshot"] += 1
+        yield
+
+    def cpu_percent(self):
+        return self.backend.usage.get(self.pid, (0.0, 0, 0))[0]
+
+    def memory_info(self):
+        return MemoryInfo(self.backend.usage.get(self.pid, (0.0, 0, 0))[1])
+
+    def num_fds(self):
+        return self.backend.usage.get(self.pid, (0.0, 0, 0))[2]
+
+
+class MemoryInfo:
+    def __init__(self, rss):
+        self.rss = rss
+
+
+class FakePsutil:
+    """
+    A process table of 'process_count' processes. Every step() replaces 'churn' (a fraction)
+    of them with new PIDs. Names come from 'names': a list of names to draw from with the
+    given weights, everything else gets a unique filler name.
+    'usage' maps PIDs to the (cpu percent, rss, open fds) their processes report; zero if missing.
+    """
+    NoSuchProcess = NoSuchProcess
+    AccessDenied = AccessDenied
+
+    def __init__(self, process_count, names=(), weights=(), churn=0.0, seed=0):
+        self.random = random.Random(seed)
+        self.names = list(names)
+        self.weights = list(weights)
+        self.churn = churn
+        self.calls = Counter()
+        self.table = {}  # pid -> (name, create_time)
+        self.usage = {}
+        self.next_pid = 100
+        self.clock = 1_700_000_000.0
+        for _ in range(process_count):
+            self.spawn()
+
+    def spawn(self, name=None):
+        pid = self.next_pid
+        self.next_pid += 1
+        if name is None:
+            name = self.pick_name(pid)
+        self.table[pid] = (name, self.clock)
+        return pid
+
+    def pick_name(self, pid):
+        if self.names and self.random.random() < sum(self.weights):
+            return self.random.choices(self.names, self.weights)[0]
+        return f"filler{pid}.exe"
+
+    def step(self, seconds=1.0):
+        """
+        Advances the fake clock and churns the table.
+        """
+        self.clock += seconds
+        replaced = int(len(self.table) * self.churn)
+        if replaced:
+            for pid in self.random.sample(list(self.table), replaced):
+                del self.table[pid]
+            for _ in range(replaced):
+                self.spawn()
+
+    # --- psutil API ---
+
+    def pids(self):
+        self.calls["pids"] += 1
+        return list(self.table)
+
+    def Process(self, pid):
+        return FakeProcess(self, pid)
+
+    def process_iter(self, attrs=None):
+        self.calls["process_iter"] += 1
+        for pid in list(self.table):
+            process = FakeProcess(self, pid)
+            process.info = {"pid": pid, "name": self.table[pid][0]}
+            yield process
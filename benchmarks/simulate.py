@@ -0,0 +1,242 @@
+'''
+Replays a scripted trace of process starts and exits (and timer toggles) against the
+engine on a virtual clock, as fast as the CPU allows, and writes out the exact firing
+schedule: a day of activity against thousands of timers takes seconds. The schedule is
+deterministic, so a saved one doubles as a regression test (--expect), and every run
+reports the engine's throughput in firings per second.
+
+The trace has one event per line, at a time from the start of the simulation (H:MM:SS
+or seconds); lines starting with # are comments:
+    0:05:00 start RobloxPlayerBeta.exe
+    0:50:00 toggle robloxplayerbeta.exe|Take a break
+    1:30:00 stop RobloxPlayerBeta.exe     (the most recently started instance)
+
+Examples:
+    python benchmarks/simulate.py timers.txt trace.txt --hours 24 --schedule schedule.txt
+    python benchmarks/simulate.py timers.txt trace.txt --expect schedule.txt   # exit status 1 if the schedule changed
+    python benchmarks/simulate.py --generate --timers 5000 --names 200 --sessions 2000 --hours 24
+
+Regression check, with the fixtures (use --per-instance and simulate_schedule_per_instance.txt
+for the per-instance mode):
+    python benchmarks/simulate.py benchmarks/fixtures/simulate_timers.txt benchmarks/fixtures/simulate_trace.txt --hours 4 --expect benchmarks/fixtures/simulate_schedule.txt
+'''
+
+import argparse
+import heapq
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import TimerEngine  # noqa: E402
+from headless import HeadlessLoop  # noqa: E402
+from state_store import StateStore  # noqa: E402
+from fake_psutil import FakePsutil  # noqa: E402
+
+WALL_EPOCH = 1_700_000_000.0 # The wall-clock time the simulation starts at; fixed, so runs are reproducible
+TRACE_ACTIONS = ("start", "stop", "toggle")
+SESSION_MINUTES = 45 # Mean length of a generated process session
+
+
+class VirtualLoop(HeadlessLoop):
+    """
+    The headless loop on a virtual clock: run_until() jumps straight from one callback to the next.
+    """
+    def __init__(self):
+        super().__init__()
+        self.now = 0.0
+
+    def time(self):
+        return self.now
+
+    def run_until(self, end):
+        """
+        Runs the callbacks due up to 'end', in order, and leaves the clock at 'end'.
+        """
+        while self.callbacks and self.callbacks[0][0] <= end:
+            when, _, callback = heapq.heappop(self.callbacks)
+            if callback is not None:
+                self.now = max(self.now, when)
+                callback()
+        self.now = end
+
+
+def parse_time(text):
+    """
+    Parses H:MM:SS (or MM:SS, or plain seconds) into seconds. Raises ValueError.
+    """
+    seconds = 0.0
+    for part in text.split(":"):
+        seconds = seconds * 60 + float(part)
+    if seconds < 0:
+        raise ValueError(f"negative time '{text}'")
+    return seconds
+
+
+def format_time(seconds):
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{int(hours)}:{int(minutes):02}:{seconds:06.3f}"
+
+
+def read_trace(path):
+    """
+    Returns the (time, action, argument) events of a trace file, in time order. Raises ValueError if one is invalid.
+    """
+    events = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            parts = line.split(None, 2)
+            if len(parts) != 3 or parts[1] not in TRACE_ACTIONS:
+                raise ValueError(f"{path}:{line_number}: expected 'TIME start|stop|toggle NAME'")
+            try:
+                at = parse_time(parts[0])
+            except ValueError as e:
+                raise ValueError(f"{path}:{line_number}: invalid time: {e}") from None
+            events.append((at, parts[1], parts[2]))
+    events.sort(key=lambda event: event[0]) # Stable, so events at the same time keep their order
+    return events
+
+
+def generate_workload(timer_count, name_count, session_count, duration, seed):
+    """
+    Returns (timers file lines, trace events) of a random but reproducible workload: timers
+    spread over 'name_count' process names, sessions of those processes starting at random
+    times, and a toggle for every tenth session.
+    """
+    rng = random.Random(seed)
+    names = [f"app{i}.exe" for i in range(name_count)]
+    timer_names = [rng.choice(names) for _ in range(timer_count)]
+    lines = [f"{name},{rng.randint(1, 60)},Timer {i},True\n" for i, name in enumerate(timer_names)]
+    events = []
+    for _ in range(session_count):
+        name = rng.choice(names)
+        start = rng.uniform(0, duration)
+        stop = start + rng.expovariate(1 / (SESSION_MINUTES * 60))
+        events.append((start, "start", name))
+        if stop < duration:
+            events.append((stop, "stop", name))
+    for _ in range(session_count // 10):
+        i = rng.randrange(timer_count)
+        events.append((rng.uniform(0, duration), "toggle", f"{timer_names[i]}|Timer {i}"))
+    events.sort(key=lambda event: event[0])
+    return lines, events
+
+
+class Simulation:
+    """
+    Runs the engine against a process table driven by a trace, on a virtual clock. The scan
+    worker isn't started: the table is rescanned right after every trace event, as the
+    kernel's process events would report it, so detection is exact.
+    """
+    def __init__(self, timers_file, per_instance=False):
+        self.loop = VirtualLoop()
+        self.backend = FakePsutil(0)
+        self.firings = [] # (virtual time, timer key)
+        self.running = {} # name -> PIDs started from the trace, in start order
+        self.engine = TimerEngine(self.loop, self.record_firing, timers_file, use_process_events=False, process_backend=self.backend,
+                                  per_instance=per_instance, watch_timers_file=False, wall_clock=self.wall_time, state_store=StateStore())
+
+    def wall_time(self):
+        return WALL_EPOCH + self.loop.now
+
+    def record_firing(self, timer, pid=None):
+        self.firings.append((self.loop.now, timer.key))
+
+    def apply(self, action, argument):
+        if action == "toggle":
+            timer = self.engine.timers_by_key.get(argument)
+            if timer is None:
+                raise ValueError(f"{format_time(self.loop.now)}: no timer with key '{argument}'")
+            self.engine.toggle_timer(timer)
+            return
+        self.backend.clock = self.wall_time() # The create_time of the processes started now
+        if action == "start":
+            self.running.setdefault(argument, []).append(self.backend.spawn(argument))
+        else:
+            pids = self.running.get(argument)
+            if not pids:
+                raise ValueError(f"{format_time(self.loop.now)}: '{argument}' is not running")
+            del self.backend.table[pids.pop()]
+        self.engine.update_watched_names()
+        self.engine.scan_worker.scan()
+        self.engine.drain_scan_results()
+
+    def run(self, events, duration):
+        """
+        Loads the timers, replays the events up to 'duration' seconds and returns the firings.
+        """
+        self.engine.load_timers()
+        for at, action, argument in events:
+            if at <= duration:
+                self.loop.call_later(at, lambda action=action, argument=argument: self.apply(action, argument))
+        self.loop.run_until(duration)
+        return self.firings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("timers_file", nargs="?", help="timers file to simulate")
+    parser.add_argument("trace_file", nargs="?", help="trace of process starts, stops and toggles")
+    parser.add_argument("--hours", type=float, default=24, help="simulated duration (default: %(default)s)")
+    parser.add_argument("--per-instance", action="store_true", help="one countdown per process instance (see main.py)")
+    parser.add_argument("--schedule", metavar="FILE", help="write the firing schedule to FILE, one 'H:MM:SS.mmm key' per line, in time order")
+    parser.add_argument("--expect", metavar="FILE", help="compare the schedule with a saved one; exit with status 1 if they differ")
+    generate = parser.add_argument_group("generated workload (instead of the files)")
+    generate.add_argument("--generate", action="store_true", help="simulate a random but reproducible workload")
+    generate.add_argument("--timers", type=int, default=1000, help="timers (default: %(default)s)")
+    generate.add_argument("--names", type=int, default=100, help="distinct process names (default: %(default)s)")
+    generate.add_argument("--sessions", type=int, default=1000, help="process sessions (default: %(default)s)")
+    generate.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    if not args.generate and (args.timers_file is None or args.trace_file is None):
+        parser.error("give a timers file and a trace, or --generate")
+    duration = args.hours * 3600
+
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            if args.generate:
+                lines, events = generate_workload(args.timers, args.names, args.sessions, duration, args.seed)
+                timers_file = os.path.join(workdir, "timers.txt")
+                with open(timers_file, "w") as f:
+                    f.writelines(lines)
+            else:
+                timers_file = args.timers_file
+                events = read_trace(args.trace_file)
+            simulation = Simulation(timers_file, args.per_instance)
+            started = time.perf_counter()
+            firings = simulation.run(events, duration)
+            elapsed = time.perf_counter() - started
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+
+    print(f"{len(simulation.engine.timers)} timers, {len(events)} trace events, {args.hours:g} h simulated in {elapsed:.2f} s "
+          f"({duration / elapsed:,.0f}x real time): {len(firings)} firings, {len(firings) / elapsed:,.0f} firings/s")
+    # Timers due at the same time are listed by key, whatever order they fired in
+    schedule = [f"{format_time(at)} {key}\n" for at, key in sorted(firings)]
+    if args.schedule:
+        with open(args.schedule, "w") as f:
+            f.writelines(schedule)
+    if args.expect:
+        with open(args.expect) as f:
+            expected = f.readlines()
+        for number, (line, expected_line) in enumerate(zip(schedule, expected), 1):
+            if line != expected_line:
+                print(f"Firing {number} differs: expected {expected_line.strip()!r}, got {line.strip()!r}", file=sys.stderr)
+                return 1
+        if len(schedule) != len(expected):
+            print(f"Expected {len(expected)} firings, got {len(schedule)}", file=sys.stderr)
+            return 1
+        print(f"The schedule matches {args.expect}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,323 @@
+'''
+A local control API, so scripts can manage the timers without the window: JSON-RPC 2.0
+over a Unix socket, one request (or batch of requests) per line. notifierctl.py is a
+command-line client for it.
+
+Methods:
+- add {process_name, interval_minutes, message, is_active=true, trigger=null} -> {key}
+  (trigger: a resource trigger such as "cpu>80:60", see resources.py)
+- remove {key}
+- toggle {key, is_active=<flipped>} -> {is_active}
+- set_active {process_name, is_active} -> {changed}: every timer of the process name at once
+- list -> [timer]
+- dump_state -> timers, process and scan state, the state store and the agents (see remote.py)
+- save -> writes the timers file
+- recent {limit=50} -> the newest notifications and process sessions starting or ending, newest first
+- top_timers {days=7, limit=10} -> [{key, notifications}] of the timers that notified most
+- runtime {days=7, process=null} -> [{process, seconds}] the watched processes ran
+The last three need the history (--history, see history.py).
+
+A JSON-RPC batch (a JSON array of requests) is applied as one engine batch: the matcher
+is rebuilt, the timers rescheduled and the timers list re-rendered once for the whole
+batch, however many timers it changes.
+
+The socket is only readable and writable by its owner. Connections are served on
+background threads; the requests themselves run on the engine's thread.
+'''
+
+import json
+import os
+import socket
+import threading
+import time
+
+from matcher import validate_pattern
+from resources import parse_trigger
+
+CONTROL_SOCKET_NAME = "oabd_notifier.sock"
+CONTROL_REQUEST_TIMEOUT_SECONDS = 30 # How long a connection waits for the engine's thread to run its requests
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+
+def default_control_socket():
+    """
+    Returns the default socket path: in the user's runtime directory, or the temp directory.
+    """
+    directory = os.environ.get("XDG_RUNTIME_DIR")
+    if not directory:
+        import tempfile # Slow to import, and rarely needed
+        directory = tempfile.gettempdir()
+    return os.path.join(directory, CONTROL_SOCKET_NAME)
+
+
+class RequestError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+def timer_info(engine, timer):
+    """
+    The public view of a timer, as returned by 'list'.
+    """
+    return {
+        "key": timer.key,
+        "process_name": timer.process_name,
+        "interval_minutes": timer.interval_minutes,
+        "message": timer.message,
+        "is_active": timer.is_active,
+        "trigger": None if timer.trigger is None else timer.trigger.spec,
+        "running": timer.is_active and engine.is_process_running(timer.process_name),
+        "seconds_to_next": engine.seconds_to_next(timer),
+        "last_fired": timer.last_fired,
+    }
+
+
+class ControlServer:
+    """
+    Serves the control API for a TimerEngine on a Unix socket.
+    """
+    def __init__(self, engine, path=None, history=None):
+        self.engine = engine
+        self.path = path or default_control_socket()
+        self.history = history # A history.HistorySink, if the history is recorded
+        self.listener = None
+        self.methods = {
+            "add": self.add_timer,
+            "remove": self.remove_timer,
+            "toggle": self.toggle_timer,
+            "set_active": self.set_process_active,
+            "list": self.list_timers,
+            "dump_state": self.dump_state,
+            "save": self.save_timers,
+            "recent": self.recent_events,
+            "top_timers": self.top_timers,
+            "runtime": self.process_runtime,
+        }
+
+    def start(self):
+        """
+        Binds the socket and starts accepting connections. Raises OSError, e.g. if another
+        instance is already serving on the same path.
+        """
+        if not hasattr(socket, "AF_UNIX"):
+            raise OSError("Unix sockets are not supported on this system")
+        if os.path.exists(self.path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.unlink(self.path) # Left over from an instance that didn't exit cleanly
+            else:
+                raise OSError(f"Another instance is serving on {self.path}")
+            finally:
+                probe.close()
+
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)
+        try:
+            self.listener.bind(self.path)
+        finally:
+            os.umask(old_umask)
+        self.listener.listen()
+        threading.Thread(target=self.accept_connections, name="control-server", daemon=True).start()
+
+    def stop(self):
+        if self.listener is None:
+            return
+        self.listener.close()
+        self.listener = None
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def accept_connections(self):
+        listener = self.listener
+        while True:
+            try:
+                connection, _ = listener.accept()
+            except OSError:
+                return # The listener was closed
+            threading.Thread(target=self.serve_connection, args=(connection,), name="control-connection", daemon=True).start()
+
+    def serve_connection(self, connection):
+        with connection, connection.makefile("rwb") as stream:
+            for line in stream:
+                if not line.strip():
+                    continue
+                response = self.handle_line(line)
+                if response is not None:
+                    stream.write(json.dumps(response).encode() + b"\n")
+                    stream.flush()
+
+    def handle_line(self, line):
+        """
+        Parses a request line and runs it on the engine's thread. Returns the response, or
+        None when there is nothing to answer (only JSON-RPC notifications).
+        """
+        try:
+            message = json.loads(line)
+        except ValueError as e:
+            return error_response(None, PARSE_ERROR, f"Parse error: {e}")
+        is_batch = isinstance(message, list)
+        requests = message if is_batch else [message]
+        if not requests:
+            return error_response(None, INVALID_REQUEST, "Empty batch")
+
+        import concurrent.futures # On the connection's thread, so starting the server doesn't wait for it
+        future = concurrent.futures.Future()
+        def run():
+            if not future.set_running_or_notify_cancel():
+                return # Timed out before the engine got to it, and the client was told so
+            try:
+                future.set_result(self.run_requests(requests))
+            except Exception as e:
+                future.set_exception(e)
+        self.engine.loop.call_soon_threadsafe(run)
+        try:
+            try:
+                responses = future.result(CONTROL_REQUEST_TIMEOUT_SECONDS)
+            except concurrent.futures.TimeoutError:
+                if future.cancel():
+                    return error_response(None, INTERNAL_ERROR, "Timed out waiting for the engine, nothing was applied")
+                responses = future.result() # Already running, so it finishes shortly
+        except Exception as e:
+            return error_response(None, INTERNAL_ERROR, f"Internal error: {e}")
+
+        responses = [response for response in responses if response is not None]
+        if is_batch:
+            return responses or None
+        return responses[0] if responses else None
+
+    def run_requests(self, requests):
+        """
+        Runs requests on the engine's thread, as one engine batch.
+        """
+        responses = []
+        with self.engine.batch():
+            for request in requests:
+                responses.append(self.run_request(request))
+        return responses
+
+    def run_request(self, request):
+        if not isinstance(request, dict) or request.get("jsonrpc") != "2.0" or not isinstance(request.get("method"), str):
+            return error_response(request.get("id") if isinstance(request, dict) else None, INVALID_REQUEST, "Invalid request")
+        request_id = request.get("id")
+        params = request.get("params", {})
+        method = self.methods.get(request["method"])
+        try:
+            if method is None:
+                raise RequestError(METHOD_NOT_FOUND, f"Method not found: {request['method']}")
+            if not isinstance(params, dict):
+                raise RequestError(INVALID_PARAMS, "params must be an object")
+            result = method(**params)
+        except RequestError as e:
+            response = error_response(request_id, e.code, str(e))
+        except (TypeError, ValueError) as e:
+            response = error_response(request_id, INVALID_PARAMS, str(e))
+        except OSError as e:
+            response = error_response(request_id, INTERNAL_ERROR, str(e))
+        else:
+            response = {"jsonrpc": "2.0", "id": request_id, "result": result}
+        return response if "id" in request else None
+
+    def find_history(self):
+        if self.history is None:
+            raise RequestError(INVALID_PARAMS, "The history isn't recorded (start the notifier with --history)")
+        return self.history
+
+    def history_range(self, days):
+        """
+        Returns the history and the (since, until) wall-clock range of the last 'days' days.
+        """
+        history = self.find_history()
+        if isinstance(days, bool) or not isinstance(days, (int, float)) or days <= 0:
+            raise ValueError("days must be a positive number")
+        until = time.time()
+        return history, until - days * 86400, until
+
+    def find_timer(self, key):
+        timer = self.engine.timers_by_key.get(key)
+        if timer is None:
+            raise RequestError(INVALID_PARAMS, f"No timer with key '{key}'")
+        return timer
+
+    # --- Methods ---
+
+    def add_timer(self, process_name, interval_minutes, message, is_active=True, trigger=None):
+        if not isinstance(process_name, str) or not isinstance(message, str) or not process_name.strip() or not message.strip():
+            raise ValueError("process_name and message are required")
+        if "," in process_name or "," in message:
+            raise ValueError("process_name and message can't contain commas (see the timers file format)")
+        if any(text.splitlines() != [text] for text in (process_name.strip(), message.strip())):
+            # The timers file is read with splitlines, so these would split the timer's line
+            raise ValueError("process_name and message can't contain line breaks (see the timers file format)")
+        if not isinstance(interval_minutes, int) or isinstance(interval_minutes, bool) or interval_minutes <= 0:
+            raise ValueError("interval_minutes must be a positive integer")
+        if trigger is not None and (not isinstance(trigger, str) or trigger.splitlines() != [trigger]):
+            raise ValueError("trigger must be a string on one line, e.g. cpu>80:60")
+        validate_pattern(process_name.strip())
+        timer = self.engine.add_timer(process_name.strip(), interval_minutes, message.strip(), bool(is_active), None if trigger is None else parse_trigger(trigger))
+        return {"key": timer.key}
+
+    def remove_timer(self, key):
+        self.engine.remove_timer(self.find_timer(key))
+        return True
+
+    def toggle_timer(self, key, is_active=None):
+        timer = self.find_timer(key)
+        if is_active is None or bool(is_active) != timer.is_active:
+            self.engine.toggle_timer(timer)
+        return {"is_active": timer.is_active}
+
+    def set_process_active(self, process_name, is_active):
+        if not isinstance(process_name, str) or not isinstance(is_active, bool):
+            raise ValueError("process_name must be a string and is_active a boolean")
+        return {"changed": self.engine.set_process_active(process_name.strip(), is_active)}
+
+    def list_timers(self):
+        return [timer_info(self.engine, timer) for timer in self.engine.timers if self.engine.timers_by_key.get(timer.key) is timer]
+
+    def recent_events(self, limit=50):
+        return list(self.find_history().recent)[::-1][:limit]
+
+    def top_timers(self, days=7, limit=10):
+        history, since, until = self.history_range(days)
+        return [{"key": key, "notifications": count} for key, count in history.top_timers(since, until, limit)]
+
+    def process_runtime(self, days=7, process=None):
+        history, since, until = self.history_range(days)
+        return [{"process": name, "seconds": seconds} for name, seconds in history.process_runtime(since, until, process)]
+
+    def dump_state(self):
+        engine = self.engine
+        next_deadline = engine.scheduler.next_deadline()
+        return {
+            "timers": self.list_timers(),
+            "pattern_counts": dict(engine.pattern_counts),
+            "watched_names": sorted(engine.watched_names),
+            "scheduled": len(engine.scheduler),
+            "next_deadline_in": None if next_deadline is None else max(next_deadline - engine.loop.time(), 0),
+            "scan": {
+                "active": engine.scan_worker.active,
+                "interval_seconds": engine.scan_worker.interval_seconds,
+                "last_scan_ms": engine.last_scan_ms,
+            },
+            "state_store": {key: dict(state) for key, state in engine.state_store.state.items()}, # Copies: serialised on another thread
+            "remote_hosts": engine.scan_worker.hub.hosts if engine.scan_worker.hub is not None else {}, # Replaced, never mutated
+        }
+
+    def save_timers(self):
+        self.engine.save_timers()
+        return True
+
+
+def error_response(request_id, code, message):
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
@@ -0,0 +1,955 @@
+'''
+The timer engine: timers, process watching, deadline scheduling and the timers file.
+
+Nothing in here imports tkinter. A front-end (the Tk window in gui.py, or the headless
+runner in headless.py) hands the engine an event loop adapter and a notify callback:
+
+- loop.time() returns the current time on a monotonic clock, in seconds
+- loop.call_later(delay_seconds, callback) schedules a callback and returns a handle
+- loop.cancel(handle) cancels a scheduled callback
+- loop.call_soon_threadsafe(callback) runs a callback on the loop's thread; the only
+  method that may be called from other threads (see control.py)
+'''
+
+from collections import Counter, deque
+from contextlib import contextmanager
+import difflib
+import math
+import queue
+import sys
+import time
+
+from file_watcher import FileWatcher
+from matcher import ProcessMatcher, validate_pattern
+from processes import ProcessSnapshot, PROCESS_STARTED
+from resources import ResourceMonitor, ResourceSamples, parse_trigger
+from scan_worker import ScanWorker
+from scheduler import DeadlineScheduler
+from state_store import StateStore, state_paths
+from stats import NullStats
+
+TIMER_CHECK_INTERVAL_MS = 1000  # Check every 1 second
+SCAN_INTERVAL_CEILING_SECONDS = 30 # While nothing changes, process scans back off up to this
+TIMERS_FILE_NAME = "timers.txt"
+USE_PROCESS_EVENTS = True # On Linux, learn about process starts/exits from the kernel instead of polling
+PER_INSTANCE_TIMERS = False # Give every running instance of a timer's process its own countdown, anchored to its start
+WATCH_TIMERS_FILE = True # Reload the timers file when it changes on disk
+RELOAD_DEBOUNCE_MS = 200 # Changes to the timers file within this window are reloaded together
+STATE_CHECKPOINT_SECONDS = 60 # How often the progress of running timers is written to the state journal
+STATS_EXPORT_SECONDS = 15 # How often the stats are exported, when an export file is set
+
+
+class Timer:
+    """
+    A timer with its 'is_active' status, deadline and persisted progress.
+    With a 'trigger' (see resources.py), it fires when its process stays above a resource
+    threshold instead of every interval; the interval is then the least time between two
+    of its notifications.
+    A slotted record rather than a dict: with tens of thousands of timers it takes about a
+    third of the memory. The process names and messages are interned, since timers
+    generated from templates share a handful of them.
+    """
+    __slots__ = ("process_name", "interval_minutes", "message", "is_active", "trigger", "deadline", "key", "elapsed", "last_fired")
+
+    def __init__(self, process_name, interval_minutes, message, is_active=True, trigger=None):
+        self.process_name = sys.intern(process_name)
+        self.interval_minutes = interval_minutes
+        self.message = sys.intern(message)
+        self.is_active = is_active
+        self.trigger = trigger # A resources.ResourceTrigger, or None for a running-time timer
+        self.deadline = None # Next firing on the loop's monotonic clock, set by the DeadlineScheduler
+        self.key = None # Stable identity in the state store, set by the engine
+        self.elapsed = 0.0 # Countdown progress (seconds) carried over while the timer isn't scheduled
+        self.last_fired = None # Wall-clock time of the last notification
+
+    def __repr__(self):
+        trigger = "" if self.trigger is None else f", {self.trigger.spec!r}"
+        return f"Timer({self.process_name!r}, {self.interval_minutes}, {self.message!r}, {self.is_active}{trigger})"
+
+
+class TimerInstance:
+    """
+    Per-instance mode: the countdown of one running process instance of a timer.
+    """
+    __slots__ = ("timer", "pid", "anchor", "deadline")
+
+    def __init__(self, timer, pid, anchor):
+        self.timer = timer
+        self.pid = pid
+        self.anchor = anchor # Monotonic time the process started at
+        self.deadline = None
+
+
+def timer_base_key(timer):
+    return f"{timer.process_name.casefold()}|{timer.message}"
+
+
+def changed_occurrences(old_lines, new_lines, lines):
+    """
+    Lines up the old and new lines of the timers file and returns which copies of each of
+    'lines' (by their index among the copies of that line, in file order) were removed
+    from the old file, and which were added to the new one, as two dicts of lists.
+    The lines they start and end with in common are taken as unchanged, so a line edited
+    in place is told apart from its copies by its position.
+    """
+    prefix = 0
+    while prefix < min(len(old_lines), len(new_lines)) and old_lines[prefix] == new_lines[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < min(len(old_lines), len(new_lines)) - prefix and old_lines[-1 - suffix] == new_lines[-1 - suffix]:
+        suffix += 1
+    # The copies before the changed part are numbered first
+    seen = Counter(line for line in old_lines[:prefix] if line in lines)
+    removed = {line: [] for line in lines}
+    added = {line: [] for line in lines}
+    old_seen = Counter(seen)
+    new_seen = Counter(seen)
+    old_middle = old_lines[prefix:len(old_lines) - suffix]
+    new_middle = new_lines[prefix:len(new_lines) - suffix]
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old_middle, new_middle, autojunk=False).get_opcodes():
+        for line in old_middle[i1:i2]:
+            if line in removed:
+                if tag != "equal":
+                    removed[line].append(old_seen[line])
+                old_seen[line] += 1
+        for line in new_middle[j1:j2]:
+            if line in added:
+                if tag != "equal":
+                    added[line].append(new_seen[line])
+                new_seen[line] += 1
+    return removed, added
+
+
+def parse_timer_line(line):
+    """
+    Parses a 'process_name,interval_minutes,message,is_active[,trigger]' line of the timers file.
+    Raises ValueError, saying what is wrong, if the line isn't a valid timer.
+    """
+    parts = line.strip().split(',', 4)
+    if len(parts) not in (4, 5):
+        raise ValueError("expected 'process_name,interval_minutes,message,is_active[,trigger]'")
+    process_name, interval_str, message, active_str = parts[:4]
+    trigger = parse_trigger(parts[4]) if len(parts) == 5 else None
+    try:
+        interval_minutes = int(interval_str)
+    except ValueError:
+        raise ValueError(f"the interval '{interval_str}' is not a whole number of minutes") from None
+    if interval_minutes <= 0:
+        raise ValueError("the interval must be positive")
+    validate_pattern(process_name)
+    return Timer(process_name, interval_minutes, message, active_str.lower() == "true", trigger)
+
+
+def format_timer_line(timer):
+    trigger = "" if timer.trigger is None else f",{timer.trigger.spec}"
+    return f"{timer.process_name},{timer.interval_minutes},{timer.message},{timer.is_active}{trigger}\n"
+
+
+class TimerEngine:
+    """
+    Runs the timers against the process table and calls notify(timer, pid) when one fires;
+    'pid' is the process whose countdown fired with 'per_instance', None otherwise.
+    'process_backend' replaces psutil for the scans, e.g. with a fake one in the benchmarks.
+    'stats' is a stats.Stats to collect metrics into; instrumentation is off without it.
+    'scan_ceiling_seconds' caps the adaptive scan interval (see ScanWorker); at or below
+    TIMER_CHECK_INTERVAL_MS it scans at a fixed cadence.
+    With 'watch_timers_file', changes to the timers file are applied as they are saved (see reload_timers).
+    With 'per_instance', each running process matching a timer gets its own countdown,
+    whose deadlines are computed from the process' create_time rather than from when the
+    process was noticed, so they don't depend on how often the process table is scanned.
+    'wall_clock' returns the wall-clock time, and 'state_store' replaces the StateStore next
+    to the timers file; both are for running the engine on a virtual clock (see benchmarks/simulate.py).
+    With a 'remote_hub' (a listening remote.RemoteHub), the timers also see the processes of
+    the machines running an agent; their PIDs are (host, pid) pairs.
+    """
+    def __init__(self, loop, notify, timers_file=TIMERS_FILE_NAME, use_process_events=USE_PROCESS_EVENTS, process_backend=None, stats=None,
+                 scan_ceiling_seconds=SCAN_INTERVAL_CEILING_SECONDS, per_instance=PER_INSTANCE_TIMERS, watch_timers_file=WATCH_TIMERS_FILE,
+                 wall_clock=time.time, state_store=None, remote_hub=None):
+        self.loop = loop
+        self.wall_clock = wall_clock
+        self.notify = notify
+        self.timers_file = timers_file
+        self.tick_listeners = [] # Called after every tick, e.g. to refresh a view
+        self.change_listeners = [] # Called after a batch of timer changes (see batch)
+        self.reload_listeners = [] # Called with ((added, removed, edited) or None, [error]) after a reload
+        self.process_listeners = [] # Called with (process events matching a pattern, wall-clock time they were detected at)
+        self.stats = stats or NullStats()
+        self.stats_export = None # (path, format) to export the stats to periodically
+        self.stats_export_handle = None
+
+        self.timers = []
+        self.timers_by_key = {}
+        self.batch_depth = 0
+        self.batch_timers = [] # Timers added or toggled in the current batch, to (re)start at its end
+        self.batch_removed = {} # id() -> timer, for the timers removed in the current batch
+        self.process_snapshot = ProcessSnapshot() # Latest immutable snapshot published by the scan worker
+        self.matcher = ProcessMatcher() # The process name patterns of the active timers, compiled
+        self.timers_by_pattern = {} # pattern -> active timers using it
+        self.resource_timers = {} # pattern -> active timers using it with a resource trigger
+        self.resource_monitor = ResourceMonitor() # Recent resource samples of the processes of resource_timers
+        self.pattern_counts = {} # pattern -> number of running processes matching it
+        self.watched_names = set() # Case-folded running process names matching a pattern
+        self.watched_names_changed = False
+        self.scan_worker = ScanWorker(TIMER_CHECK_INTERVAL_MS / 1000, use_process_events, process_backend, loop.time, self.stats, scan_ceiling_seconds, remote_hub)
+        self.scan_worker.with_create_times = per_instance
+        self.per_instance = per_instance
+        self.instances = {} # Per-instance mode: id(timer) -> {pid: countdown of that process instance}
+        self.last_scan_ms = 0.0 # Time the worker spent on its last scan
+        self.drain_ms = 0.0 # Time the engine's thread spent applying the last scan results
+        self.max_drain_ms = 0.0
+        self.scheduler = DeadlineScheduler(loop.time) # Deadlines of the timers whose process is running
+        self.deadline_handle = None # The single callback armed for the earliest deadline
+        self.tick_handle = None
+        self.next_tick = 0.0 # Loop time the tick_handle is due at
+        self.checkpoint_handle = None
+        self.state_store = state_store or StateStore(*state_paths(timers_file))
+        self.state_store.load()
+
+        self.watch_timers_file = watch_timers_file
+        self.file_watcher = None
+        self.reload_handle = None
+        self.file_lines = Counter() # Lines of the timers file as last loaded, saved or reloaded
+        self.file_order = [] # The same lines, in file order
+        self.file_timers = {} # line -> the timers created from it, in file order
+        self.bad_lines = {} # line -> why it isn't a valid timer
+        self.file_errors = [] # (line number, line, error) of the invalid lines in the timers file
+
+    def start(self):
+        # Apply the first scan as soon as it is done, not a tick later
+        self.scan_worker.on_first_scan = lambda: self.loop.call_soon_threadsafe(self.tick_now)
+        self.scan_worker.start()
+        if self.watch_timers_file:
+            self.file_watcher = FileWatcher(self.timers_file, lambda: self.loop.call_soon_threadsafe(self.schedule_reload))
+            self.file_watcher.start()
+        self.tick()
+        self.checkpoint_handle = self.loop.call_later(STATE_CHECKPOINT_SECONDS, self.checkpoint_state)
+        if self.stats_export is not None:
+            self.stats_export_handle = self.loop.call_later(STATS_EXPORT_SECONDS, self.export_stats)
+
+    def stop(self):
+        """
+        Stops the engine and writes the progress of every timer, so a restart continues from here.
+        """
+        self.scan_worker.stop()
+        if self.file_watcher is not None:
+            self.file_watcher.stop()
+        for handle in (self.deadline_handle, self.tick_handle, self.checkpoint_handle, self.stats_export_handle, self.reload_handle):
+            if handle is not None:
+                self.loop.cancel(handle)
+        self.deadline_handle = self.tick_handle = self.checkpoint_handle = self.stats_export_handle = self.reload_handle = None
+        if self.stats_export is not None:
+            self.export_stats(reschedule=False)
+        for timer in self.timers:
+            self.save_timer_state(timer)
+        self.state_store.compact()
+        self.state_store.close()
+
+    # --- Timer management ---
+
+    def add_timer(self, process_name, interval_minutes, message, is_active=True, trigger=None):
+        """
+        Adds a timer and starts its countdown right away if its process is running.
+        Raises ValueError if the process name is an invalid pattern.
+        """
+        validate_pattern(process_name)
+        timer = Timer(process_name, interval_minutes, message, is_active, trigger)
+        self.assign_key(timer, self.timers_by_key)
+        self.timers_by_key[timer.key] = timer
+        self.timers.append(timer)
+        self.save_timer_state(timer)
+        try:
+            self.timer_changed(timer)
+        except ValueError:
+            self.remove_timer(timer) # Don't keep a timer the matcher can't take
+            raise
+        return timer
+
+    def remove_timer(self, timer):
+        self.scheduler.cancel(timer)
+        self.cancel_instances(timer)
+        del self.timers_by_key[timer.key]
+        self.state_store.remove(timer.key)
+        if self.batch_depth:
+            self.batch_removed[id(timer)] = timer
+            return
+        self.timers.remove(timer)
+        self.rebuild_matcher()
+        self.arm_deadline_timer()
+
+    def toggle_timer(self, timer):
+        """
+        Flips the timer's 'is_active' status. Deactivating stops the countdown, activating starts it over.
+        """
+        timer.is_active = not timer.is_active
+        timer.elapsed = 0.0
+        self.save_timer_state(timer)
+        self.timer_changed(timer)
+
+    def set_process_active(self, process_name, is_active):
+        """
+        Switches every timer of a process name (pattern, compared case-insensitively) on or
+        off at once, e.g. to pause everything for one game, as one batch. Returns how many changed.
+        """
+        name = process_name.casefold()
+        timers = [timer for timer in self.timers if timer.is_active != is_active and timer.process_name.casefold() == name
+                  and self.timers_by_key.get(timer.key) is timer]
+        with self.batch():
+            for timer in timers:
+                self.toggle_timer(timer)
+        return len(timers)
+
+    def edit_timer(self, timer, interval_minutes, is_active):
+        """
+        Changes a timer's interval and status. A new interval keeps the countdown's progress;
+        a new status starts it over, like toggle_timer.
+        """
+        if is_active != timer.is_active:
+            timer.interval_minutes = interval_minutes
+            self.toggle_timer(timer)
+        elif interval_minutes != timer.interval_minutes:
+            timer.elapsed = min(self.timer_elapsed(timer), interval_minutes * 60)
+            timer.interval_minutes = interval_minutes
+            self.scheduler.cancel(timer)
+            self.save_timer_state(timer)
+            self.timer_changed(timer)
+
+    def timer_changed(self, timer):
+        """
+        Reschedules a timer that was added or toggled, right away or at the end of the current batch.
+        """
+        if self.batch_depth:
+            self.batch_timers.append(timer)
+            return
+        self.rebuild_matcher()
+        self.restart_timer(timer)
+        self.arm_deadline_timer()
+
+    @contextmanager
+    def batch(self):
+        """
+        Groups timer changes, e.g. thousands of them from the control socket: the matcher
+        is rebuilt, the timers rescheduled and the change listeners called once, at the end.
+        """
+        self.batch_depth += 1
+        try:
+            yield
+        finally:
+            self.batch_depth -= 1
+            if not self.batch_depth:
+                self.apply_batch()
+
+    def apply_batch(self):
+        timers, self.batch_timers = self.batch_timers, []
+        removed, self.batch_removed = self.batch_removed, {}
+        if removed:
+            self.timers = [timer for timer in self.timers if id(timer) not in removed]
+        self.rebuild_matcher(timers + list(removed.values()))
+        for timer in timers:
+            if id(timer) not in removed:
+                self.restart_timer(timer)
+        self.arm_deadline_timer()
+        for listener in self.change_listeners:
+            listener()
+
+    def load_timers(self):
+        """
+        Replaces the timers with the ones in the timers file and returns how many were loaded.
+        Each timer picks up its saved progress from the state store. Invalid lines are
+        skipped and listed in file_errors. Raises OSError (FileNotFoundError if there is no file).
+        """
+        # Keep the progress of the timers being replaced, then clear them before loading
+        for timer in self.timers:
+            self.save_timer_state(timer)
+        self.timers = []
+        self.timers_by_key = {}
+        self.scheduler.clear()
+        self.instances = {}
+        self.file_lines = Counter()
+        self.file_order = []
+        self.file_timers = {}
+        self.bad_lines = {}
+        self.file_errors = []
+        try:
+            self.file_order = self.read_timer_lines()
+            for line_number, line in enumerate(self.file_order, 1):
+                if not line:
+                    continue
+                self.file_lines[line] += 1
+                try:
+                    timer = parse_timer_line(line)
+                except ValueError as e:
+                    self.bad_lines[line] = str(e)
+                    self.file_errors.append((line_number, line, str(e)))
+                    continue
+                self.assign_key(timer, self.timers_by_key)
+                self.timers_by_key[timer.key] = timer
+                saved = self.state_store.state.get(timer.key, {})
+                timer.elapsed = saved.get("elapsed", 0.0)
+                timer.last_fired = saved.get("last_fired")
+                self.timers.append(timer)
+                self.file_timers.setdefault(line, []).append(timer)
+        finally:
+            self.rebuild_matcher()
+            for timer in self.timers:
+                self.restart_timer(timer)
+            self.arm_deadline_timer()
+
+        # Forget the state of timers that are no longer in the file
+        stale_keys = self.state_store.state.keys() - self.timers_by_key.keys()
+        if stale_keys:
+            for key in stale_keys:
+                self.state_store.remove(key)
+            self.state_store.compact()
+        return len(self.timers)
+
+    def read_timer_lines(self):
+        """
+        Returns the lines of the timers file, stripped (so blank lines are empty). Raises OSError.
+        """
+        with open(self.timers_file, "r") as f:
+            return list(map(str.strip, f.read().splitlines()))
+
+    def reload_timers(self):
+        """
+        Applies the changes made to the timers file since it was last loaded, saved or
+        reloaded, and returns (added, removed, edited). Only the lines that changed are
+        parsed and only their timers touched, as one batch: a line replaced by one with the
+        same process name (case included), message and trigger is an edit of that timer (see
+        edit_timer), any other replaced timer is removed before the new ones are added, so
+        they take over its key, and every other timer keeps its countdown. Of several
+        identical lines, the ones that changed are told apart by lining up the old and new
+        files, so each copy keeps its own timer.
+        Invalid lines are listed in file_errors. Raises OSError.
+        """
+        lines = self.read_timer_lines()
+        new_lines = Counter(lines)
+        del new_lines[""]
+        # Only the lines whose count changed; the set operation on the items runs in C
+        changed_lines = {line for line, _ in self.file_lines.items() ^ new_lines.items()}
+        removed_lines = {line: self.file_lines[line] - new_lines[line] for line in changed_lines if self.file_lines[line] > new_lines[line]}
+        added_lines = {line: new_lines[line] - self.file_lines[line] for line in changed_lines if new_lines[line] > self.file_lines[line]}
+        # Which copies of a line changed, when others stay, only shows in the order of the lines
+        duplicated = {line for line in changed_lines if self.file_lines[line] and new_lines[line]}
+        removed_copies = added_copies = {}
+        if duplicated:
+            removed_copies, added_copies = changed_occurrences(self.file_order, lines, duplicated)
+        self.file_lines = new_lines
+        self.file_order = lines
+
+        parsed = [] # (line, timer parsed from it, index among the copies of the line or None to append)
+        # Lined up copies that moved show up as removed and added, so those counts come from added_copies and removed_copies
+        for line in added_lines.keys() | {line for line, indexes in added_copies.items() if indexes}:
+            try:
+                timer = parse_timer_line(line)
+            except ValueError as e:
+                self.bad_lines[line] = str(e)
+                continue
+            # Only read, so the copies can share it
+            parsed += [(line, timer, index) for index in added_copies.get(line) or [None] * added_lines[line]]
+
+        replaced = {} # (process name, message, trigger) -> timers of the removed lines, still loaded, in file order
+        for line in removed_lines.keys() | {line for line, indexes in removed_copies.items() if indexes}:
+            if line not in new_lines:
+                self.bad_lines.pop(line, None)
+            timers = self.file_timers.get(line, [])
+            if line in removed_copies:
+                indexes = [index for index in removed_copies[line] if index < len(timers)]
+            else:
+                indexes = range(max(len(timers) - removed_lines[line], 0), len(timers))
+            removed_timers = [timers[index] for index in indexes]
+            for index in reversed(indexes):
+                del timers[index]
+            for timer in removed_timers:
+                if self.timers_by_key.get(timer.key) is timer: # Not deleted since
+                    replaced.setdefault((timer.process_name, timer.message, timer.trigger), deque()).append(timer)
+            if not timers:
+                self.file_timers.pop(line, None)
+
+        added = removed = edited = 0
+        with self.batch():
+            edits = []
+            for line, new, index in parsed:
+                candidates = replaced.get((new.process_name, new.message, new.trigger))
+                edits.append(candidates.popleft() if candidates else None)
+            # The rest were removed; free their keys before adding
+            for timers in replaced.values():
+                for timer in timers:
+                    self.remove_timer(timer)
+                    removed += 1
+            for (line, new, index), timer in zip(parsed, edits):
+                if timer is not None:
+                    self.edit_timer(timer, new.interval_minutes, new.is_active)
+                    edited += 1
+                else:
+                    timer = self.add_timer(new.process_name, new.interval_minutes, new.message, new.is_active, new.trigger)
+                    added += 1
+                timers = self.file_timers.setdefault(line, [])
+                if index is None:
+                    timers.append(timer)
+                else:
+                    timers.insert(index, timer)
+
+        self.file_errors = []
+        if self.bad_lines:
+            self.file_errors = [(line_number, line, self.bad_lines[line]) for line_number, line in enumerate(lines, 1) if line in self.bad_lines]
+        return added, removed, edited
+
+    def schedule_reload(self):
+        """
+        Reloads the timers file shortly, once the changes to it have settled.
+        """
+        if self.reload_handle is None:
+            self.reload_handle = self.loop.call_later(RELOAD_DEBOUNCE_MS / 1000, self.reload_from_watcher)
+
+    def reload_from_watcher(self):
+        self.reload_handle = None
+        try:
+            changes = self.reload_timers()
+        except FileNotFoundError:
+            return # Deleted, or in the middle of being replaced; the timers stay as they are
+        except OSError as e:
+            changes, errors = None, [f"Failed to reload {self.timers_file}: {e}"]
+        else:
+            errors = [f"Line {line_number}: {error}: {line}" for line_number, line, error in self.file_errors]
+        for listener in self.reload_listeners:
+            listener(changes, errors)
+
+    def assign_key(self, timer, keys):
+        """
+        Gives the timer a key that is stable across restarts: its process name and message,
+        numbered when several timers share both. 'keys' (a set or dict) holds the keys already taken.
+        """
+        base_key = key = timer_base_key(timer)
+        number = 1
+        while key in keys:
+            number += 1
+            key = f"{base_key}#{number}"
+        timer.key = key
+
+    def timer_elapsed(self, timer):
+        """
+        Returns how far (in seconds) the timer's current countdown has progressed.
+        """
+        if timer.deadline is None:
+            return timer.elapsed
+        return timer.interval_minutes * 60 - max(timer.deadline - self.loop.time(), 0)
+
+    def save_timer_state(self, timer):
+        self.state_store.record(timer.key, elapsed=self.timer_elapsed(timer), last_fired=timer.last_fired)
+
+    def checkpoint_state(self):
+        """
+        Periodically writes the progress of the running timers, so a crash loses at most one period.
+        """
+        for timer in self.timers:
+            if timer.deadline is not None:
+                self.save_timer_state(timer)
+        self.checkpoint_handle = self.loop.call_later(STATE_CHECKPOINT_SECONDS, self.checkpoint_state)
+
+    def save_timers(self):
+        """
+        Saves the timers to the timers file, including active status. Raises OSError.
+        """
+        timers = [timer for timer in self.timers if self.timers_by_key.get(timer.key) is timer] # Not removed in the current batch
+        with open(self.timers_file, "w") as f:
+            for timer in timers:
+                f.write(format_timer_line(timer))
+        # The file now matches the timers, so reloading it must not change anything
+        self.file_lines = Counter()
+        self.file_order = []
+        self.file_timers = {}
+        self.bad_lines = {}
+        self.file_errors = []
+        for timer in timers:
+            line = format_timer_line(timer).strip()
+            self.file_lines[line] += 1
+            self.file_order.append(line)
+            self.file_timers.setdefault(line, []).append(timer)
+
+    # --- Process state ---
+
+    def is_process_running(self, process_name):
+        """
+        Checks if a process matching the given name (pattern) of an active timer is
+        running, as of the last scan result.
+        """
+        return self.pattern_counts.get(process_name, 0) > 0
+
+    def rebuild_matcher(self, changed_timers=None):
+        """
+        Recompiles the patterns of the active timers when they changed, and recounts the
+        running processes matching each one. Only needed when timers are added, removed,
+        toggled or loaded. With 'changed_timers', only those timers are re-indexed instead
+        of all of them.
+        """
+        if changed_timers is None:
+            self.timers_by_pattern = {}
+            for timer in self.timers:
+                if timer.is_active:
+                    self.timers_by_pattern.setdefault(timer.process_name, []).append(timer)
+        else:
+            for timer in changed_timers:
+                pattern = timer.process_name
+                timers = [other for other in self.timers_by_pattern.get(pattern, ()) if other is not timer]
+                if timer.is_active and self.timers_by_key.get(timer.key) is timer:
+                    timers.append(timer)
+                if timers:
+                    self.timers_by_pattern[pattern] = timers
+                else:
+                    self.timers_by_pattern.pop(pattern, None)
+        self.update_resource_timers(changed_timers)
+        if self.timers_by_pattern.keys() == self.matcher.patterns:
+            return
+
+        self.matcher = ProcessMatcher(self.timers_by_pattern, self.matcher)
+        self.scan_worker.matcher = self.matcher # Only ever replaced, and its cache is safe to share
+        self.pattern_counts = {}
+        self.watched_names = set()
+        for name, pids in self.process_snapshot.pids_by_name.items():
+            patterns = self.matcher.match(name)
+            if patterns:
+                self.watched_names.add(name)
+                for pattern in patterns:
+                    self.pattern_counts[pattern] = self.pattern_counts.get(pattern, 0) + len(pids)
+        self.watched_names_changed = True
+
+    def update_resource_timers(self, changed_timers=None):
+        """
+        Re-indexes the active timers with a resource trigger (all of them, or only the
+        patterns of 'changed_timers') and tells the scan worker what to sample.
+        """
+        patterns = self.timers_by_pattern.keys() if changed_timers is None else {timer.process_name for timer in changed_timers}
+        if changed_timers is None:
+            self.resource_timers = {}
+        for pattern in patterns:
+            timers = [timer for timer in self.timers_by_pattern.get(pattern, ()) if timer.trigger is not None]
+            if timers:
+                self.resource_timers[pattern] = timers
+            else:
+                self.resource_timers.pop(pattern, None)
+
+        worker_matcher = self.scan_worker.resource_matcher
+        if not self.resource_timers:
+            if worker_matcher is not None:
+                self.scan_worker.set_resource_triggers(None, ())
+            return
+        metrics = {timer.trigger.metric for timers in self.resource_timers.values() for timer in timers}
+        if worker_matcher is None or worker_matcher.patterns != self.resource_timers.keys() or metrics != self.scan_worker.resource_metrics:
+            self.scan_worker.set_resource_triggers(ProcessMatcher(self.resource_timers, worker_matcher), metrics)
+
+    def seconds_to_next(self, timer):
+        """
+        Returns how long until the timer fires, or None if it isn't counting down.
+        In per-instance mode, that is its earliest instance.
+        """
+        deadline = timer.deadline
+        if self.per_instance:
+            deadlines = [instance.deadline for instance in self.instances.get(id(timer), {}).values() if instance.deadline is not None]
+            deadline = min(deadlines, default=None)
+        if deadline is None:
+            return None
+        return max(deadline - self.loop.time(), 0)
+
+    def instance_count(self, timer):
+        """
+        Returns how many running process instances the timer is counting down for (per-instance mode).
+        """
+        return len(self.instances.get(id(timer), ()))
+
+    def update_watched_names(self):
+        """
+        Only the process names matching an active timer are watched for PID reuse.
+        """
+        if self.watched_names_changed:
+            self.scan_worker.watched_names = frozenset(self.watched_names)
+            self.watched_names_changed = False
+
+    def drain_scan_results(self):
+        """
+        Applies the results published by the scan worker. This is all the process
+        tracking work done on the engine's thread; its duration is kept in drain_ms.
+        """
+        started = time.perf_counter()
+        drained = 0
+        while True:
+            try:
+                result = self.scan_worker.results.get_nowait()
+            except queue.Empty:
+                break
+            drained += 1
+            if isinstance(result, ResourceSamples):
+                self.check_resource_triggers(result)
+                continue
+            self.process_snapshot = result.snapshot
+            self.last_scan_ms = result.scan_seconds * 1000
+            self.stats.incr("process_events_total", len(result.events))
+            self.handle_process_events(result.events, result.detected_at, result.initial)
+        self.drain_ms = (time.perf_counter() - started) * 1000
+        self.max_drain_ms = max(self.max_drain_ms, self.drain_ms)
+        if drained:
+            self.stats.observe("apply_ms", self.drain_ms)
+
+    def handle_process_events(self, events, detected_at, initial=False):
+        """
+        The first process matching a pattern coming up, or the last one going away,
+        restarts the countdown of the pattern's timers, counted from when the process
+        started (see process_started_at) or from when the exit was detected. 'initial'
+        marks the events of the first scan, the processes that were already running.
+        """
+        restarted_patterns = {} # pattern -> loop time to count its timers from
+        instances_changed = False
+        watched_events = []
+        for event in events:
+            patterns = self.matcher.match(event.name)
+            if not patterns:
+                continue
+            watched_events.append(event)
+            started = event.kind == PROCESS_STARTED
+            if started:
+                self.watched_names.add(event.name)
+                self.watched_names_changed = True
+            elif event.instances == 0:
+                self.watched_names.discard(event.name)
+                self.watched_names_changed = True
+            for pattern in patterns:
+                count = self.pattern_counts.get(pattern, 0) + (1 if started else -1)
+                self.pattern_counts[pattern] = count
+                if count == (1 if started else 0):
+                    restarted_patterns[pattern] = detected_at if initial or not started else self.process_started_at(event, detected_at)
+                if self.per_instance:
+                    for timer in self.timers_by_pattern.get(pattern, ()):
+                        if timer.trigger is not None:
+                            continue
+                        if started:
+                            self.add_instance(timer, event.pid, event.create_time)
+                        else:
+                            self.remove_instance(timer, event.pid)
+                        instances_changed = True
+        if watched_events and self.process_listeners:
+            detected_at_wall = self.wall_clock() - (self.loop.time() - detected_at)
+            for listener in self.process_listeners:
+                listener(watched_events, detected_at_wall)
+        if self.per_instance:
+            if instances_changed:
+                self.arm_deadline_timer()
+            return
+        if not restarted_patterns:
+            return
+
+        for pattern, started_at in restarted_patterns.items():
+            for timer in self.timers_by_pattern.get(pattern, ()):
+                if not self.is_process_running(timer.process_name):
+                    timer.elapsed = 0.0 # The process went away, its next run starts from zero
+                self.restart_timer(timer, started_at)
+                self.save_timer_state(timer)
+        self.arm_deadline_timer()
+
+    def process_started_at(self, event, detected_at):
+        """
+        Returns when (on the loop clock) a process reported as started came up: its
+        create_time, so a countdown doesn't lose the time the process ran before a sparse
+        scan noticed it. Clamped to the scan interval ceiling before the detection, which
+        is the latest a scan can notice a start, so a wrong or skewed clock (e.g. another
+        machine's) can't move it further.
+        """
+        if event.create_time is None:
+            return detected_at
+        started_at = self.loop.time() - (self.wall_clock() - event.create_time)
+        return min(max(started_at, detected_at - self.scan_worker.max_interval), detected_at)
+
+    # --- Scheduling ---
+
+    def restart_timer(self, timer, started_at=None):
+        """
+        Starts the timer's countdown (from now, unless given) if it is active and its
+        process is running, otherwise takes it off the schedule. Progress restored from
+        the state store is carried into the countdown.
+        In per-instance mode, recreates the countdowns of its running instances instead.
+        Timers with a resource trigger have no countdown (see check_resource_triggers).
+        """
+        if timer.trigger is not None:
+            return
+        if self.per_instance:
+            self.restart_instances(timer)
+            return
+        if timer.is_active and self.is_process_running(timer.process_name):
+            if started_at is None:
+                started_at = self.loop.time()
+            self.scheduler.schedule(timer, started_at + timer.interval_minutes * 60 - timer.elapsed)
+            timer.elapsed = 0.0
+        else:
+            self.scheduler.cancel(timer)
+
+    def restart_instances(self, timer):
+        """
+        Per-instance mode: starts a countdown for every running process matching the timer, if it is active.
+        """
+        self.cancel_instances(timer)
+        if not timer.is_active:
+            return
+        for name, pids in self.process_snapshot.pids_by_name.items():
+            if timer.process_name in self.matcher.match(name):
+                for pid in pids:
+                    self.add_instance(timer, pid, self.process_snapshot.create_time(pid))
+
+    def cancel_instances(self, timer):
+        for instance in self.instances.pop(id(timer), {}).values():
+            self.scheduler.cancel(instance)
+
+    def add_instance(self, timer, pid, create_time):
+        """
+        Starts the countdown of one process instance. Its deadlines are anchored to the
+        process' create_time (wall clock), carried over to the monotonic clock once here.
+        """
+        instances = self.instances.setdefault(id(timer), {})
+        if pid in instances:
+            return
+        now = self.loop.time()
+        anchor = now if create_time is None else now - max(self.wall_clock() - create_time, 0)
+        instance = TimerInstance(timer, pid, anchor)
+        instances[pid] = instance
+        self.scheduler.schedule(instance, self.instance_deadline(instance, now))
+
+    def remove_instance(self, timer, pid):
+        instance = self.instances.get(id(timer), {}).pop(pid, None)
+        if instance is not None:
+            self.scheduler.cancel(instance)
+
+    def instance_deadline(self, instance, now):
+        """
+        Returns the first deadline of a process instance after 'now': its start plus a whole number of intervals.
+        """
+        interval = instance.timer.interval_minutes * 60
+        return instance.anchor + (math.floor((now - instance.anchor) / interval) + 1) * interval
+
+    def arm_deadline_timer(self):
+        """
+        Arms a single callback for the earliest deadline, replacing the previous one.
+        """
+        if self.deadline_handle is not None:
+            self.loop.cancel(self.deadline_handle)
+            self.deadline_handle = None
+        deadline = self.scheduler.next_deadline()
+        if deadline is not None:
+            self.deadline_handle = self.loop.call_later(deadline - self.loop.time(), self.fire_due_timers)
+        self.update_scan_hints()
+
+    def update_scan_hints(self):
+        """
+        Lets the scan worker pace its scans: none at all while no timer is active, and one
+        right before the earliest deadline. Called whenever the schedule changes. Brings the
+        next tick forward if it was scheduled at a slower cadence than the schedule now needs.
+        """
+        active = bool(self.timers_by_pattern)
+        resumed = active and not self.scan_worker.active
+        self.scan_worker.set_hints(active, self.scheduler.next_deadline())
+        # Scans resume, or the first countdown started while a front-end shows them: pick
+        # them up at the fast cadence instead of waiting out the idle tick
+        if self.tick_handle is not None and (resumed or self.next_tick - self.loop.time() > self.tick_interval()):
+            self.loop.cancel(self.tick_handle)
+            self.schedule_tick(TIMER_CHECK_INTERVAL_MS / 1000)
+
+    def tick_interval(self):
+        """
+        Returns the delay (in seconds) until the next tick: every second while a front-end
+        shows countdowns, otherwise in step with the scan worker's current interval.
+        """
+        if self.tick_listeners and len(self.scheduler):
+            return TIMER_CHECK_INTERVAL_MS / 1000
+        if not self.scan_worker.active:
+            return self.scan_worker.max_interval
+        return self.scan_worker.interval_seconds
+
+    def fire_due_timers(self):
+        """
+        Notifies for every timer whose deadline has passed and schedules its next firing.
+        """
+        self.deadline_handle = None
+        # Catch up with the scan worker first, so a process that just exited doesn't notify
+        self.drain_scan_results()
+        now = self.loop.time()
+        for entry, deadline in self.scheduler.pop_due(now):
+            timer = getattr(entry, "timer", entry) # Per-instance countdowns point at their timer
+            self.stats.observe("scheduling_lag_ms", (now - deadline) * 1000)
+            self.notify_timer(timer, getattr(entry, "pid", None))
+            if entry is not timer:
+                self.scheduler.schedule(entry, self.instance_deadline(entry, now))
+            else:
+                # Keep the cadence anchored to the deadline, unless we are more than an interval late
+                next_deadline = deadline + timer.interval_minutes * 60
+                self.scheduler.schedule(timer, next_deadline if next_deadline > now else now + timer.interval_minutes * 60)
+            self.save_timer_state(timer)
+        self.arm_deadline_timer()
+
+    def notify_timer(self, timer, pid=None):
+        timer.last_fired = self.wall_clock()
+        notify_started = time.perf_counter()
+        self.notify(timer, pid)
+        self.stats.observe("notify_ms", (time.perf_counter() - notify_started) * 1000)
+        self.stats.incr("notifications_total")
+
+    def check_resource_triggers(self, result):
+        """
+        Records a round of resource samples from the scan worker, and notifies for the
+        resource-triggered timers whose process has been above the threshold for the whole
+        window. Such a timer notifies again after its interval if the process still is.
+        """
+        self.resource_monitor.record(result.samples, result.sampled_at)
+        pids_by_pattern = {}
+        for pid, (name, *_) in result.samples.items():
+            for pattern in self.matcher.match(name):
+                pids_by_pattern.setdefault(pattern, []).append(pid)
+        wall_now = self.wall_clock()
+        for pattern, timers in self.resource_timers.items():
+            pids = pids_by_pattern.get(pattern)
+            if not pids:
+                continue
+            for timer in timers:
+                if timer.last_fired is not None and wall_now - timer.last_fired < timer.interval_minutes * 60:
+                    continue
+                if self.resource_monitor.breached(timer.trigger, pids, result.sampled_at):
+                    self.notify_timer(timer)
+                    self.save_timer_state(timer)
+
+    def tick(self):
+        """
+        Main loop to pick up the scan worker's results and let the front-end refresh.
+        Notifications are fired separately, by fire_due_timers, right on their deadline.
+        """
+        started = time.perf_counter()
+        self.update_watched_names()
+        self.drain_scan_results()
+        for listener in self.tick_listeners:
+            listener()
+        self.stats.incr("ticks_total")
+        self.stats.set("timers", len(self.timers))
+        self.stats.set("scheduled_timers", len(self.scheduler))
+        self.stats.set("scan_interval_ms", self.scan_worker.interval_seconds * 1000 if self.scan_worker.active else 0)
+        self.stats.observe("tick_ms", (time.perf_counter() - started) * 1000)
+        self.schedule_tick(self.tick_interval())
+
+    def schedule_tick(self, delay):
+        self.next_tick = self.loop.time() + delay
+        self.tick_handle = self.loop.call_later(delay, self.tick)
+
+    def tick_now(self):
+        """
+        Runs the next tick right away, unless the engine has stopped.
+        """
+        if self.tick_handle is not None:
+            self.loop.cancel(self.tick_handle)
+            self.tick()
+
+    # --- Stats ---
+
+    def export_stats(self, reschedule=True):
+        """
+        Writes the stats to the export file set in stats_export (see Stats.export).
+        """
+        path, export_format = self.stats_export
+        try:
+            self.stats.export(path, export_format)
+        except OSError as e:
+            print(f"Failed to export stats: {e}")
+        if reschedule:
+            self.stats_export_handle = self.loop.call_later(STATS_EXPORT_SECONDS, self.export_stats)
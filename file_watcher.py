@@ -0,0 +1,117 @@
+'''
+Watching the timers file for changes, so it can be reloaded without clicking "Load".
+
+On Linux the file's directory is watched with inotify (editors often save by writing a
+new file and renaming it over the old one, which a watch on the file itself would miss).
+Elsewhere, or if inotify can't be used, the file's mtime and size are polled.
+'''
+
+import os
+import selectors
+import socket
+import struct
+import sys
+import threading
+
+FILE_POLL_SECONDS = 2 # How often the fallback checks the file
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+INOTIFY_EVENT = struct.Struct("=iIII") # wd, mask, cookie, len
+
+
+def open_inotify(directory):
+    """
+    Returns an inotify file descriptor watching the directory, or None if inotify can't be used.
+    """
+    if not sys.platform.startswith("linux"):
+        return None
+    import ctypes # Only needed here, on the watcher's thread
+    import ctypes.util
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    if libc.inotify_add_watch(fd, os.fsencode(directory), WATCH_MASK) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+def read_inotify_names(fd):
+    """
+    Returns the names of the directory entries in the pending inotify events.
+    """
+    names = set()
+    while True:
+        try:
+            data = os.read(fd, 65536)
+        except BlockingIOError:
+            return names
+        offset = 0
+        while offset + INOTIFY_EVENT.size <= len(data):
+            _, _, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            names.add(os.fsdecode(data[offset:offset + length].rstrip(b"\0")))
+            offset += length
+
+
+def file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+class FileWatcher(threading.Thread):
+    """
+    Calls on_change() (on the watcher's thread) whenever the file may have changed.
+    Several calls can come for a single save; the caller is expected to debounce.
+    """
+    def __init__(self, path, on_change):
+        super().__init__(name="file-watcher", daemon=True)
+        self.path = os.path.abspath(path)
+        self.on_change = on_change
+        self.wakeup_reader, self.wakeup_writer = socket.socketpair()
+        self.stopping = threading.Event()
+
+    def stop(self):
+        self.stopping.set()
+        self.wakeup_writer.send(b"\0")
+
+    def run(self):
+        selector = selectors.DefaultSelector()
+        selector.register(self.wakeup_reader, selectors.EVENT_READ)
+        inotify_fd = open_inotify(os.path.dirname(self.path))
+        if inotify_fd is not None:
+            selector.register(inotify_fd, selectors.EVENT_READ)
+        name = os.path.basename(self.path)
+        signature = file_signature(self.path)
+
+        while not self.stopping.is_set():
+            ready = selector.select(None if inotify_fd is not None else FILE_POLL_SECONDS)
+            if self.stopping.is_set():
+                break
+            if inotify_fd is not None:
+                if any(key.fd == inotify_fd for key, _ in ready) and name in read_inotify_names(inotify_fd):
+                    self.on_change()
+            else:
+                new_signature = file_signature(self.path)
+                if new_signature != signature:
+                    signature = new_signature
+                    self.on_change()
+
+        if inotify_fd is not None:
+            os.close(inotify_fd)
+        selector.close()
@@ -0,0 +1,384 @@
+'''
+The Tk front-end over the timer engine.
+'''
+
+import tkinter as tk
+from tkinter import messagebox
+import math
+import time
+from engine import TimerEngine, TIMERS_FILE_NAME, SCAN_INTERVAL_CEILING_SECONDS, PER_INSTANCE_TIMERS, WATCH_TIMERS_FILE
+from timer_view import TimerListView, timer_row_text
+from notifications import NotificationDispatcher, SoundPlayer
+
+# --- Constants for Notification Window ---
+NOTIFICATION_WIDTH = 350
+NOTIFICATION_HEIGHT = 100
+NOTIFICATION_DURATION_MS = 5000  # 5 seconds
+NOTIFICATION_POOL_SIZE = 3 # Popup windows kept for reuse; at most this many are on screen at once
+NOTIFICATION_GAP = 10 # Space between stacked popups
+SOUND_FILE = "notification_sound.wav" # Specify the name of your sound file here
+
+class TkLoop:
+    """
+    Lets the engine schedule its callbacks on the Tk event loop.
+    """
+    def __init__(self, root):
+        self.root = root
+
+    def time(self):
+        return time.monotonic()
+
+    def call_later(self, delay, callback):
+        return self.root.after(max(0, math.ceil(delay * 1000)), callback)
+
+    def cancel(self, handle):
+        self.root.after_cancel(handle)
+
+    def call_soon_threadsafe(self, callback):
+        # With a threaded Tcl (the default), tkinter hands calls made from other threads
+        # over to the thread running mainloop
+        self.root.after(0, callback)
+
+class PopupPool:
+    """
+    A few notification popups, created once and then shown and withdrawn instead of being
+    rebuilt for every notification. Visible popups are stacked upwards from the bottom
+    right corner of the screen; when all of them are in use, the oldest one is reused.
+    """
+    def __init__(self, root, size=NOTIFICATION_POOL_SIZE):
+        self.root = root
+        self.size = size
+        self.free = []
+        self.visible = [] # Oldest first
+
+    def create_popup(self):
+        window = tk.Toplevel(self.root)
+        window.withdraw()
+        window.overrideredirect(True)
+        window.attributes("-topmost", True)
+
+        frame = tk.Frame(window, bg="#37df12", relief="solid", bd=2)
+        frame.pack(fill="both", expand=True)
+
+        label = tk.Label(frame, bg="#37fd12", fg="black", wraplength=NOTIFICATION_WIDTH - 20)
+        label.pack(pady=20, padx=10)
+        return {"window": window, "frame": frame, "label": label, "height": 0, "hide_handle": None}
+
+    def show(self, messages):
+        """
+        Shows the messages, one per line, in a single popup for NOTIFICATION_DURATION_MS.
+        """
+        if self.free:
+            popup = self.free.pop()
+        elif len(self.visible) < self.size:
+            popup = self.create_popup()
+        else:
+            popup = self.visible.pop(0)
+            self.root.after_cancel(popup["hide_handle"])
+
+        popup["label"].config(text="\n".join(messages), font=("Helvetica", 20 if len(messages) == 1 else 14))
+        popup["window"].update_idletasks()
+        popup["height"] = max(NOTIFICATION_HEIGHT, popup["frame"].winfo_reqheight())
+        x_pos = self.root.winfo_screenwidth() - NOTIFICATION_WIDTH - 20
+        y_pos = self.root.winfo_screenheight() - 20 - popup["height"] - sum(other["height"] + NOTIFICATION_GAP for other in self.visible)
+        popup["window"].geometry(f"{NOTIFICATION_WIDTH}x{popup['height']}+{x_pos}+{y_pos}")
+        popup["window"].deiconify()
+
+        self.visible.append(popup)
+        popup["hide_handle"] = self.root.after(NOTIFICATION_DURATION_MS, lambda: self.hide(popup))
+
+    def hide(self, popup):
+        popup["window"].withdraw()
+        popup["hide_handle"] = None
+        self.visible.remove(popup)
+        self.free.append(popup)
+
+class ProcessMonitorApp(tk.Tk):
+    """
+    A Tkinter application to monitor processes and send timed notifications.
+    This version includes a UI to view active timers and the ability to save/load them,
+    as well as activate/deactivate and delete individual timers. The notification
+    logic is now based on the total elapsed time of the process and includes sound.
+    """
+    def __init__(self, timers_file=TIMERS_FILE_NAME, stats=None, stats_export=None, scan_ceiling_seconds=SCAN_INTERVAL_CEILING_SECONDS, per_instance=PER_INSTANCE_TIMERS, sinks=(), control_socket=None, watch_timers_file=WATCH_TIMERS_FILE, history=None, hub=None, profiler=None):
+        super().__init__()
+        self.title("Process Timer")
+        self.geometry("450x600")  # Adjusted window size
+        self.minsize(450, 600) # Set the minimum allowed size of the window
+        self.config(bg="#f0f0f0")
+
+        self.stats = stats # A stats.Stats when instrumentation is on
+        self.profiler = profiler # A profiler.Profiler with --profile / --trace-alloc
+        if profiler is not None:
+            # Hooked before the dispatcher and the engine's listeners keep references to them
+            profiler.hook(self, "update_timers_listbox")
+            profiler.hook(self, "show_notification")
+        loop = TkLoop(self)
+        self.notifications = NotificationDispatcher(loop, self.show_notification, stats=stats)
+        self.notifications.sinks = list(sinks) # Unstarted sinks.Sink objects
+        if history is not None:
+            self.notifications.sinks.append(history) # An unstarted history.HistorySink
+        for sink in self.notifications.sinks:
+            sink.start()
+        self.popups = PopupPool(self)
+        self.sound = SoundPlayer(SOUND_FILE)
+        self.engine = TimerEngine(loop, self.on_timer_fired, timers_file, stats=stats, scan_ceiling_seconds=scan_ceiling_seconds, per_instance=per_instance,
+                                  watch_timers_file=watch_timers_file, remote_hub=hub)
+        if profiler is not None:
+            profiler.hook_engine(self.engine)
+        self.engine.tick_listeners.append(self.on_engine_tick)
+        self.engine.change_listeners.append(self.update_timers_listbox) # Batches from the control socket and reloads
+        self.engine.reload_listeners.append(self.on_timers_reloaded)
+        if history is not None:
+            self.engine.process_listeners.append(history.record_process_events)
+        self.reload_errors = []
+        self.engine.stats_export = stats_export
+        self.control_socket = control_socket
+        self.history = history
+        self.control = None
+        
+        self.setup_ui()
+        # The timers file and the process table are only read once the window has been drawn
+        self.after_idle(self.start_engine)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def start_engine(self):
+        """
+        Starts the engine (and its first process scan), loads the timers and serves the control socket.
+        """
+        self.update_idletasks() # Finish drawing the window first
+        self.engine.start()
+        if self.profiler is not None:
+            self.profiler.start(self.engine.loop)
+        self.load_timers()
+        if self.control_socket is not None:
+            from control import ControlServer # Only imported when it is used
+            self.control = ControlServer(self.engine, self.control_socket, self.history)
+            try:
+                self.control.start()
+            except OSError as e:
+                self.control = None
+                messagebox.showerror("Error", f"Failed to start the control socket: {e}")
+
+    @property
+    def timers(self):
+        return self.engine.timers
+
+    def setup_ui(self):
+        """
+        Sets up the main application UI elements, including a listbox for timers
+        and buttons for saving, loading, toggling, and deleting.
+        """
+        # Main frame with padding
+        main_frame = tk.Frame(self, padx=20, pady=20, bg="#f0f0f0")
+        main_frame.pack(expand=True, fill="both")
+
+        # Title
+        title_label = tk.Label(main_frame, text="Process Timer Setup", font=("Helvetica", 16, "bold"), bg="#f0f0f0")
+        title_label.pack(pady=(0, 20))
+
+        # --- Input Section ---
+        input_frame = tk.Frame(main_frame, bg="#f0f0f0")
+        input_frame.pack(fill="x")
+
+        tk.Label(input_frame, text="Process Name (e.g., chrome.exe or Roblox*.exe):", bg="#f0f0f0", font=("Helvetica", 10)).pack(anchor="w")
+        self.process_name_entry = tk.Entry(input_frame, bd=2, relief="groove")
+        self.process_name_entry.pack(pady=5, fill="x")
+
+        tk.Label(input_frame, text="Interval (in minutes):", bg="#f0f0f0", font=("Helvetica", 10)).pack(anchor="w")
+        self.interval_entry = tk.Entry(input_frame, bd=2, relief="groove")
+        self.interval_entry.pack(pady=5, fill="x")
+
+        tk.Label(input_frame, text="Notification Message:", bg="#f0f0f0", font=("Helvetica", 10)).pack(anchor="w")
+        self.message_entry = tk.Entry(input_frame, bd=2, relief="groove")
+        self.message_entry.pack(pady=5, fill="x")
+
+        # --- Buttons Section ---
+        button_frame = tk.Frame(main_frame, bg="#f0f0f0")
+        button_frame.pack(pady=20, fill="x")
+        
+        tk.Button(button_frame, text="Add Timer", command=self.add_timer, bg="#4CAF50", fg="white", font=("Helvetica", 10, "bold")).pack(side="left", padx=5, expand=True, fill="x")
+        tk.Button(button_frame, text="Save Timers", command=self.save_timers, bg="#2196F3", fg="white", font=("Helvetica", 10, "bold")).pack(side="left", padx=5, expand=True, fill="x")
+        tk.Button(button_frame, text="Load Timers", command=self.load_timers, bg="#FFC107", fg="white", font=("Helvetica", 10, "bold")).pack(side="left", padx=5, expand=True, fill="x")
+
+        # --- Timers Display Section ---
+        tk.Label(main_frame, text="Active Timers", font=("Helvetica", 12, "bold"), bg="#f0f0f0").pack(pady=(20, 5))
+        self.timers_listbox = tk.Listbox(main_frame, height=10, bd=2, relief="groove")
+        self.timers_listbox.pack(pady=10, fill="both", expand=True)
+        self.timer_view = TimerListView(self.timers_listbox, lambda i, timer: timer_row_text(self.engine, i, timer))
+
+        # --- Timer Management Buttons ---
+        manage_button_frame = tk.Frame(main_frame, bg="#f0f0f0")
+        manage_button_frame.pack(fill="x")
+
+        self.toggle_button = tk.Button(manage_button_frame, text="Toggle Status", command=self.toggle_timer_status, state=tk.DISABLED, bg="#9E9E9E", fg="white", font=("Helvetica", 10, "bold"))
+        self.toggle_button.pack(side="left", padx=5, expand=True, fill="x")
+
+        self.delete_button = tk.Button(manage_button_frame, text="Delete Selected", command=self.delete_timer, state=tk.DISABLED, bg="#F44336", fg="white", font=("Helvetica", 10, "bold"))
+        self.delete_button.pack(side="left", padx=5, expand=True, fill="x")
+
+        # --- Scan Latency Status ---
+        self.status_label = tk.Label(main_frame, text="", bg="#f0f0f0", fg="#757575", font=("Helvetica", 8))
+        self.status_label.pack(pady=(10, 0), anchor="w")
+
+        # --- Collapsible Stats Panel (only with instrumentation on) ---
+        if self.stats is not None:
+            self.stats_button = tk.Button(main_frame, text="Show Stats", command=self.toggle_stats_panel, relief="flat", bg="#f0f0f0", fg="#2196F3", font=("Helvetica", 8, "underline"))
+            self.stats_button.pack(anchor="w")
+            self.stats_label = tk.Label(main_frame, text="", bg="#f0f0f0", justify="left", anchor="w", font=("Courier", 8))
+
+        # Bind an event to the listbox to enable/disable buttons
+        self.timers_listbox.bind("<<ListboxSelect>>", self.on_listbox_select)
+
+    def on_listbox_select(self, event):
+        """
+        Enables or disables the management buttons based on listbox selection.
+        """
+        selected_index = self.timers_listbox.curselection()
+        if selected_index:
+            self.toggle_button.config(state=tk.NORMAL)
+            self.delete_button.config(state=tk.NORMAL)
+        else:
+            self.toggle_button.config(state=tk.DISABLED)
+            self.delete_button.config(state=tk.DISABLED)
+
+    def toggle_timer_status(self):
+        """
+        Toggles the 'is_active' status of the selected timer.
+        """
+        selected_index = self.timers_listbox.curselection()
+        if selected_index:
+            index = selected_index[0]
+            self.engine.toggle_timer(self.timers[index])
+            self.update_timers_listbox()
+
+    def delete_timer(self):
+        """
+        Deletes the selected timer from the list.
+        """
+        selected_index = self.timers_listbox.curselection()
+        if selected_index:
+            index = selected_index[0]
+            self.engine.remove_timer(self.timers[index])
+            self.update_timers_listbox()
+            self.on_listbox_select(None) # Reset button states
+
+    def add_timer(self):
+        """
+        Adds a new timer based on user input.
+        """
+        process_name = self.process_name_entry.get().strip()
+        interval_str = self.interval_entry.get().strip()
+        message = self.message_entry.get().strip()
+        
+        if not process_name or not interval_str or not message:
+            messagebox.showerror("Input Error", "All fields are required.")
+            return
+
+        try:
+            interval_minutes = int(interval_str)
+            if interval_minutes <= 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Input Error", "Interval must be a positive integer.")
+            return
+
+        try:
+            self.engine.add_timer(process_name, interval_minutes, message) # Starts the timer immediately
+        except ValueError as e:
+            messagebox.showerror("Input Error", str(e))
+            return
+        self.update_timers_listbox()
+        
+        # Clear input fields
+        self.process_name_entry.delete(0, tk.END)
+        self.interval_entry.delete(0, tk.END)
+        self.message_entry.delete(0, tk.END)
+
+    def save_timers(self):
+        """
+        Saves the current list of timers to a text file, including active status.
+        """
+        try:
+            self.engine.save_timers()
+            messagebox.showinfo("Success", f"Timers saved to {self.engine.timers_file}")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to save timers: {e}")
+
+    def load_timers(self):
+        """
+        Loads timers from a text file and adds them to the application.
+        """
+        try:
+            self.engine.load_timers()
+            if self.engine.file_errors:
+                messagebox.showwarning("Warning", f"Timers loaded from {self.engine.timers_file}, skipping invalid lines:\n" +
+                                       "\n".join(f"Line {line_number}: {error}" for line_number, line, error in self.engine.file_errors[:10]))
+            else:
+                messagebox.showinfo("Success", f"Timers loaded from {self.engine.timers_file}")
+        except FileNotFoundError:
+            messagebox.showinfo("Info", "No saved timers found.")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load timers: {e}")
+        self.update_timers_listbox()
+
+    def update_timers_listbox(self):
+        """
+        Updates the listbox with the current timers and their status; only rows whose text changed are redrawn.
+        """
+        started = time.perf_counter()
+        self.timer_view.render(self.timers)
+        self.engine.stats.observe("render_ms", (time.perf_counter() - started) * 1000)
+
+    def show_notification(self, timers):
+        """
+        Displays a pop-up notification with the messages of a burst of timers and plays a sound.
+        """
+        self.popups.show([timer.message for timer in timers])
+        self.sound.play() # On the sound player's thread
+
+    def on_close(self):
+        """
+        Saves the timers' progress before the window goes away.
+        """
+        self.notifications.cancel()
+        if self.control is not None:
+            self.control.stop()
+        self.engine.stop()
+        if self.profiler is not None:
+            self.profiler.stop()
+        for sink in self.notifications.sinks:
+            sink.close()
+        self.destroy()
+
+    def on_timer_fired(self, timer, pid=None):
+        self.notifications.dispatch(timer, pid)
+
+    def on_timers_reloaded(self, changes, errors):
+        """
+        Reports problems with the timers file after it was reloaded, once per new set of problems.
+        """
+        if errors and errors != self.reload_errors:
+            messagebox.showwarning("Warning", "Problems in the timers file:\n" + "\n".join(errors[:10]))
+        self.reload_errors = errors
+
+    def on_engine_tick(self):
+        """
+        Refreshes the timers list and the status line after every engine tick.
+        """
+        self.update_timers_listbox()
+        self.status_label.config(text=f"Scan: {self.engine.last_scan_ms:.1f} ms (background) | UI: {self.engine.drain_ms:.2f} ms (max {self.engine.max_drain_ms:.2f} ms)")
+        if self.stats is not None and self.stats_label.winfo_ismapped():
+            self.stats_label.config(text="\n".join(self.stats.summary_lines()))
+
+    def toggle_stats_panel(self):
+        """
+        Shows or hides the stats panel.
+        """
+        if self.stats_label.winfo_ismapped():
+            self.stats_label.pack_forget()
+            self.stats_button.config(text="Show Stats")
+        else:
+            self.stats_label.config(text="\n".join(self.stats.summary_lines()))
+            self.stats_label.pack(anchor="w", fill="x")
+            self.stats_button.config(text="Hide Stats")
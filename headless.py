@@ -0,0 +1,138 @@
+'''
+Runs the timer engine without a window, printing notifications to stdout.
+'''
+
+import heapq
+import itertools
+import queue
+import threading
+import time
+from datetime import datetime
+
+from engine import TimerEngine, SCAN_INTERVAL_CEILING_SECONDS, PER_INSTANCE_TIMERS, WATCH_TIMERS_FILE
+from notifications import NotificationDispatcher
+
+
+class HeadlessLoop:
+    """
+    A minimal event loop for the engine: a heap of callbacks run on the calling thread.
+    """
+    def __init__(self):
+        self.callbacks = []  # [when, sequence, callback], callback is None once cancelled
+        self.sequence = itertools.count()
+        self.pending = queue.SimpleQueue() # Callbacks handed over by other threads
+        self.wakeup = threading.Event()
+        self.stopping = False
+
+    def time(self):
+        return time.monotonic()
+
+    def call_later(self, delay, callback):
+        handle = [self.time() + max(delay, 0), next(self.sequence), callback]
+        heapq.heappush(self.callbacks, handle)
+        return handle
+
+    def cancel(self, handle):
+        handle[-1] = None
+
+    def call_soon_threadsafe(self, callback):
+        self.pending.put(callback)
+        self.wakeup.set()
+
+    def stop(self):
+        """
+        Makes run() return; safe to call from another thread or a signal handler.
+        """
+        self.stopping = True
+        self.wakeup.set()
+
+    def run(self):
+        while not self.stopping:
+            while True:
+                try:
+                    callback = self.pending.get_nowait()
+                except queue.Empty:
+                    break
+                callback()
+            while self.callbacks and self.callbacks[0][-1] is None:
+                heapq.heappop(self.callbacks)
+            delay = self.callbacks[0][0] - self.time() if self.callbacks else None
+            if delay is None or delay > 0:
+                self.wakeup.wait(delay)
+                self.wakeup.clear()
+                continue
+            callback = heapq.heappop(self.callbacks)[-1]
+            callback()
+
+
+def print_notifications(timers):
+    for timer in timers:
+        print(f"[{datetime.now():%H:%M:%S}] {timer.process_name}: {timer.message}", flush=True)
+
+
+def print_reload(changes, errors):
+    if changes is not None and any(changes):
+        print(f"[{datetime.now():%H:%M:%S}] Reloaded the timers file: {changes[0]} added, {changes[1]} removed, {changes[2]} changed", flush=True)
+    for error in errors:
+        print(error, flush=True)
+
+
+def run_headless(timers_file, stats=None, stats_export=None, scan_ceiling_seconds=SCAN_INTERVAL_CEILING_SECONDS, per_instance=PER_INSTANCE_TIMERS, sinks=(), control_socket=None, watch_timers_file=WATCH_TIMERS_FILE, history=None, hub=None, profiler=None):
+    """
+    Loads the timers file and runs until interrupted (Ctrl+C). Returns an exit code.
+    'sinks' are unstarted sinks.Sink objects to also send the notifications to.
+    With 'control_socket' (a path), the control API is served there (see control.py).
+    With 'history' (an unstarted history.HistorySink), notifications and process sessions are recorded.
+    With 'hub' (a listening remote.RemoteHub), the processes of the machines running an agent are watched too.
+    With 'profiler' (a profiler.Profiler), the hot path is profiled and reports are written periodically.
+    """
+    loop = HeadlessLoop()
+    notifications = NotificationDispatcher(loop, print_notifications, stats=stats)
+    engine = TimerEngine(loop, notifications.dispatch, timers_file, stats=stats, scan_ceiling_seconds=scan_ceiling_seconds, per_instance=per_instance,
+                         watch_timers_file=watch_timers_file, remote_hub=hub)
+    if profiler is not None:
+        profiler.hook(notifications, "show", "show_notification")
+        profiler.hook_engine(engine)
+    engine.stats_export = stats_export
+    try:
+        count = engine.load_timers()
+    except OSError as e:
+        print(f"Failed to load timers: {e}")
+        return 1
+    print(f"Loaded {count} timers from {timers_file}", flush=True)
+    for line_number, line, error in engine.file_errors:
+        print(f"Skipped line {line_number}: {error}: {line}", flush=True)
+    engine.reload_listeners.append(print_reload)
+    if history is not None:
+        engine.process_listeners.append(history.record_process_events)
+
+    control = None
+    if control_socket is not None:
+        from control import ControlServer # Only imported when it is used
+        control = ControlServer(engine, control_socket, history)
+        try:
+            control.start()
+        except OSError as e:
+            print(f"Failed to start the control socket: {e}")
+            return 1
+
+    notifications.sinks = list(sinks) + ([history] if history is not None else [])
+    for sink in notifications.sinks:
+        sink.start()
+    engine.start()
+    if profiler is not None:
+        profiler.start(loop)
+    try:
+        loop.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if control is not None:
+            control.stop()
+        engine.stop()
+        if profiler is not None:
+            profiler.stop()
+        notifications.flush() # Don't lose a burst that was still being coalesced
+        for sink in notifications.sinks:
+            sink.close()
+    return 0
@@ -0,0 +1,191 @@
+'''
+A history of the notifications and of the watched processes' sessions (from the first
+instance of a process name starting to the last one exiting), in an SQLite database,
+to answer questions like "how long did RobloxPlayerBeta.exe run this week" or "which
+timers fire most".
+
+The database is written by a sink (see sinks.py): the engine's thread only queues the
+events, and the sink's thread writes them in batches, one transaction per batch. The
+newest events are also kept in memory for the front-ends, and the notifications are
+counted per day as they are written, so counting them over months only reads a row per
+timer and day.
+'''
+
+from collections import deque
+import math
+import os
+import sqlite3
+import time
+
+from processes import PROCESS_STARTED, PROCESS_EXITED
+from sinks import Sink
+
+HISTORY_RECENT_EVENTS = 200 # Newest events kept in memory (see HistorySink.recent)
+HISTORY_BUSY_TIMEOUT_SECONDS = 5
+DAY_SECONDS = 86400
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notifications (time REAL NOT NULL, timer_key TEXT NOT NULL, process TEXT NOT NULL, message TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS notifications_time ON notifications (time);
+CREATE INDEX IF NOT EXISTS notifications_timer ON notifications (timer_key, time);
+CREATE INDEX IF NOT EXISTS notifications_process ON notifications (process, time);
+CREATE TABLE IF NOT EXISTS notification_days (day INTEGER NOT NULL, timer_key TEXT NOT NULL, count INTEGER NOT NULL,
+                                              PRIMARY KEY (day, timer_key)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sessions (id INTEGER PRIMARY KEY, process TEXT NOT NULL, started REAL NOT NULL, ended REAL);
+CREATE INDEX IF NOT EXISTS sessions_process ON sessions (process, ended);
+CREATE INDEX IF NOT EXISTS sessions_ended ON sessions (ended);
+"""
+
+
+def history_path(timers_file):
+    """
+    Returns the default history database path for the given timers file.
+    """
+    return f"{os.path.splitext(timers_file)[0]}_history.sqlite3"
+
+
+def connect(path):
+    connection = sqlite3.connect(path, timeout=HISTORY_BUSY_TIMEOUT_SECONDS)
+    connection.execute("PRAGMA journal_mode=WAL") # Readers don't wait for the writer
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+class HistorySink(Sink):
+    """
+    Records the notifications it is submitted, and the process sessions from
+    record_process_events() (an engine process listener), into the database at 'path'.
+    The queries run on the calling thread, on their own connection, which must always be
+    the same thread (the engine's). They see what the sink's thread has written so far.
+    """
+    def __init__(self, name, path, stats=None):
+        super().__init__(name, stats)
+        self.path = path
+        self.recent = deque(maxlen=HISTORY_RECENT_EVENTS) # The newest events, for the front-ends
+        self.connection = None # The sink thread's
+        self.reader = None # The querying thread's
+        self.open_sessions = {} # process -> id of its open session row (sink thread)
+
+    def submit(self, notification):
+        event = {"event": "notification", **notification}
+        self.recent.append(event)
+        super().submit(event)
+
+    def record_process_events(self, events, at):
+        """
+        Records the process sessions starting and ending with the given engine ProcessEvents, detected at 'at' (wall clock).
+        """
+        for event in events:
+            if event.instances == (1 if event.kind == PROCESS_STARTED else 0):
+                session_event = {"event": event.kind, "time": at, "process": event.name}
+                self.recent.append(session_event)
+                super().submit(session_event)
+
+    def close(self):
+        if self.is_alive():
+            super().submit({"event": "shutdown", "time": time.time()}) # Ends the open sessions
+        super().close()
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
+    def run(self):
+        try:
+            self.connection = connect(self.path)
+            # Sessions left open by a crash end at the last thing known to have happened
+            with self.connection:
+                self.connection.execute("""UPDATE sessions SET ended = MAX(started, COALESCE((SELECT MAX(time) FROM notifications), started))
+                                           WHERE ended IS NULL""")
+        except sqlite3.Error as e:
+            print(f"Failed to open the history database {self.path}: {e}")
+            self.connection = None
+        try:
+            super().run()
+        finally:
+            if self.connection is not None:
+                self.connection.close()
+
+    def send(self, events):
+        if self.connection is None:
+            raise OSError(f"the history database {self.path} couldn't be opened")
+        open_sessions = dict(self.open_sessions)
+        notifications = []
+        days = {} # (day, timer key) -> notifications
+        try:
+            with self.connection:
+                for event in events:
+                    kind = event["event"]
+                    if kind == "notification":
+                        notifications.append((event["time"], event["key"], event["process_name"], event["message"]))
+                        day = (int(event["time"] // DAY_SECONDS), event["key"])
+                        days[day] = days.get(day, 0) + 1
+                    elif kind == PROCESS_STARTED:
+                        if event["process"] not in open_sessions:
+                            cursor = self.connection.execute("INSERT INTO sessions (process, started) VALUES (?, ?)", (event["process"], event["time"]))
+                            open_sessions[event["process"]] = cursor.lastrowid
+                    elif kind == PROCESS_EXITED:
+                        session = open_sessions.pop(event["process"], None)
+                        if session is not None:
+                            self.connection.execute("UPDATE sessions SET ended = ? WHERE id = ?", (event["time"], session))
+                    elif kind == "shutdown":
+                        self.connection.executemany("UPDATE sessions SET ended = ? WHERE id = ?", [(event["time"], session) for session in open_sessions.values()])
+                        open_sessions = {}
+                self.connection.executemany("INSERT INTO notifications (time, timer_key, process, message) VALUES (?, ?, ?, ?)", notifications)
+                self.connection.executemany("""INSERT INTO notification_days (day, timer_key, count) VALUES (?, ?, ?)
+                                               ON CONFLICT (day, timer_key) DO UPDATE SET count = count + excluded.count""",
+                                            [(day, key, count) for (day, key), count in days.items()])
+        except sqlite3.Error as e:
+            raise OSError(str(e)) from e # Retried by the sink
+        self.open_sessions = open_sessions # Only once committed
+
+    # --- Queries ---
+
+    def query(self, sql, params):
+        try:
+            if self.reader is None:
+                self.reader = connect(self.path)
+            return self.reader.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            raise OSError(str(e)) from e
+
+    def top_timers(self, since, until, limit=10):
+        """
+        Returns the (timer key, notifications) of the timers that notified most between 'since' and 'until' (wall clock).
+        Whole days are read from the daily counts, only the partial days at either end from the notifications.
+        """
+        first_day, last_day = math.ceil(since / DAY_SECONDS), math.floor(until / DAY_SECONDS)
+        if first_day < last_day:
+            head_end, tail_start = first_day * DAY_SECONDS, last_day * DAY_SECONDS
+        else:
+            first_day = last_day = 0
+            head_end = tail_start = until
+        return self.query("""
+            SELECT timer_key, SUM(count) AS total FROM (
+                SELECT timer_key, count FROM notification_days WHERE day >= :first_day AND day < :last_day
+                UNION ALL SELECT timer_key, 1 FROM notifications WHERE time >= :since AND time < :head_end
+                UNION ALL SELECT timer_key, 1 FROM notifications WHERE time >= :tail_start AND time < :until
+            ) GROUP BY timer_key ORDER BY total DESC, timer_key LIMIT :limit""",
+            {"first_day": first_day, "last_day": last_day, "since": since, "head_end": head_end, "tail_start": tail_start, "until": until, "limit": limit})
+
+    def process_runtime(self, since, until, process=None):
+        """
+        Returns the (process, seconds running) of the watched processes between 'since' and 'until' (wall clock),
+        longest first, or only for 'process' (case-insensitive). Open sessions count up to now.
+        """
+        condition = "AND process = :process" if process is not None else ""
+        return self.query(f"""
+            SELECT process, SUM(MIN(COALESCE(ended, :now), :until) - MAX(started, :since)) AS seconds FROM sessions
+            WHERE (ended > :since OR ended IS NULL) AND started < :until {condition}
+            GROUP BY process ORDER BY seconds DESC, process""",
+            {"since": since, "until": until, "now": time.time(), "process": None if process is None else process.casefold()})
+
+    def notifications(self, since, until, timer_key=None, limit=100):
+        """
+        Returns the (time, timer key, process, message) of the notifications between 'since' and 'until', newest first.
+        """
+        condition = "AND timer_key = :timer_key" if timer_key is not None else ""
+        return self.query(f"""
+            SELECT time, timer_key, process, message FROM notifications
+            WHERE time >= :since AND time < :until {condition} ORDER BY time DESC LIMIT :limit""",
+            {"since": since, "until": until, "timer_key": timer_key, "limit": limit})
@@ -1,322 +1,94 @@
 '''
-TODO:
-- Fix the timer still working while the timer is "Inactive".
+Process Timer: parses the command line and starts the Tk window or the headless runner.
 '''
 
-import tkinter as tk
-from tkinter import messagebox
-import psutil
-from datetime import datetime, timedelta
-import os
-#from playsound import playsound # Import the playsound library
-
-# --- Constants for Notification Window ---
-NOTIFICATION_WIDTH = 350
-NOTIFICATION_HEIGHT = 100
-NOTIFICATION_DURATION_MS = 5000  # 5 seconds
-TIMER_CHECK_INTERVAL_MS = 1000  # Check every 1 second
-TIMERS_FILE_NAME = "timers.txt"
-SOUND_FILE = "notification_sound.wav" # Specify the name of your sound file here
-
-class ProcessMonitorApp(tk.Tk):
-    """
-    A Tkinter application to monitor processes and send timed notifications.
-    This version includes a UI to view active timers and the ability to save/load them,
-    as well as activate/deactivate and delete individual timers. The notification
-    logic is now based on the total elapsed time of the process and includes sound.
-    """
-    def __init__(self):
-        super().__init__()
-        self.title("Process Timer")
-        self.geometry("450x600")  # Adjusted window size
-        self.minsize(450, 600) # Set the minimum allowed size of the window
-        self.config(bg="#f0f0f0")
-
-        self.timers = []
-        
-        self.setup_ui()
-        self.load_timers()
-        self.check_timers_loop()
-
-    def setup_ui(self):
-        """
-        Sets up the main application UI elements, including a listbox for timers
-        and buttons for saving, loading, toggling, and deleting.
-        """
-        # Main frame with padding
-        main_frame = tk.Frame(self, padx=20, pady=20, bg="#f0f0f0")
-        main_frame.pack(expand=True, fill="both")
-
-        # Title
-        title_label = tk.Label(main_frame, text="Process Timer Setup", font=("Helvetica", 16, "bold"), bg="#f0f0f0")
-        title_label.pack(pady=(0, 20))
-
-        # --- Input Section ---
-        input_frame = tk.Frame(main_frame, bg="#f0f0f0")
-        input_frame.pack(fill="x")
-
-        tk.Label(input_frame, text="Process Name (e.g., chrome.exe):", bg="#f0f0f0", font=("Helvetica", 10)).pack(anchor="w")
-        self.process_name_entry = tk.Entry(input_frame, bd=2, relief="groove")
-        self.process_name_entry.pack(pady=5, fill="x")
-
-        tk.Label(input_frame, text="Interval (in minutes):", bg="#f0f0f0", font=("Helvetica", 10)).pack(anchor="w")
-        self.interval_entry = tk.Entry(input_frame, bd=2, relief="groove")
-        self.interval_entry.pack(pady=5, fill="x")
-
-        tk.Label(input_frame, text="Notification Message:", bg="#f0f0f0", font=("Helvetica", 10)).pack(anchor="w")
-        self.message_entry = tk.Entry(input_frame, bd=2, relief="groove")
-        self.message_entry.pack(pady=5, fill="x")
-
-        # --- Buttons Section ---
-        button_frame = tk.Frame(main_frame, bg="#f0f0f0")
-        button_frame.pack(pady=20, fill="x")
-        
-        tk.Button(button_frame, text="Add Timer", command=self.add_timer, bg="#4CAF50", fg="white", font=("Helvetica", 10, "bold")).pack(side="left", padx=5, expand=True, fill="x")
-        tk.Button(button_frame, text="Save Timers", command=self.save_timers, bg="#2196F3", fg="white", font=("Helvetica", 10, "bold")).pack(side="left", padx=5, expand=True, fill="x")
-        tk.Button(button_frame, text="Load Timers", command=self.load_timers, bg="#FFC107", fg="white", font=("Helvetica", 10, "bold")).pack(side="left", padx=5, expand=True, fill="x")
-
-        # --- Timers Display Section ---
-        tk.Label(main_frame, text="Active Timers", font=("Helvetica", 12, "bold"), bg="#f0f0f0").pack(pady=(20, 5))
-        self.timers_listbox = tk.Listbox(main_frame, height=10, bd=2, relief="groove")
-        self.timers_listbox.pack(pady=10, fill="both", expand=True)
-
-        # --- Timer Management Buttons ---
-        manage_button_frame = tk.Frame(main_frame, bg="#f0f0f0")
-        manage_button_frame.pack(fill="x")
-
-        self.toggle_button = tk.Button(manage_button_frame, text="Toggle Status", command=self.toggle_timer_status, state=tk.DISABLED, bg="#9E9E9E", fg="white", font=("Helvetica", 10, "bold"))
-        self.toggle_button.pack(side="left", padx=5, expand=True, fill="x")
-
-        self.delete_button = tk.Button(manage_button_frame, text="Delete Selected", command=self.delete_timer, state=tk.DISABLED, bg="#F44336", fg="white", font=("Helvetica", 10, "bold"))
-        self.delete_button.pack(side="left", padx=5, expand=True, fill="x")
-
-        # Bind an event to the listbox to enable/disable buttons
-        self.timers_listbox.bind("<<ListboxSelect>>", self.on_listbox_select)
-
-    def on_listbox_select(self, event):
-        """
-        Enables or disables the management buttons based on listbox selection.
-        """
-        selected_index = self.timers_listbox.curselection()
-        if selected_index:
-            self.toggle_button.config(state=tk.NORMAL)
-            self.delete_button.config(state=tk.NORMAL)
-        else:
-            self.toggle_button.config(state=tk.DISABLED)
-            self.delete_button.config(state=tk.DISABLED)
-
-    def toggle_timer_status(self):
-        """
-        Toggles the 'is_active' status of the selected timer.
-        """
-        selected_index = self.timers_listbox.curselection()
-        if selected_index:
-            index = selected_index[0]
-            current_status = self.timers[index]["is_active"]
-            self.timers[index]["is_active"] = not current_status
-            
-            # Reset the timer state when deactivating
-            if not self.timers[index]["is_active"]:
-                self.timers[index]["last_notified"] = datetime.now()
-            
-            self.update_timers_listbox()
-
-    def delete_timer(self):
-        """
-        Deletes the selected timer from the list.
-        """
-        selected_index = self.timers_listbox.curselection()
-        if selected_index:
-            index = selected_index[0]
-            del self.timers[index]
-            self.update_timers_listbox()
-            self.on_listbox_select(None) # Reset button states
-
-    def add_timer(self):
-        """
-        Adds a new timer based on user input.
-        """
-        process_name = self.process_name_entry.get().strip()
-        interval_str = self.interval_entry.get().strip()
-        message = self.message_entry.get().strip()
-        
-        if not process_name or not interval_str or not message:
-            messagebox.showerror("Input Error", "All fields are required.")
-            return
-
+import argparse
+
+from control import default_control_socket
+from engine import TIMERS_FILE_NAME, SCAN_INTERVAL_CEILING_SECONDS
+from sinks import create_sinks, parse_sink_spec
+
+
+def sink_spec(value):
+    try:
+        return parse_sink_spec(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Process Timer: timed notifications while a process is running.")
+    parser.add_argument("timers_file", nargs="?", default=TIMERS_FILE_NAME, help=f"timers file to load (default: {TIMERS_FILE_NAME})")
+    parser.add_argument("--headless", action="store_true", help="run without a window and print notifications to stdout")
+    parser.add_argument("--scan-ceiling", type=float, default=SCAN_INTERVAL_CEILING_SECONDS, metavar="SECONDS",
+                        help=f"longest interval between process scans while nothing changes (default: {SCAN_INTERVAL_CEILING_SECONDS}); 1 or less scans every second")
+    parser.add_argument("--no-watch", action="store_true", help="don't reload the timers file when it changes")
+    parser.add_argument("--per-instance", action="store_true", help="count down separately for every running instance of a timer's process, from its start time")
+    parser.add_argument("--sink", type=sink_spec, action="append", default=[], metavar="SPEC",
+                        help="also send the notifications to a sink: stdout, jsonl:PATH or webhook:URL (can be repeated)")
+    parser.add_argument("--control-socket", nargs="?", const=default_control_socket(), metavar="PATH",
+                        help=f"serve the control API (see notifierctl.py) on a Unix socket (default path: {default_control_socket()})")
+    parser.add_argument("--history", nargs="?", const="", metavar="PATH",
+                        help="record the notifications and process sessions in an SQLite database (default path: next to the timers file)")
+    parser.add_argument("--hub", nargs="?", const="", metavar="[HOST:]PORT",
+                        help="also watch the processes of the machines running an agent (see --agent), accepting them on a TCP port "
+                             "(default: 127.0.0.1:47100; use 0.0.0.0:PORT for other machines)")
+    parser.add_argument("--agent", metavar="HOST[:PORT]",
+                        help="run as an agent instead: stream this machine's process starts and exits to the notifier at HOST, started with --hub")
+    parser.add_argument("--agent-name", metavar="NAME", help="the name an agent reports its machine under (default: its host name)")
+    parser.add_argument("--profile", nargs="?", const="", metavar="DIR",
+                        help="profile the timers loop with cProfile for 10 s every minute, writing reports to DIR (default: next to the timers file)")
+    parser.add_argument("--trace-alloc", action="store_true", help="also trace memory allocations with tracemalloc in the profile reports (slower)")
+    parser.add_argument("--stats", action="store_true", help="collect timing stats (shown in a panel of the window)")
+    parser.add_argument("--stats-file", metavar="PATH", help="periodically export the stats to PATH (implies --stats)")
+    parser.add_argument("--stats-format", choices=("prometheus", "jsonl"), default="prometheus", help="format of --stats-file (default: prometheus)")
+    args = parser.parse_args(argv)
+
+    if args.agent is not None:
+        from remote import parse_address, run_agent
         try:
-            interval_minutes = int(interval_str)
-            if interval_minutes <= 0:
-                raise ValueError
-        except ValueError:
-            messagebox.showerror("Input Error", "Interval must be a positive integer.")
-            return
-
-        # Create a new timer object with 'is_active' status and last_notified time
-        new_timer = {
-            "process_name": process_name,
-            "interval_minutes": interval_minutes,
-            "message": message,
-            "is_active": True,
-            "last_notified": datetime.now() # Start the timer immediately
-        }
-        self.timers.append(new_timer)
-        self.update_timers_listbox()
-        
-        # Clear input fields
-        self.process_name_entry.delete(0, tk.END)
-        self.interval_entry.delete(0, tk.END)
-        self.message_entry.delete(0, tk.END)
-
-    def save_timers(self):
-        """
-        Saves the current list of timers to a text file, including active status.
-        """
+            return run_agent(parse_address(args.agent, None), args.agent_name)
+        except ValueError as e:
+            parser.error(str(e))
+
+    stats = None
+    if args.stats or args.stats_file:
+        from stats import Stats
+        stats = Stats()
+    stats_export = (args.stats_file, args.stats_format) if args.stats_file else None
+    sinks = create_sinks(args.sink, stats)
+    history = None
+    if args.history is not None:
+        from history import HistorySink, history_path
+        history = HistorySink("history", args.history or history_path(args.timers_file), stats)
+    hub = None
+    if args.hub is not None:
+        from remote import RemoteHub, hub_token, parse_address
         try:
-            with open(TIMERS_FILE_NAME, "w") as f:
-                for timer in self.timers:
-                    f.write(f"{timer['process_name']},{timer['interval_minutes']},{timer['message']},{timer['is_active']}\n")
-            messagebox.showinfo("Success", f"Timers saved to {TIMERS_FILE_NAME}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to save timers: {e}")
-
-    def load_timers(self):
-        """
-        Loads timers from a text file and adds them to the application.
-        """
-        self.timers = []  # Clear existing timers before loading
-        if not os.path.exists(TIMERS_FILE_NAME):
-            messagebox.showinfo("Info", "No saved timers found.")
-            self.update_timers_listbox()
-            return
-
-        try:
-            with open(TIMERS_FILE_NAME, "r") as f:
-                for line in f:
-                    parts = line.strip().split(',', 3)
-                    if len(parts) == 4:
-                        process_name, interval_str, message, active_str = parts
-                        try:
-                            interval_minutes = int(interval_str)
-                            is_active = active_str.lower() == "true"
-                            if interval_minutes > 0:
-                                new_timer = {
-                                    "process_name": process_name,
-                                    "interval_minutes": interval_minutes,
-                                    "message": message,
-                                    "is_active": is_active,
-                                    "last_notified": datetime.now() # Reset timer on load
-                                }
-                                self.timers.append(new_timer)
-                        except ValueError:
-                            continue
-            self.update_timers_listbox()
-            messagebox.showinfo("Success", f"Timers loaded from {TIMERS_FILE_NAME}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to load timers: {e}")
-
-    def update_timers_listbox(self):
-        """
-        Updates the listbox with the current active timers and their status.
-        """
-        # Get the currently selected items before clearing the listbox
-        selected_indices = self.timers_listbox.curselection()
-
-        self.timers_listbox.delete(0, tk.END)
-        for i, timer in enumerate(self.timers):
-            status = "Inactive"
-            time_remaining_str = ""
-            
-            if timer["is_active"]:
-                is_running = self.is_process_running(timer['process_name'])
-                if is_running:
-                    status = "Active"
-                    
-                    # Calculate time remaining
-                    time_elapsed = datetime.now() - timer["last_notified"]
-                    interval_in_seconds = timer["interval_minutes"] * 60
-                    
-                    time_to_next = timedelta(seconds=interval_in_seconds) - time_elapsed
-                    
-                    # Ensure time remaining is not negative
-                    if time_to_next.total_seconds() < 0:
-                        time_to_next = timedelta(seconds=0)
-
-                    time_remaining_str = f" - Next: {str(time_to_next).split('.')[0]}" # Format as HH:MM:SS
-                else:
-                    status = "Monitoring..."
-
-            self.timers_listbox.insert(tk.END, f"{i+1}. {timer['process_name']} - {timer['message']} - {timer['interval_minutes']} min. ({status}){time_remaining_str}")
-        
-        # Restore the selection after the listbox has been updated
-        for i in selected_indices:
-            self.timers_listbox.select_set(i)
-
-    def show_notification(self, message):
-        """
-        Creates and displays a small pop-up notification window and plays a sound.
-        """
-        screen_width = self.winfo_screenwidth()
-        screen_height = self.winfo_screenheight()
-        x_pos = screen_width - NOTIFICATION_WIDTH - 20
-        y_pos = screen_height - NOTIFICATION_HEIGHT - 20
-
-        notification_window = tk.Toplevel(self)
-        notification_window.overrideredirect(True)
-        notification_window.geometry(f"{NOTIFICATION_WIDTH}x{NOTIFICATION_HEIGHT}+{x_pos}+{y_pos}")
-        notification_window.attributes("-topmost", True)
-
-        notification_frame = tk.Frame(notification_window, bg="#37df12", relief="solid", bd=2)
-        notification_frame.pack(fill="both", expand=True)
-        
-        message_label = tk.Label(notification_frame, text=message, bg="#37fd12", fg="black", wraplength=NOTIFICATION_WIDTH - 20, font=("Helvetica", 20))
-        message_label.pack(pady=20, padx=10)
-
-        # Play the sound when the notification pops up
-        '''
+            hub = RemoteHub(parse_address(args.hub or "127.0.0.1", "127.0.0.1"), hub_token(), stats)
+        except ValueError as e:
+            parser.error(str(e))
         try:
-            playsound(SOUND_FILE)
-        except Exception as e:
-            print(f"Error playing sound: {e}")
-        '''
-
-        self.after(NOTIFICATION_DURATION_MS, notification_window.destroy)
-
-    def is_process_running(self, process_name):
-        """
-        Checks if a process with the given name is currently running.
-        """
-        for proc in psutil.process_iter(['name']):
-            try:
-                if proc.info['name'].lower() == process_name.lower():
-                    return True
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                continue
-        return False
+            hub.listen()
+        except OSError as e:
+            print(f"Failed to listen for agents on {hub.address[0]}:{hub.address[1]}: {e}")
+            return 1
+
+    profiler = None
+    if args.profile is not None or args.trace_alloc:
+        from profiler import Profiler, profile_directory
+        profiler = Profiler(args.profile or profile_directory(args.timers_file), args.profile is not None, args.trace_alloc)
+
+    # Only import the front-end that is used, so headless runs never load tkinter
+    if args.headless:
+        from headless import run_headless
+        return run_headless(args.timers_file, stats, stats_export, args.scan_ceiling, args.per_instance, sinks, args.control_socket, not args.no_watch, history, hub, profiler)
+
+    from gui import ProcessMonitorApp
+    app = ProcessMonitorApp(args.timers_file, stats, stats_export, args.scan_ceiling, args.per_instance, sinks, args.control_socket, not args.no_watch, history, hub, profiler)
+    app.mainloop()
+    return 0
 
-    def check_timers_loop(self):
-        """
-        Main loop to check all timers and trigger notifications based on elapsed process time.
-        """
-        for timer in self.timers:
-            if timer["is_active"]:
-                is_running = self.is_process_running(timer['process_name'])
-                
-                if is_running:
-                    # Calculate time elapsed since last notification
-                    elapsed_seconds = (datetime.now() - timer["last_notified"]).total_seconds()
-                    
-                    # Check if the interval has passed
-                    if elapsed_seconds >= timer["interval_minutes"] * 60:
-                        self.show_notification(timer["message"])
-                        timer["last_notified"] = datetime.now()
-                else:
-                    # If process is not running, reset the start time and notification tracker
-                    timer["last_notified"] = datetime.now()
-        
-        self.update_timers_listbox()
-        self.after(TIMER_CHECK_INTERVAL_MS, self.check_timers_loop)
 
 if __name__ == "__main__":
-    app = ProcessMonitorApp()
-    app.mainloop()
+    raise SystemExit(main())
@@ -1,5 +1,21 @@
 # -*- mode: python ; coding: utf-8 -*-
+# Built for a fast startup: the modules the notifier never uses are left out, docstrings
+# and asserts are stripped, and nothing is UPX-compressed (decompressing it slows down
+# every launch). A one-file exe still unpacks itself to a temp directory on every launch;
+# "pyinstaller main.spec -- --onedir" builds a folder instead, which starts faster.
 
+import argparse
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--onedir", action="store_true", help="build a folder instead of a single exe")
+options = parser.parse_args()
+
+# Standard library packages that neither the notifier nor psutil import
+EXCLUDES = [
+    'asyncio', 'curses', 'distutils', 'doctest', 'ensurepip', 'idlelib', 'lib2to3', 'multiprocessing',
+    'pdb', 'pip', 'pkg_resources', 'pydoc', 'setuptools', 'test', 'tkinter.test', 'turtle', 'turtledemo',
+    'unittest', 'venv', 'xmlrpc',
+]
 
 a = Analysis(
     ['main.py'],
@@ -10,29 +26,56 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=EXCLUDES,
     noarchive=False,
-    optimize=0,
+    optimize=2,
 )
 pyz = PYZ(a.pure)
 
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.datas,
-    [],
-    name='main',
-    debug=False,
-    bootloader_ignore_signals=False,
-    strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
-    console=True,
-    disable_windowed_traceback=False,
-    argv_emulation=False,
-    target_arch=None,
-    codesign_identity=None,
-    entitlements_file=None,
-)
+if options.onedir:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        [],
+        exclude_binaries=True,
+        name='main',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=False,
+        console=True,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+    )
+    coll = COLLECT(
+        exe,
+        a.binaries,
+        a.datas,
+        strip=False,
+        upx=False,
+        name='main',
+    )
+else:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        a.binaries,
+        a.datas,
+        [],
+        name='main',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=False,
+        upx_exclude=[],
+        runtime_tmpdir=None,
+        console=True,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+    )
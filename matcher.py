@@ -0,0 +1,131 @@
+'''
+Matching process names against the timers' process name patterns.
+
+A timer's process name can be:
+- an exact name, e.g. RobloxPlayerBeta.exe
+- a glob, when it contains * ? or [, e.g. Roblox*.exe
+- a regular expression, when it starts with re:, e.g. re:python.*worker
+
+Matching is case-insensitive and always against the whole name.
+'''
+
+import fnmatch
+import re
+
+REGEX_PREFIX = "re:"
+GLOB_CHARACTERS = "*?["
+MATCH_CACHE_SIZE = 10000
+
+
+def pattern_regex(pattern):
+    """
+    Returns the regular expression source for a glob or regex pattern, or None for an exact name.
+    """
+    if pattern.startswith(REGEX_PREFIX):
+        return pattern[len(REGEX_PREFIX):]
+    if any(character in pattern for character in GLOB_CHARACTERS):
+        return fnmatch.translate(pattern.casefold())
+    return None
+
+
+def compile_pattern(pattern, source):
+    """
+    Compiles a glob or regex pattern's source as the matcher does. Raises ValueError if it isn't valid.
+    """
+    try:
+        return re.compile(source, re.IGNORECASE)
+    except re.error as e:
+        raise ValueError(f"Invalid pattern '{pattern}': {e}") from e
+
+
+def validate_pattern(pattern):
+    """
+    Raises ValueError if the pattern is not a valid glob or regular expression.
+    """
+    source = pattern_regex(pattern)
+    if source is not None:
+        compile_pattern(pattern, source)
+
+
+def combinable(regex):
+    """
+    Checks if a compiled pattern can be joined into the combined regex. Groups can't: named
+    groups would clash and backreferences would point at other patterns' groups once
+    renumbered. Neither can global inline flags like (?i), which must start the whole regex.
+    """
+    if regex.groups:
+        return False
+    try:
+        re.compile(f"(?:{regex.pattern})\\Z", re.IGNORECASE)
+    except re.error:
+        return False
+    return True
+
+
+class ProcessMatcher:
+    """
+    All the patterns of the timers compiled into one matcher: a dict for the exact names and
+    one combined regex over the globs and regexes. Most process names match nothing, which
+    costs one dict lookup and one regex call; only names that hit the combined regex are
+    tested against the individual patterns. The few patterns that can't be combined (see
+    combinable) are tested against every name. Results are cached per (case-folded) name, so
+    with the incremental process tracker each process name is matched once.
+    """
+    def __init__(self, patterns=(), previous=None):
+        self.patterns = frozenset(patterns)
+        # When rebuilding, start from the previous matcher and only apply the patterns that changed
+        if previous is not None:
+            self.exact = dict(previous.exact)
+            regexes = dict(previous.regexes)
+            removed = previous.patterns - self.patterns
+            added = self.patterns - previous.patterns
+        else:
+            self.exact = {}  # case-folded name -> tuple of patterns
+            regexes = {}
+            removed = ()
+            added = self.patterns
+        for pattern in removed:
+            if regexes.pop(pattern, None) is None:
+                name = pattern.casefold()
+                self.exact[name] = tuple(other for other in self.exact[name] if other != pattern)
+                if not self.exact[name]:
+                    del self.exact[name]
+        for pattern in added:
+            source = pattern_regex(pattern)
+            if source is None:
+                name = pattern.casefold()
+                self.exact[name] = self.exact.get(name, ()) + (pattern,)
+            else:
+                regexes[pattern] = compile_pattern(pattern, source)
+        self.regexes = list(regexes.items())  # (pattern, compiled regex)
+
+        self.combined = None
+        self.combined_regexes = () # (pattern, compiled regex) joined into the combined regex
+        self.separate = () # (pattern, compiled regex) tested on their own
+        if previous is not None and regexes.keys() == dict(previous.regexes).keys():
+            self.combined = previous.combined
+            self.combined_regexes = previous.combined_regexes
+            self.separate = previous.separate
+        elif self.regexes:
+            self.combined_regexes = tuple((pattern, regex) for pattern, regex in self.regexes if combinable(regex))
+            self.separate = tuple((pattern, regex) for pattern, regex in self.regexes if not combinable(regex))
+            if self.combined_regexes:
+                self.combined = re.compile("|".join(f"(?:{regex.pattern})\\Z" for _, regex in self.combined_regexes), re.IGNORECASE)
+        self.cache = {}
+
+    def match(self, name):
+        """
+        Returns the tuple of patterns matching a case-folded process name.
+        """
+        matches = self.cache.get(name)
+        if matches is None:
+            matches = self.exact.get(name, ())
+            if self.combined is not None and self.combined.match(name):
+                matches += tuple(pattern for pattern, regex in self.combined_regexes if regex.fullmatch(name))
+            for pattern, regex in self.separate:
+                if regex.fullmatch(name):
+                    matches += (pattern,)
+            if len(self.cache) >= MATCH_CACHE_SIZE:
+                self.cache.clear()
+            self.cache[name] = matches
+        return matches
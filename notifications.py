@@ -0,0 +1,129 @@
+'''
+Notification dispatching between the engine and a front-end: bursts of firings are
+coalesced into one notification, each timer (or each of its per-instance countdowns)
+is rate-limited, and sound is played on
+a background thread, so a firing never stalls the engine's loop.
+'''
+
+import queue
+import threading
+import time
+
+from stats import NullStats
+
+try:
+    import winsound
+except ImportError:
+    winsound = None # Not on Windows: notifications are silent
+
+NOTIFICATION_COALESCE_MS = 250 # Timers firing within this window share one notification
+NOTIFICATION_RATE_LIMIT_SECONDS = 30 # A timer (per process, per instance) notifies at most once per this many seconds
+
+
+def notification_event(timer):
+    """
+    The notification of a fired timer, as handed to the sinks (see sinks.py).
+    """
+    return {
+        "time": timer.last_fired or time.time(),
+        "process_name": timer.process_name,
+        "message": timer.message,
+        "interval_minutes": timer.interval_minutes,
+        "key": timer.key,
+    }
+
+
+class NotificationDispatcher:
+    """
+    Collects the timers the engine fires and hands them to show(timers) in batches.
+    dispatch() only records the timer; the batch is shown from a callback scheduled on
+    the engine's loop (see engine.py for the loop interface) once the coalescing window
+    has passed, and submitted to every sink in 'sinks' (see sinks.py).
+    The rate limit applies per (timer, pid), so the countdowns of different instances of a
+    per-instance timer don't suppress each other; if several of them fire in one burst,
+    the timer's message is shown once.
+    """
+    def __init__(self, loop, show, coalesce_ms=NOTIFICATION_COALESCE_MS, rate_limit_seconds=NOTIFICATION_RATE_LIMIT_SECONDS, stats=None):
+        self.loop = loop
+        self.show = show
+        self.coalesce_seconds = coalesce_ms / 1000
+        self.rate_limit_seconds = rate_limit_seconds
+        self.stats = stats or NullStats()
+        self.pending = [] # Timers waiting for the current burst to be shown
+        self.last_shown = {} # (timer key, pid) -> loop time of its last notification
+        self.flush_handle = None
+        self.sinks = []
+
+    def dispatch(self, timer, pid=None):
+        """
+        Queues a notification for the timer, unless it (the countdown of process 'pid', for a
+        per-instance timer) already notified within the rate limit.
+        """
+        now = self.loop.time()
+        limit_key = (timer.key, pid)
+        last_shown = self.last_shown.get(limit_key)
+        if last_shown is not None and now - last_shown < self.rate_limit_seconds:
+            self.stats.incr("notifications_suppressed_total")
+            return
+        self.last_shown[limit_key] = now
+        self.pending.append(timer)
+        if self.flush_handle is None:
+            self.flush_handle = self.loop.call_later(self.coalesce_seconds, self.flush)
+
+    def flush(self):
+        self.flush_handle = None
+        timers, self.pending = self.pending, []
+        # Forget the limits that ran out, so the ones of exited instances don't pile up
+        now = self.loop.time()
+        self.last_shown = {key: shown for key, shown in self.last_shown.items() if now - shown < self.rate_limit_seconds}
+        if timers:
+            self.show(list(dict.fromkeys(timers))) # Instances of one timer share its line
+            for timer in timers:
+                notification = notification_event(timer)
+                for sink in self.sinks:
+                    sink.submit(notification)
+
+    def cancel(self):
+        """
+        Drops the pending burst, e.g. when the front-end is closing.
+        """
+        if self.flush_handle is not None:
+            self.loop.cancel(self.flush_handle)
+            self.flush_handle = None
+        self.pending = []
+
+
+class SoundPlayer:
+    """
+    Plays a WAV file from memory on a background thread. The file is read once, up front;
+    a play() while the sound is already playing (or queued) is dropped.
+    Only does something where winsound is available (Windows).
+    """
+    def __init__(self, path):
+        self.sound = None
+        self.requests = queue.Queue(maxsize=1)
+        if winsound is None:
+            return
+        try:
+            with open(path, "rb") as f:
+                self.sound = f.read()
+        except OSError as e:
+            print(f"Error loading sound: {e}")
+            return
+        threading.Thread(target=self.run, name="sound-player", daemon=True).start()
+
+    def play(self):
+        if self.sound is None:
+            return
+        try:
+            self.requests.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def run(self):
+        while True:
+            self.requests.get()
+            try:
+                winsound.PlaySound(self.sound, winsound.SND_MEMORY)
+            except RuntimeError as e:
+                print(f"Error playing sound: {e}")
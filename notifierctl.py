@@ -0,0 +1,195 @@
+'''
+Command-line client for the control socket of a running notifier (see control.py).
+
+Examples:
+    python notifierctl.py list
+    python notifierctl.py add "Roblox*.exe" 30 "Take a break"
+    python notifierctl.py add chrome.exe 10 "Chrome is eating memory" --trigger "rss>2GB:60"
+    python notifierctl.py toggle "roblox*.exe|Take a break" --off
+    python notifierctl.py remove "roblox*.exe|Take a break"
+    python notifierctl.py pause "Roblox*.exe"   # every timer of that process name
+    python notifierctl.py dump-state
+    python notifierctl.py top --days 30         # with --history: the timers that notified most
+    python notifierctl.py runtime --days 7      # with --history: how long each watched process ran
+    python notifierctl.py batch changes.jsonl   # one {"method": ..., "params": ...} per line, applied at once
+'''
+
+import argparse
+import itertools
+from datetime import datetime, timedelta
+import json
+import socket
+import sys
+
+from control import default_control_socket
+
+
+class ControlClient:
+    """
+    Sends JSON-RPC requests over the control socket.
+    """
+    def __init__(self, path):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.connect(path)
+        self.stream = self.socket.makefile("rwb")
+        self.ids = itertools.count(1)
+
+    def close(self):
+        self.stream.close()
+        self.socket.close()
+
+    def send(self, message):
+        self.stream.write(json.dumps(message).encode() + b"\n")
+        self.stream.flush()
+        line = self.stream.readline()
+        if not line:
+            raise ConnectionError("The notifier closed the connection")
+        return json.loads(line)
+
+    def call(self, method, **params):
+        """
+        Calls a method and returns its result. Raises RuntimeError with the error message if it failed.
+        """
+        response = self.send({"jsonrpc": "2.0", "id": next(self.ids), "method": method, "params": params})
+        if "error" in response:
+            raise RuntimeError(response["error"]["message"])
+        return response["result"]
+
+    def call_batch(self, calls):
+        """
+        Sends (method, params) calls as one batch and returns their responses, in order. The
+        calls are numbered from 1 in their request ids. Raises RuntimeError with the error
+        message if the batch failed as a whole (e.g. the engine didn't get to it in time).
+        """
+        requests = [{"jsonrpc": "2.0", "id": number, "method": method, "params": params} for number, (method, params) in enumerate(calls, 1)]
+        if not requests:
+            return []
+        reply = self.send(requests)
+        if isinstance(reply, dict): # A single error instead of a list of responses
+            raise RuntimeError(reply.get("error", {}).get("message", "Invalid response"))
+        responses = {response.get("id"): response for response in reply}
+        return [responses.get(request["id"], {"id": request["id"], "error": {"message": "No response"}}) for request in requests]
+
+
+def format_timer(timer):
+    if not timer["is_active"]:
+        status = "Inactive"
+    elif timer["running"] and timer.get("trigger"):
+        status = f"Active - on {timer['trigger']}"
+    elif timer["running"]:
+        status = f"Active - Next: {int(timer['seconds_to_next'] or 0)}s"
+    else:
+        status = "Monitoring..."
+    return f"{timer['key']}  {timer['process_name']} - {timer['message']} - {timer['interval_minutes']} min. ({status})"
+
+
+def read_batch(path):
+    """
+    Reads the calls of a batch file: one JSON object per line with 'method' and optional 'params'.
+    """
+    calls = []
+    with (sys.stdin if path == "-" else open(path)) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                call = json.loads(line)
+                calls.append((call["method"], call.get("params", {})))
+            except (ValueError, KeyError, TypeError) as e:
+                raise ValueError(f"{path}:{line_number}: invalid call: {e}")
+    return calls
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socket", default=default_control_socket(), help="control socket of the notifier (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="list the timers")
+    add = commands.add_parser("add", help="add a timer")
+    add.add_argument("process_name")
+    add.add_argument("interval_minutes", type=int)
+    add.add_argument("message")
+    add.add_argument("--inactive", action="store_true", help="add it switched off")
+    add.add_argument("--trigger", help="fire on a resource threshold instead, e.g. cpu>80:60 (see resources.py)")
+    remove = commands.add_parser("remove", help="remove a timer")
+    remove.add_argument("key")
+    toggle = commands.add_parser("toggle", help="switch a timer on or off")
+    toggle.add_argument("key")
+    state = toggle.add_mutually_exclusive_group()
+    state.add_argument("--on", dest="is_active", action="store_const", const=True, help="switch it on")
+    state.add_argument("--off", dest="is_active", action="store_const", const=False, help="switch it off")
+    for command, verb in (("pause", "off"), ("resume", "on")):
+        process = commands.add_parser(command, help=f"switch every timer of a process name {verb}")
+        process.add_argument("process_name")
+    commands.add_parser("dump-state", help="print the engine's state as JSON")
+    commands.add_parser("save", help="write the timers to the timers file")
+    recent = commands.add_parser("recent", help="show the newest notifications and process sessions (needs --history)")
+    recent.add_argument("--limit", type=int, default=50)
+    top = commands.add_parser("top", help="show the timers that notified most (needs --history)")
+    top.add_argument("--days", type=float, default=7)
+    top.add_argument("--limit", type=int, default=10)
+    runtime = commands.add_parser("runtime", help="show how long the watched processes ran (needs --history)")
+    runtime.add_argument("process", nargs="?")
+    runtime.add_argument("--days", type=float, default=7)
+    batch = commands.add_parser("batch", help="apply the calls in a JSON lines file (- for stdin) at once")
+    batch.add_argument("file")
+    args = parser.parse_args(argv)
+
+    try:
+        client = ControlClient(args.socket)
+    except OSError as e:
+        print(f"Can't connect to {args.socket}: {e} (is the notifier running with --control-socket?)", file=sys.stderr)
+        return 1
+    try:
+        if args.command == "list":
+            for timer in client.call("list"):
+                print(format_timer(timer))
+        elif args.command == "add":
+            params = {"process_name": args.process_name, "interval_minutes": args.interval_minutes, "message": args.message, "is_active": not args.inactive}
+            if args.trigger is not None:
+                params["trigger"] = args.trigger
+            print(client.call("add", **params)["key"])
+        elif args.command == "remove":
+            client.call("remove", key=args.key)
+        elif args.command == "toggle":
+            params = {"key": args.key} if args.is_active is None else {"key": args.key, "is_active": args.is_active}
+            print("Active" if client.call("toggle", **params)["is_active"] else "Inactive")
+        elif args.command in ("pause", "resume"):
+            changed = client.call("set_active", process_name=args.process_name, is_active=args.command == "resume")["changed"]
+            print(f"{changed} timers {'resumed' if args.command == 'resume' else 'paused'}")
+        elif args.command == "dump-state":
+            print(json.dumps(client.call("dump_state"), indent=2))
+        elif args.command == "save":
+            client.call("save")
+        elif args.command == "recent":
+            for event in client.call("recent", limit=args.limit):
+                when = f"{datetime.fromtimestamp(event['time']):%Y-%m-%d %H:%M:%S}"
+                if event["event"] == "notification":
+                    print(f"{when}  {event['key']}: {event['message']}")
+                else:
+                    print(f"{when}  {event['process']} {event['event']}")
+        elif args.command == "top":
+            for timer in client.call("top_timers", days=args.days, limit=args.limit):
+                print(f"{timer['notifications']:>6}  {timer['key']}")
+        elif args.command == "runtime":
+            params = {"days": args.days} if args.process is None else {"days": args.days, "process": args.process}
+            for process in client.call("runtime", **params):
+                print(f"{str(timedelta(seconds=int(process['seconds']))):>12}  {process['process']}")
+        elif args.command == "batch":
+            failed = 0
+            for response in client.call_batch(read_batch(args.file)):
+                if "error" in response:
+                    failed += 1
+                    print(f"call {response['id']}: {response['error']['message']}", file=sys.stderr)
+            if failed:
+                return 1
+    except (RuntimeError, ValueError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,168 @@
+'''
+Event-driven process start/exit detection on Linux.
+
+Two sources are supported, both exposing a file descriptor that becomes readable
+when something happened, so the caller can wait on it instead of polling psutil:
+
+- ProcConnector: the kernel's netlink proc connector, which reports every fork,
+  exec and exit on the machine. It needs root (CAP_NET_ADMIN).
+- PidfdWatcher: one pidfd per watched PID (Linux 5.3+). It only reports exits of
+  processes we already know about, so starts still come from the psutil scan.
+
+open_proc_connector() returns None whenever the connector can't be used, in which
+case the caller falls back to the regular scan.
+'''
+
+import errno
+import os
+import socket
+import struct
+import sys
+
+NETLINK_CONNECTOR = 11
+NLMSG_DONE = 3
+CN_IDX_PROC = 1
+CN_VAL_PROC = 1
+PROC_CN_MCAST_LISTEN = 1
+PROC_CN_MCAST_IGNORE = 2
+
+PROC_EVENT_FORK = 0x00000001
+PROC_EVENT_EXEC = 0x00000002
+PROC_EVENT_EXIT = 0x80000000
+
+# What ProcConnector.read_events() reports
+PROC_FORK = "fork"
+PROC_EXEC = "exec"
+PROC_EXIT = "exit"
+
+NLMSGHDR = struct.Struct("=IHHII")  # len, type, flags, seq, pid
+CN_MSG = struct.Struct("=IIIIHH")  # idx, val, seq, ack, len, flags
+PROC_EVENT_HEADER = struct.Struct("=IIQ")  # what, cpu, timestamp_ns
+PROC_EVENT_IDS = struct.Struct("=IIII")  # the first four u32 of the event union
+
+RECV_BUFFER_SIZE = 64 * 1024
+
+
+class EventsLost(Exception):
+    """
+    Raised when the kernel dropped events because we didn't read fast enough.
+    The caller should resynchronise with a full scan.
+    """
+
+
+class ProcConnector:
+    """
+    A subscription to the netlink proc connector.
+    """
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_CONNECTOR)
+        try:
+            self.sock.bind((0, CN_IDX_PROC))
+            self._send_op(PROC_CN_MCAST_LISTEN)
+            self.sock.setblocking(False)
+        except OSError:
+            self.sock.close()
+            raise
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def _send_op(self, op):
+        payload = struct.pack("=I", op)
+        cn_msg = CN_MSG.pack(CN_IDX_PROC, CN_VAL_PROC, 0, 0, len(payload), 0) + payload
+        header = NLMSGHDR.pack(NLMSGHDR.size + len(cn_msg), NLMSG_DONE, 0, 0, 0)
+        self.sock.send(header + cn_msg)
+
+    def read_events(self):
+        """
+        Reads everything that is queued without blocking.
+        Returns a list of (kind, pid) tuples, only for whole processes (not threads).
+        """
+        events = []
+        while True:
+            try:
+                data = self.sock.recv(RECV_BUFFER_SIZE)
+            except BlockingIOError:
+                return events
+            except OSError as e:
+                if e.errno == errno.ENOBUFS:
+                    raise EventsLost() from e
+                raise
+            self._parse(data, events)
+
+    def _parse(self, data, events):
+        offset = 0
+        while offset + NLMSGHDR.size <= len(data):
+            msg_len = NLMSGHDR.unpack_from(data, offset)[0]
+            if msg_len < NLMSGHDR.size:
+                break
+            event_offset = offset + NLMSGHDR.size + CN_MSG.size
+            if event_offset + PROC_EVENT_HEADER.size + PROC_EVENT_IDS.size <= offset + msg_len:
+                what = PROC_EVENT_HEADER.unpack_from(data, event_offset)[0]
+                ids = PROC_EVENT_IDS.unpack_from(data, event_offset + PROC_EVENT_HEADER.size)
+                if what == PROC_EVENT_FORK and ids[2] == ids[3]:
+                    events.append((PROC_FORK, ids[3]))
+                elif what == PROC_EVENT_EXEC and ids[0] == ids[1]:
+                    events.append((PROC_EXEC, ids[1]))
+                elif what == PROC_EVENT_EXIT and ids[0] == ids[1]:
+                    events.append((PROC_EXIT, ids[1]))
+            offset += (msg_len + 3) & ~3  # NLMSG_ALIGN
+
+    def close(self):
+        try:
+            self._send_op(PROC_CN_MCAST_IGNORE)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+def open_proc_connector():
+    """
+    Subscribes to the proc connector, or returns None if it isn't available here
+    (not Linux, not privileged, or the kernel was built without it).
+    """
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        return ProcConnector()
+    except OSError:
+        return None
+
+
+class PidfdWatcher:
+    """
+    Holds a pidfd for each watched PID. A pidfd becomes readable when its process exits.
+    register(pid, fd) and unregister(fd) hook the fds into the caller's event loop;
+    unregister is always called before the fd is closed.
+    """
+    def __init__(self, register, unregister):
+        self.register = register
+        self.unregister = unregister
+        self.fds = {}  # pid -> pidfd
+
+    @staticmethod
+    def is_supported():
+        return sys.platform.startswith("linux") and hasattr(os, "pidfd_open")
+
+    def sync(self, pids):
+        """
+        Opens pidfds for newly watched PIDs and closes the ones no longer watched.
+        """
+        for pid in self.fds.keys() - pids:
+            self.discard(pid)
+        for pid in pids - self.fds.keys():
+            try:
+                fd = os.pidfd_open(pid)
+            except OSError:
+                continue  # Already gone; the next scan reports the exit
+            self.fds[pid] = fd
+            self.register(pid, fd)
+
+    def discard(self, pid):
+        fd = self.fds.pop(pid, None)
+        if fd is not None:
+            self.unregister(fd)
+            os.close(fd)
+
+    def close(self):
+        self.sync(set())
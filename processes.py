@@ -0,0 +1,222 @@
+'''
+Process table helpers shared by the timers and the timers listbox.
+'''
+
+from collections import deque, namedtuple
+
+from proc_events import PROC_EXEC, PROC_EXIT
+
+PROCESS_STARTED = "started"
+PROCESS_EXITED = "exited"
+PID_REUSE_CHECKS_PER_UPDATE = 16 # Watched PIDs checked for reuse per update, in turn
+
+# A process instance appearing or disappearing. 'instances' is how many processes
+# with that name are running once the event has been applied, so 1 on a start
+# means the name just came up and 0 on an exit means the last instance went away.
+ProcessEvent = namedtuple("ProcessEvent", ["kind", "pid", "name", "create_time", "instances"])
+
+
+class ProcessSnapshot:
+    """
+    A single read of the process table, indexed by case-folded process name.
+    One snapshot is taken per tick and every timer (and the listbox) reads from it,
+    so a tick walks the process table once no matter how many timers there are.
+    'create_times' maps PIDs to their create_time, when the snapshot carries them.
+    """
+    def __init__(self, pids_by_name=None, create_times=None):
+        self.pids_by_name = pids_by_name or {}
+        self.create_times = create_times or {}
+
+    @classmethod
+    def take(cls):
+        """
+        Walks the process table once and builds the name -> PIDs index.
+        """
+        import psutil # Only imported once the process table is needed, as it is slow to import
+        pids_by_name = {}
+        for proc in psutil.process_iter(['name']):
+            name = proc.info['name']
+            if not name:
+                continue  # AccessDenied leaves the name empty
+            pids_by_name.setdefault(name.casefold(), set()).add(proc.pid)
+        return cls(pids_by_name)
+
+    def pids(self, process_name):
+        """
+        Returns the PIDs running under the given name (case-insensitive).
+        """
+        return self.pids_by_name.get(process_name.casefold(), set())
+
+    def is_running(self, process_name):
+        """
+        Checks if a process with the given name was running when the snapshot was taken.
+        """
+        return process_name.casefold() in self.pids_by_name
+
+    def create_time(self, pid):
+        """
+        Returns the create_time of a PID in the snapshot, or None if it isn't known.
+        """
+        return self.create_times.get(pid)
+
+
+class ProcessTracker(ProcessSnapshot):
+    """
+    Keeps the name -> PIDs index alive between ticks instead of rebuilding it.
+    Each update lists the current PIDs, diffs them against the previous set and only
+    looks up names for PIDs that are new. A PID recycled between two updates shows up
+    in both listings, so the watched processes are checked too, but only
+    PID_REUSE_CHECKS_PER_UPDATE of them per update, in turn. A watched PID keeps its
+    Process, which remembers the create_time it was created with, so a check is a single
+    is_running() call: a steady-state tick is a PID listing, a set difference and at most
+    that many is_running() calls, however many processes are watched. A recycled PID is
+    then seen as an exit followed by a start, within (watched processes /
+    PID_REUSE_CHECKS_PER_UPDATE) updates.
+    'backend' is the psutil module, or anything with the same pids()/Process() API.
+
+    The processes of other machines, reported by agents (see remote.py), are indexed
+    too, under (host, pid) keys instead of PIDs. They are only ever changed through
+    add_remote() and remove_remote(), never by the local updates.
+    """
+    def __init__(self, backend):
+        super().__init__()
+        self.backend = backend
+        self.processes = {}  # pid -> (create_time, case-folded name or None)
+        self.remote = {}  # (host, pid) -> (create_time, case-folded name)
+        self.watched_names = set()  # case-folded names whose PIDs are checked for reuse
+        self.reuse_checks = deque()  # Watched PIDs left to check for reuse in the current round
+        self.handles = {}  # pid -> Process of the watched PIDs checked for reuse
+
+    def create_time(self, pid):
+        entry = self.processes.get(pid) or self.remote.get(pid)
+        return entry[0] if entry is not None else None
+
+    def update(self):
+        """
+        Refreshes the index and returns the list of ProcessEvents since the last update.
+        """
+        events = []
+        current_pids = set(self.backend.pids())
+
+        for pid in self.processes.keys() - current_pids:
+            self._remove(pid, events)
+
+        # A PID that was recycled between two updates still shows up in both sets,
+        # so compare create_time for the processes the timers actually care about
+        checks = 0
+        refilled = False
+        while checks < PID_REUSE_CHECKS_PER_UPDATE:
+            if not self.reuse_checks:
+                if refilled:
+                    break # Every watched PID was checked in this update
+                self.reuse_checks.extend(pid for name in self.watched_names for pid in self.pids_by_name.get(name, ()) if pid in self.processes)
+                refilled = True
+                continue
+            pid = self.reuse_checks.popleft()
+            entry = self.processes.get(pid)
+            if entry is None or entry[1] not in self.watched_names:
+                self.handles.pop(pid, None)
+                continue # Exited, or no longer watched, since the round started
+            checks += 1
+            proc = self.handles.get(pid)
+            if proc is not None:
+                running = proc.is_running() # False once the PID is gone or was recycled
+            else:
+                try:
+                    proc = self.backend.Process(pid)
+                    running = proc.create_time() == entry[0]
+                except (self.backend.NoSuchProcess, self.backend.AccessDenied):
+                    running = False
+                if running:
+                    self.handles[pid] = proc
+            if not running:
+                self._remove(pid, events)
+                current_pids.add(pid)
+
+        for pid in current_pids - self.processes.keys():
+            self._add(pid, events)
+        return events
+
+    def apply_changes(self, changes):
+        """
+        Applies (kind, pid) changes reported by an event source (see proc_events)
+        instead of rescanning, and returns the resulting ProcessEvents.
+        """
+        events = []
+        for kind, pid in changes:
+            if kind == PROC_EXIT:
+                if pid in self.processes:
+                    self._remove(pid, events)
+            elif pid not in self.processes:
+                self._add(pid, events)
+            elif kind == PROC_EXEC:
+                # exec replaces the program (and usually the name) of an existing PID
+                try:
+                    name = self.backend.Process(pid).name().casefold() or None
+                except (self.backend.NoSuchProcess, self.backend.AccessDenied):
+                    name = None
+                if name != self.processes[pid][1]:
+                    self._remove(pid, events)
+                    self._add(pid, events)
+        return events
+
+    def remove_pid(self, pid):
+        """
+        Drops a PID that is known to have exited and returns the resulting ProcessEvents.
+        """
+        events = []
+        if pid in self.processes:
+            self._remove(pid, events)
+        return events
+
+    def local_pids(self, process_name):
+        """
+        Returns the PIDs running under the given (case-folded) name on this machine.
+        """
+        return {pid for pid in self.pids_by_name.get(process_name, ()) if pid in self.processes}
+
+    def add_remote(self, key, create_time, name, events):
+        """
+        Indexes a process reported by an agent under 'key', its (host, pid).
+        """
+        self.remote[key] = (create_time, name)
+        self._index(key, create_time, name, events)
+
+    def remove_remote(self, key, events):
+        create_time, name = self.remote.pop(key)
+        self._unindex(key, create_time, name, events)
+
+    def _add(self, pid, events):
+        try:
+            proc = self.backend.Process(pid)
+            create_time = proc.create_time()
+        except (self.backend.NoSuchProcess, self.backend.AccessDenied):
+            return  # Gone already, or not inspectable; it is retried on the next update
+        try:
+            name = proc.name().casefold() or None
+        except self.backend.NoSuchProcess:
+            return
+        except self.backend.AccessDenied:
+            name = None  # Remember the PID anyway so its name is not fetched every tick
+
+        self.processes[pid] = (create_time, name)
+        if name is not None:
+            self._index(pid, create_time, name, events)
+
+    def _remove(self, pid, events):
+        create_time, name = self.processes.pop(pid)
+        self.handles.pop(pid, None)
+        if name is not None:
+            self._unindex(pid, create_time, name, events)
+
+    def _index(self, pid, create_time, name, events):
+        pids = self.pids_by_name.setdefault(name, set())
+        pids.add(pid)
+        events.append(ProcessEvent(PROCESS_STARTED, pid, name, create_time, len(pids)))
+
+    def _unindex(self, pid, create_time, name, events):
+        pids = self.pids_by_name[name]
+        pids.discard(pid)
+        if not pids:
+            del self.pids_by_name[name]
+        events.append(ProcessEvent(PROCESS_EXITED, pid, name, create_time, len(pids)))
@@ -0,0 +1,247 @@
+'''
+Opt-in profiling of the hot path (--profile / --trace-alloc), for bug reports about CPU
+or memory use.
+
+The front-ends hook a few methods: the engine's tick and fire_due_timers, its
+is_process_running, the timers list rendering and the notification popups. Every
+PROFILE_INTERVAL_SECONDS a sampling window of PROFILE_WINDOW_SECONDS opens. While it is
+open, the hooked calls are timed, run under cProfile (--profile), and have their
+allocations measured with tracemalloc (--trace-alloc). When it closes, a text report is
+written to the profile directory, and only the newest PROFILE_KEEP_REPORTS are kept.
+A report has:
+- the calls, time and allocations of every hook
+- the Tcl calls (counted by cProfile, as calls of _tkinter's tkapp methods)
+- the top functions by cumulative time
+- the memory allocated since the previous report and still alive, by source line
+
+Without the flags nothing is hooked, so the hot path runs exactly as before. Everything
+here runs on the engine's thread.
+'''
+
+import cProfile
+import io
+import os
+import platform
+import pstats
+import sys
+import time
+import tracemalloc
+
+PROFILE_WINDOW_SECONDS = 10 # How long a sampling window stays open
+PROFILE_INTERVAL_SECONDS = 60 # A window opens this often
+PROFILE_KEEP_REPORTS = 20 # Newest reports kept in the profile directory
+PROFILE_TOP_FUNCTIONS = 30
+PROFILE_TOP_ALLOCATIONS = 20
+TRACEMALLOC_FRAMES = 1 # Allocations are grouped by the line that made them
+REPORT_PREFIX = "profile-"
+REPORT_SUFFIX = ".txt"
+TCL_INTERPRETER = "_tkinter.tkapp" # How cProfile names the Tcl interpreter's methods
+
+
+def profile_directory(timers_file):
+    """
+    Returns the default profile directory for the given timers file.
+    """
+    return f"{os.path.splitext(timers_file)[0]}_profiles"
+
+
+class HookStats:
+    """
+    What a hook measured during the current window. The allocation peak is only measured
+    for the outermost hooked call (tracemalloc has a single peak), e.g. for the tick but
+    not for the rendering it triggers.
+    """
+    __slots__ = ("calls", "total_ms", "max_ms", "allocated", "peak", "peak_calls")
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.allocated = 0 # Net bytes still allocated when the calls returned
+        self.peak = 0 # Bytes above the start of the call, at its peak
+        self.peak_calls = 0
+
+
+class Profiler:
+    """
+    Hooks methods of the engine and front-end, and writes a report for every sampling
+    window to 'directory'. 'profile' turns cProfile on, 'trace_alloc' tracemalloc.
+    """
+    def __init__(self, directory, profile=True, trace_alloc=False):
+        self.directory = directory
+        self.profile_calls = profile
+        self.trace_alloc = trace_alloc
+        self.hooks = {} # label -> HookStats of the current window
+        self.loop = None
+        self.handle = None
+        self.in_window = False
+        self.window_started = 0.0 # time.time() of the current window
+        self.profile = None # The cProfile.Profile of the current window
+        self.depth = 0 # Nesting of hooked calls
+        self.snapshot = None # tracemalloc snapshot of the previous report
+        self.reports_written = 0
+
+    def hook(self, obj, name, label=None):
+        """
+        Replaces obj.name (a method or a callable attribute) with a measured wrapper.
+        Must be called before the callable is handed to anything that keeps a reference.
+        """
+        function = getattr(obj, name)
+        record = self.hooks.setdefault(label or name, HookStats())
+
+        def hooked(*args, **kwargs):
+            if not self.in_window:
+                return function(*args, **kwargs)
+            return self.call(record, function, args, kwargs)
+
+        hooked.__wrapped__ = function
+        setattr(obj, name, hooked)
+
+    def hook_engine(self, engine):
+        """
+        Hooks the engine's side of the hot path; before engine.start().
+        """
+        for name in ("tick", "fire_due_timers", "is_process_running"):
+            self.hook(engine, name)
+
+    def call(self, record, function, args, kwargs):
+        outermost = self.depth == 0
+        self.depth += 1
+        if outermost and self.profile is not None:
+            self.profile.enable()
+        if self.trace_alloc:
+            if outermost:
+                tracemalloc.reset_peak()
+            allocated_before = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if self.trace_alloc:
+                allocated, peak = tracemalloc.get_traced_memory()
+                record.allocated += allocated - allocated_before
+                if outermost:
+                    record.peak += peak - allocated_before
+                    record.peak_calls += 1
+            if outermost and self.profile is not None:
+                self.profile.disable()
+            self.depth -= 1
+            record.calls += 1
+            record.total_ms += elapsed_ms
+            if elapsed_ms > record.max_ms:
+                record.max_ms = elapsed_ms
+
+    def start(self, loop):
+        """
+        Opens the first window right away, on the engine's loop (see engine.py).
+        """
+        self.loop = loop
+        if self.trace_alloc:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self.snapshot = self.take_snapshot()
+        self.open_window()
+
+    def stop(self):
+        """
+        Writes the report of the open window, if any, and stops tracing.
+        """
+        if self.handle is not None:
+            self.loop.cancel(self.handle)
+            self.handle = None
+        if self.in_window:
+            self.close_window(reschedule=False)
+        if self.trace_alloc:
+            tracemalloc.stop()
+
+    def open_window(self):
+        self.handle = self.loop.call_later(PROFILE_WINDOW_SECONDS, self.close_window)
+        for record in self.hooks.values():
+            record.__init__()
+        self.profile = cProfile.Profile() if self.profile_calls else None
+        self.window_started = time.time()
+        self.in_window = True
+
+    def close_window(self, reschedule=True):
+        self.in_window = False
+        self.handle = None
+        try:
+            self.write_report(self.report())
+        except OSError as e:
+            print(f"Failed to write the profile report: {e}", file=sys.stderr)
+        self.profile = None
+        if reschedule:
+            self.handle = self.loop.call_later(PROFILE_INTERVAL_SECONDS - PROFILE_WINDOW_SECONDS, self.open_window)
+
+    def take_snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, cProfile.__file__), # The profiler's own bookkeeping
+            tracemalloc.Filter(False, pstats.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ))
+
+    def report(self):
+        """
+        Renders the report of the window that just closed.
+        """
+        seconds = time.time() - self.window_started
+        tools = [name for name, on in (("cProfile", self.profile is not None), ("tracemalloc", self.trace_alloc)) if on]
+        out = [
+            "oabd_notifier profile report",
+            f"Window: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.window_started))}, {seconds:.1f} s ({', '.join(tools) or 'timing only'})",
+            f"Python {platform.python_version()} on {platform.platform()}",
+            "",
+            f"{'hook':<22} {'calls':>8} {'total ms':>10} {'mean ms':>9} {'max ms':>9} {'net B/call':>11} {'peak B/call':>12}",
+        ]
+        for label, record in self.hooks.items():
+            mean_ms = record.total_ms / record.calls if record.calls else 0.0
+            allocated = f"{record.allocated / record.calls:.0f}" if self.trace_alloc and record.calls else "-"
+            peak = f"{record.peak / record.peak_calls:.0f}" if record.peak_calls else "-"
+            out.append(f"{label:<22} {record.calls:>8} {record.total_ms:>10.2f} {mean_ms:>9.3f} {record.max_ms:>9.3f} {allocated:>11} {peak:>12}")
+
+        if self.profile is not None:
+            stats = pstats.Stats(self.profile)
+            ticks = self.hooks["tick"].calls if "tick" in self.hooks else 0
+            tcl_calls = {}
+            for (_, _, function), (_, calls, _, _, _) in stats.stats.items():
+                if TCL_INTERPRETER in function:
+                    tcl_calls[function] = calls
+            total = sum(tcl_calls.values())
+            if tcl_calls: # None in headless mode
+                out += ["", f"Tcl calls: {total}" + (f" ({total / ticks:.1f} per tick)" if ticks else "")]
+            for function, calls in sorted(tcl_calls.items(), key=lambda item: -item[1]):
+                out.append(f"  {calls:>8}  {function}")
+            if stats.total_calls:
+                buffer = io.StringIO()
+                stats.stream = buffer
+                stats.sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+                out += ["", f"Top {PROFILE_TOP_FUNCTIONS} functions by cumulative time (hooked calls only):", buffer.getvalue().strip("\n")]
+
+        if self.trace_alloc:
+            snapshot = self.take_snapshot()
+            differences = [difference for difference in snapshot.compare_to(self.snapshot, "lineno") if difference.size_diff]
+            self.snapshot = snapshot
+            current, peak = tracemalloc.get_traced_memory()
+            out += ["", f"Traced memory: {current / 1024:.1f} KiB (peak {peak / 1024:.1f} KiB)",
+                    f"Top {PROFILE_TOP_ALLOCATIONS} lines by memory allocated since the previous report and still alive:"]
+            for difference in differences[:PROFILE_TOP_ALLOCATIONS]:
+                frame = difference.traceback[0]
+                out.append(f"  {difference.size_diff / 1024:>+10.1f} KiB {difference.count_diff:>+8} blocks  {frame.filename}:{frame.lineno}")
+        return "\n".join(out) + "\n"
+
+    def write_report(self, text):
+        """
+        Writes a report and deletes the oldest ones beyond PROFILE_KEEP_REPORTS.
+        """
+        self.reports_written += 1
+        os.makedirs(self.directory, exist_ok=True)
+        # The counter keeps the names unique (and ordered) within a second
+        name = f"{REPORT_PREFIX}{time.strftime('%Y%m%d-%H%M%S', time.localtime(self.window_started))}-{self.reports_written:04d}{REPORT_SUFFIX}"
+        temp_path = os.path.join(self.directory, name + ".tmp")
+        with open(temp_path, "w") as f:
+            f.write(text)
+        os.replace(temp_path, os.path.join(self.directory, name))
+        reports = sorted(entry for entry in os.listdir(self.directory) if entry.startswith(REPORT_PREFIX) and entry.endswith(REPORT_SUFFIX))
+        for entry in reports[:-PROFILE_KEEP_REPORTS]:
+            os.remove(os.path.join(self.directory, entry))
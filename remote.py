@@ -0,0 +1,529 @@
+'''
+Watching the processes of other machines: a small agent runs on each of them and
+streams the changes of its process table to the notifier (the hub), which indexes the
+agents' processes next to its own, under (host, pid) keys. The timers match processes
+on any host, and in per-instance mode every (host, pid) gets its own countdown.
+
+The protocol runs over TCP. Each direction is one zlib stream of JSON messages, one per
+line, each flushed on its own, so the names repeated from one message to the next
+compress to almost nothing. The agent sends:
+- {"type": "hello", "host": NAME, "protocol": 1, "token": TOKEN}, first
+- {"type": "snapshot", "processes": [[pid, create_time, name], ...]}: its whole table,
+  after the hello and whenever the hub asks for it
+- {"type": "delta", "exited": [pid, ...], "started": [[pid, create_time, name], ...]}:
+  what changed since the last message, the exits applying first
+- {"type": "checksum", "count": N, "sum": S}: every CHECKSUM_SECONDS, a digest of its
+  table (see table_digest) which the hub compares with its copy
+The hub answers a checksum that doesn't match with {"type": "resync"}, and the agent
+sends a new snapshot. Once connected, the traffic only depends on how many processes
+start and exit, not on how many are running. A bad hello is answered with
+{"type": "error", "message": ...} and the connection is closed.
+
+When an agent disconnects, its processes are kept for HOST_GRACE_SECONDS, so a short
+network outage doesn't restart the countdowns; when it reconnects, its snapshot is
+diffed against them. If the hub's TOKEN_ENV environment variable is set, agents must
+send the same token.
+'''
+
+import hashlib
+import hmac
+import json
+import os
+import selectors
+import socket
+import time
+import zlib
+
+from processes import ProcessTracker, PROCESS_STARTED
+from stats import NullStats
+
+PROTOCOL_VERSION = 1
+HUB_PORT = 47100
+CHECKSUM_SECONDS = 30 # How often agents send the checksum of their table
+AGENT_SCAN_SECONDS = 1 # How often agents scan their process table
+HOST_GRACE_SECONDS = 60 # How long the processes of a disconnected agent are kept
+RECONNECT_SECONDS = (1, 30) # Shortest and longest delay between an agent's connection attempts
+CONNECT_TIMEOUT_SECONDS = 10
+MAX_MESSAGE_BYTES = 64 * 1024 * 1024 # Longest message line accepted, decompressed
+RECV_BUFFER_SIZE = 64 * 1024
+TOKEN_ENV = "OABD_NOTIFIER_HUB_TOKEN"
+DIGEST_MODULUS = 2 ** 64
+
+
+def parse_address(spec, default_host):
+    """
+    Parses [HOST:]PORT or HOST[:PORT] into (host, port), with 'default_host' (or None if a
+    host is required) and HUB_PORT when they are left out. Raises ValueError.
+    """
+    host, _, port = spec.rpartition(":")
+    if not host and not port.isdigit():
+        host, port = port, "" # Only a host
+    try:
+        port = int(port) if port else HUB_PORT
+    except ValueError:
+        raise ValueError(f"invalid port in '{spec}'") from None
+    if not 0 < port < 65536:
+        raise ValueError(f"invalid port in '{spec}'")
+    host = host.strip("[]") or default_host
+    if host is None:
+        raise ValueError(f"'{spec}' needs a host name or address")
+    return host, port
+
+
+def process_digest(pid, create_time, name):
+    """
+    A 64-bit digest of one process, the same on every machine and Python version.
+    """
+    digest = hashlib.blake2b(f"{pid}|{create_time!r}|{name}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def table_digest(table):
+    """
+    The checksum of a whole pid -> (create_time, name) table: the sum of its processes'
+    digests, which doesn't depend on their order and is kept up to date one process at a time.
+    """
+    return sum(process_digest(pid, create_time, name) for pid, (create_time, name) in table.items()) % DIGEST_MODULUS
+
+
+class MessageWriter:
+    """
+    Encodes messages into one direction's zlib stream.
+    """
+    def __init__(self):
+        self.compressor = zlib.compressobj()
+
+    def encode(self, message):
+        line = json.dumps(message, separators=(",", ":")).encode() + b"\n"
+        return self.compressor.compress(line) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+class MessageReader:
+    """
+    Decodes the messages of one direction's zlib stream, as its bytes arrive.
+    """
+    def __init__(self):
+        self.decompressor = zlib.decompressobj()
+        self.buffer = b""
+
+    def decode(self, data):
+        """
+        Returns the messages completed by 'data'. Raises ValueError on a corrupt stream or an overlong message.
+        """
+        try:
+            self.buffer += self.decompressor.decompress(data, MAX_MESSAGE_BYTES - len(self.buffer) + 1)
+        except zlib.error as e:
+            raise ValueError(f"corrupt stream: {e}") from None
+        *lines, self.buffer = self.buffer.split(b"\n")
+        if len(self.buffer) > MAX_MESSAGE_BYTES or self.decompressor.unconsumed_tail:
+            raise ValueError("message too long")
+        messages = []
+        for line in lines:
+            message = json.loads(line)
+            if not isinstance(message, dict):
+                raise ValueError("expected a JSON object")
+            messages.append(message)
+        return messages
+
+
+def parse_process(entry):
+    """
+    Checks a [pid, create_time, name] entry from an agent. Raises ValueError.
+    """
+    if not isinstance(entry, list) or len(entry) != 3:
+        raise ValueError("expected [pid, create_time, name]")
+    pid, create_time, name = entry
+    if not isinstance(pid, int) or not isinstance(create_time, (int, float)) or not isinstance(name, str) or not name:
+        raise ValueError("expected [pid, create_time, name]")
+    return pid, create_time, name.casefold()
+
+
+class RemoteHost:
+    """
+    The hub's copy of one agent's process table.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.processes = {} # pid -> (create_time, name)
+        self.digest = 0 # table_digest(processes), kept up to date
+        self.connection = None # Its HubConnection, while it is connected
+        self.disconnected_at = None # On the hub's clock
+        self.awaiting_snapshot = False # A resync was asked for; checksums are ignored until it comes
+
+    def add(self, tracker, pid, create_time, name, events):
+        self.processes[pid] = (create_time, name)
+        self.digest = (self.digest + process_digest(pid, create_time, name)) % DIGEST_MODULUS
+        tracker.add_remote((self.name, pid), create_time, name, events)
+
+    def remove(self, tracker, pid, events):
+        create_time, name = self.processes.pop(pid)
+        self.digest = (self.digest - process_digest(pid, create_time, name)) % DIGEST_MODULUS
+        tracker.remove_remote((self.name, pid), events)
+
+    def apply_snapshot(self, tracker, processes, events):
+        """
+        Replaces the table with a snapshot, only reporting the processes that differ.
+        """
+        table = {}
+        for entry in processes:
+            pid, create_time, name = parse_process(entry)
+            table[pid] = (create_time, name)
+        for pid, entry in list(self.processes.items()):
+            if table.get(pid) != entry:
+                self.remove(tracker, pid, events)
+        for pid, (create_time, name) in table.items():
+            if pid not in self.processes:
+                self.add(tracker, pid, create_time, name, events)
+        self.awaiting_snapshot = False
+
+    def apply_delta(self, tracker, exited, started, events):
+        for pid in exited:
+            if pid in self.processes:
+                self.remove(tracker, pid, events)
+        for entry in started:
+            pid, create_time, name = parse_process(entry)
+            if pid in self.processes:
+                self.remove(tracker, pid, events) # Its exit was missed
+            self.add(tracker, pid, create_time, name, events)
+
+    def clear(self, tracker, events):
+        for pid in list(self.processes):
+            self.remove(tracker, pid, events)
+
+
+class HubConnection:
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.address = address
+        self.reader = MessageReader()
+        self.writer = MessageWriter()
+        self.host = None # Its RemoteHost, once it has said hello
+
+
+class RemoteHub:
+    """
+    The notifier's side: accepts agents on a TCP socket and keeps their processes in the
+    scan worker's ProcessTracker. Once listen() has bound the socket, it runs on the scan
+    worker's thread, in its selector (see ScanWorker.run): its sockets are registered with
+    data=hub, and handle() is called for each ready one. 'hosts' describes the agents for
+    the other threads; it is replaced, never mutated.
+
+    Metrics (see stats.py): remote_bytes_total and remote_messages_total received,
+    remote_resyncs_total, and the remote_hosts connected.
+    """
+    def __init__(self, address, token=None, stats=None, clock=time.monotonic):
+        self.address = address
+        self.token = token
+        self.stats = stats or NullStats()
+        self.clock = clock
+        self.listener = None
+        self.selector = None
+        self.connections = {} # socket -> HubConnection
+        self.remote_hosts = {} # host name -> RemoteHost
+        self.hosts = {} # host name -> {"connected", "processes"}
+        for kind, name, help_text in (
+            ("counter", "remote_bytes_total", "Bytes received from the agents (compressed)"),
+            ("counter", "remote_messages_total", "Messages received from the agents"),
+            ("counter", "remote_resyncs_total", "Snapshots asked of agents whose checksum didn't match"),
+            ("gauge", "remote_hosts", "Agents connected"),
+        ):
+            self.stats.add_metric(kind, name, help_text)
+
+    def listen(self):
+        """
+        Binds the listening socket. Raises OSError, e.g. if the port is taken.
+        """
+        self.listener = socket.create_server(self.address)
+        self.listener.setblocking(False)
+
+    def register(self, selector):
+        self.selector = selector
+        selector.register(self.listener, selectors.EVENT_READ, self)
+
+    def close(self):
+        for sock in list(self.connections):
+            self.drop(sock)
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+
+    def handle(self, sock, tracker):
+        """
+        Serves a ready socket and returns the resulting ProcessEvents.
+        """
+        events = []
+        if sock is self.listener:
+            try:
+                conn, address = sock.accept()
+            except OSError:
+                return events
+            conn.setblocking(False)
+            self.connections[conn] = HubConnection(conn, address)
+            self.selector.register(conn, selectors.EVENT_READ, self)
+            return events
+
+        connection = self.connections[sock]
+        try:
+            data = sock.recv(RECV_BUFFER_SIZE)
+        except BlockingIOError:
+            return events
+        except OSError:
+            data = b""
+        if not data:
+            self.drop(sock)
+            return events
+        self.stats.incr("remote_bytes_total", len(data))
+        try:
+            for message in connection.reader.decode(data):
+                self.stats.incr("remote_messages_total")
+                self.handle_message(connection, message, tracker, events)
+        except (ValueError, TypeError, KeyError) as e:
+            self.send(connection, {"type": "error", "message": str(e)})
+            self.drop(sock)
+        self.update_hosts()
+        return events
+
+    def handle_message(self, connection, message, tracker, events):
+        kind = message.get("type")
+        host = connection.host
+        if host is None:
+            self.handle_hello(connection, message)
+        elif kind == "snapshot":
+            host.apply_snapshot(tracker, message["processes"], events)
+        elif kind == "delta":
+            host.apply_delta(tracker, message["exited"], message["started"], events)
+        elif kind == "checksum":
+            if not host.awaiting_snapshot and (message["count"] != len(host.processes) or message["sum"] != host.digest):
+                host.awaiting_snapshot = True
+                self.stats.incr("remote_resyncs_total")
+                self.send(connection, {"type": "resync"})
+        else:
+            raise ValueError(f"unknown message type {kind!r}")
+
+    def handle_hello(self, connection, message):
+        if message.get("type") != "hello" or message.get("protocol") != PROTOCOL_VERSION:
+            raise ValueError(f"expected a hello for protocol {PROTOCOL_VERSION}")
+        name = message.get("host")
+        if not isinstance(name, str) or not name:
+            raise ValueError("the hello needs a host name")
+        if self.token is not None and not hmac.compare_digest(str(message.get("token")).encode(), self.token.encode()):
+            raise ValueError("wrong token")
+        host = self.remote_hosts.get(name)
+        if host is None:
+            host = self.remote_hosts[name] = RemoteHost(name)
+        elif host.connection is not None:
+            self.drop(host.connection.sock) # The same host reconnected before its old connection was noticed gone
+        host.connection = connection
+        host.disconnected_at = None
+        host.awaiting_snapshot = True # The snapshot follows the hello
+        connection.host = host
+
+    def send(self, connection, message):
+        # The hub only sends a few short messages, which fit in the socket's buffer
+        try:
+            connection.sock.send(connection.writer.encode(message))
+        except OSError:
+            pass # It is dropped when its socket reports the error
+
+    def drop(self, sock):
+        connection = self.connections.pop(sock)
+        self.selector.unregister(sock)
+        sock.close()
+        host = connection.host
+        if host is not None and host.connection is connection:
+            host.connection = None
+            host.disconnected_at = self.clock()
+
+    def next_timeout(self):
+        """
+        Returns how long until a disconnected agent's processes are due to be dropped, or None.
+        """
+        times = [host.disconnected_at for host in self.remote_hosts.values() if host.disconnected_at is not None]
+        if not times:
+            return None
+        return max(0, min(times) + HOST_GRACE_SECONDS - self.clock())
+
+    def expire(self, tracker):
+        """
+        Drops the processes of the agents disconnected for longer than HOST_GRACE_SECONDS, and returns the resulting ProcessEvents.
+        """
+        events = []
+        now = self.clock()
+        for name, host in list(self.remote_hosts.items()):
+            if host.disconnected_at is not None and now - host.disconnected_at >= HOST_GRACE_SECONDS:
+                host.clear(tracker, events)
+                del self.remote_hosts[name]
+        if events:
+            self.update_hosts()
+        return events
+
+    def update_hosts(self):
+        self.hosts = {name: {"connected": host.connection is not None, "processes": len(host.processes)} for name, host in self.remote_hosts.items()}
+        self.stats.set("remote_hosts", sum(host.connection is not None for host in self.remote_hosts.values()))
+
+
+class Agent:
+    """
+    Watches this machine's process table and streams its changes to a hub, reconnecting
+    whenever the connection is lost. The table is scanned every 'scan_seconds' either way,
+    so a reconnection only has to send it once. 'backend' replaces psutil, as in the engine.
+    """
+    def __init__(self, address, host_name=None, token=None, backend=None, scan_seconds=AGENT_SCAN_SECONDS,
+                 checksum_seconds=CHECKSUM_SECONDS, clock=time.monotonic):
+        if backend is None:
+            import psutil
+            backend = psutil
+        self.address = address
+        self.host_name = host_name or socket.gethostname()
+        self.token = token
+        self.tracker = ProcessTracker(backend)
+        # Every process is of interest to the hub, so every PID is checked for reuse (a
+        # bounded number per scan, see ProcessTracker.update); a live view of the names
+        self.tracker.watched_names = self.tracker.pids_by_name.keys()
+        self.scan_seconds = scan_seconds
+        self.checksum_seconds = checksum_seconds
+        self.clock = clock
+        self.table = {} # pid -> (create_time, name), as the hub should have it
+        self.digest = 0 # table_digest(table)
+        self.sock = None
+        self.selector = selectors.DefaultSelector() # Waits for the hub's messages
+        self.writer = None
+        self.reader = None
+        self.bytes_sent = 0
+
+    def scan(self):
+        """
+        Scans the process table and, while connected, sends what changed. Returns the ProcessEvents.
+        """
+        events = self.tracker.update()
+        exited, started = [], []
+        for event in events:
+            if event.kind == PROCESS_STARTED:
+                self.table[event.pid] = (event.create_time, event.name)
+                self.digest += process_digest(event.pid, event.create_time, event.name)
+                started.append([event.pid, event.create_time, event.name])
+            else:
+                del self.table[event.pid]
+                self.digest -= process_digest(event.pid, event.create_time, event.name)
+                exited.append(event.pid)
+        self.digest %= DIGEST_MODULUS
+        if events and self.sock is not None:
+            # A PID reused within one scan exits before it starts again
+            self.send({"type": "delta", "exited": exited, "started": started})
+        return events
+
+    def connect(self):
+        """
+        Connects to the hub and sends the hello and the table. Raises OSError.
+        """
+        self.sock = socket.create_connection(self.address, timeout=CONNECT_TIMEOUT_SECONDS)
+        self.selector.register(self.sock, selectors.EVENT_READ)
+        self.writer = MessageWriter()
+        self.reader = MessageReader()
+        self.send({"type": "hello", "host": self.host_name, "protocol": PROTOCOL_VERSION, "token": self.token})
+        self.send_snapshot()
+
+    def disconnect(self):
+        if self.sock is not None:
+            self.selector.unregister(self.sock)
+            self.sock.close()
+            self.sock = None
+
+    def send(self, message):
+        """
+        Sends a message to the hub. Raises OSError (the connection is closed then).
+        """
+        data = self.writer.encode(message)
+        try:
+            self.sock.sendall(data)
+        except OSError:
+            self.disconnect()
+            raise
+        self.bytes_sent += len(data)
+
+    def send_snapshot(self):
+        self.send({"type": "snapshot", "processes": [[pid, create_time, name] for pid, (create_time, name) in self.table.items()]})
+
+    def send_checksum(self):
+        self.send({"type": "checksum", "count": len(self.table), "sum": self.digest})
+
+    def receive(self):
+        """
+        Handles what the hub sent. Raises OSError if the connection was closed or refused.
+        """
+        try:
+            data = self.sock.recv(RECV_BUFFER_SIZE)
+            if not data:
+                raise ConnectionResetError("the hub closed the connection")
+            messages = self.reader.decode(data)
+        except (OSError, ValueError) as e:
+            self.disconnect()
+            raise OSError(str(e)) from e
+        for message in messages:
+            if message.get("type") == "resync":
+                self.send_snapshot()
+            elif message.get("type") == "error":
+                self.disconnect()
+                raise OSError(f"the hub refused the connection: {message.get('message')}")
+
+    def run(self, stopping, log=print):
+        """
+        Scans, streams and reconnects until the 'stopping' threading.Event is set.
+        'log' gets a line of text whenever the connection changes.
+        """
+        self.scan()
+        reconnect_delay = RECONNECT_SECONDS[0]
+        next_connect = next_scan = next_checksum = self.clock()
+        while not stopping.is_set():
+            now = self.clock()
+            if self.sock is None and now >= next_connect:
+                try:
+                    self.connect()
+                    log(f"Connected to the hub at {self.address[0]}:{self.address[1]} as {self.host_name}")
+                    reconnect_delay = RECONNECT_SECONDS[0]
+                    next_checksum = now + self.checksum_seconds
+                except OSError as e:
+                    self.disconnect()
+                    log(f"Failed to connect to the hub at {self.address[0]}:{self.address[1]}: {e}")
+                    next_connect = now + reconnect_delay
+                    reconnect_delay = min(reconnect_delay * 2, RECONNECT_SECONDS[1])
+            try:
+                if now >= next_scan:
+                    self.scan()
+                    next_scan = now + self.scan_seconds
+                if self.sock is not None and now >= next_checksum:
+                    self.send_checksum()
+                    next_checksum = now + self.checksum_seconds
+                wait = min(next_scan, next_checksum if self.sock is not None else next_connect) - self.clock()
+                if self.sock is not None:
+                    if self.selector.select(max(wait, 0)):
+                        self.receive()
+                else:
+                    stopping.wait(max(wait, 0))
+            except OSError as e:
+                log(f"Lost the connection to the hub: {e}")
+                next_connect = self.clock() + reconnect_delay
+        self.disconnect()
+        self.selector.close()
+
+
+def hub_token():
+    """
+    Returns the shared token from the TOKEN_ENV environment variable, or None.
+    """
+    return os.environ.get(TOKEN_ENV) or None
+
+
+def run_agent(address, host_name=None):
+    """
+    Runs an agent until interrupted (Ctrl+C). Returns an exit code.
+    """
+    import threading
+    agent = Agent(address, host_name, hub_token())
+    try:
+        agent.run(threading.Event(), lambda line: print(line, flush=True))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        agent.disconnect()
+    return 0
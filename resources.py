@@ -0,0 +1,192 @@
+'''
+Resource-threshold triggers: timers that fire when a process matching their pattern
+stays above a CPU, memory or open-files threshold for a while, instead of after it has
+been running for a number of minutes.
+
+A trigger is written METRIC>THRESHOLD:SECONDS, e.g.
+- cpu>80:60       above 80% CPU (of one core) for a minute
+- rss>1.5GB:120   above 1.5 GB of resident memory for two minutes
+- files>1000:30   more than 1000 open file descriptors (handles on Windows) for 30 seconds
+
+The scan worker samples only the processes matching a resource-triggered timer, every
+RESOURCE_SAMPLE_SECONDS, taking their PIDs from its process index rather than walking the
+process table again, and reading each one's metrics in a single psutil oneshot(). The
+engine keeps the samples of each process in fixed-size ring buffers and checks the
+triggers against them.
+'''
+
+from collections import namedtuple
+import math
+import re
+
+RESOURCE_SAMPLE_SECONDS = 5 # How often the processes of resource-triggered timers are sampled
+RESOURCE_HISTORY_SAMPLES = 121 # Samples kept per process and metric, which bounds the trigger windows
+
+RESOURCE_METRICS = ("cpu", "rss", "files")
+SIZE_UNITS = {"": 1, "b": 1, "k": 1024, "kb": 1024, "m": 1024 ** 2, "mb": 1024 ** 2, "g": 1024 ** 3, "gb": 1024 ** 3}
+TRIGGER_PATTERN = re.compile(r"(cpu|rss|files)>(\d+(?:\.\d+)?)([a-z]*):(\d+)")
+
+# 'spec' is the trigger as written in the timers file, without spaces; the threshold is in
+# percent (cpu), bytes (rss) or descriptors (files)
+ResourceTrigger = namedtuple("ResourceTrigger", ["spec", "metric", "threshold", "window_seconds"])
+
+# What the scan worker publishes after sampling: 'samples' maps each sampled PID to
+# (case-folded name, cpu, rss, files), None for the metrics no trigger needed;
+# 'sampled_at' is on the consumer's monotonic clock.
+ResourceSamples = namedtuple("ResourceSamples", ["samples", "sampled_at", "sample_seconds"])
+
+
+def parse_trigger(spec):
+    """
+    Parses a METRIC>THRESHOLD:SECONDS trigger. Raises ValueError if it isn't valid.
+    """
+    spec = "".join(spec.split())
+    match = TRIGGER_PATTERN.fullmatch(spec.casefold())
+    if match is None:
+        raise ValueError(f"invalid trigger '{spec}' (expected e.g. cpu>80:60, rss>500MB:120 or files>1000:30)")
+    metric, number, unit, window = match.groups()
+    if unit and (metric != "rss" or unit not in SIZE_UNITS):
+        raise ValueError(f"invalid unit '{unit}' in trigger '{spec}'")
+    window_seconds = int(window)
+    max_window = (RESOURCE_HISTORY_SAMPLES - 1) * RESOURCE_SAMPLE_SECONDS
+    if not 0 < window_seconds <= max_window:
+        raise ValueError(f"the window of trigger '{spec}' must be between 1 and {max_window} seconds")
+    return ResourceTrigger(spec, metric, float(number) * SIZE_UNITS[unit], window_seconds)
+
+
+class RingBuffer:
+    """
+    The last 'capacity' (time, value) samples of one metric, in preallocated lists, so
+    recording a sample never allocates.
+    """
+    __slots__ = ("times", "values", "next", "count")
+
+    def __init__(self, capacity=RESOURCE_HISTORY_SAMPLES):
+        self.times = [0.0] * capacity
+        self.values = [0.0] * capacity
+        self.next = 0 # Where the next sample goes
+        self.count = 0
+
+    def append(self, at, value):
+        self.times[self.next] = at
+        self.values[self.next] = value
+        self.next = (self.next + 1) % len(self.times)
+        if self.count < len(self.times):
+            self.count += 1
+
+    def above_since(self, threshold, since):
+        """
+        Checks if every sample from 'since' on is above the threshold, and the samples reach back to 'since'.
+        """
+        capacity = len(self.times)
+        index = self.next
+        for _ in range(self.count):
+            index = (index - 1) % capacity
+            if self.values[index] <= threshold:
+                return False
+            if self.times[index] <= since:
+                return True
+        return False
+
+
+class ResourceMonitor:
+    """
+    The engine's side: keeps the recent samples of every sampled process and tells
+    whether one of them has been above a trigger's threshold for its whole window.
+    """
+    def __init__(self):
+        self.history = {} # pid -> {metric: RingBuffer}
+
+    def record(self, samples, sampled_at):
+        """
+        Adds a round of samples. The history of processes missing from it (exited, or
+        no longer watched) is dropped.
+        """
+        history = {}
+        for pid, (_, *values) in samples.items():
+            buffers = self.history.get(pid) or {}
+            for metric, value in zip(RESOURCE_METRICS, values):
+                if value is None:
+                    continue
+                buffer = buffers.get(metric)
+                if buffer is None:
+                    buffer = buffers[metric] = RingBuffer()
+                buffer.append(sampled_at, value)
+            history[pid] = buffers
+        self.history = history
+
+    def breached(self, trigger, pids, now):
+        """
+        Checks if any of the processes has been above the trigger's threshold for its whole window.
+        """
+        since = now - trigger.window_seconds
+        for pid in pids:
+            buffer = self.history.get(pid, {}).get(trigger.metric)
+            if buffer is not None and buffer.above_since(trigger.threshold, since):
+                return True
+        return False
+
+
+class ResourceSampler:
+    """
+    The scan worker's side: reads the metrics of the processes matching a set of patterns.
+    'backend' is the psutil module, or anything with the same Process() API.
+    """
+    def __init__(self, backend):
+        self.backend = backend
+        # (pid, create_time) -> Process, kept between samples since cpu_percent() measures
+        # from the previous call on the same object; keyed with the create_time so a
+        # recycled PID gets a fresh one
+        self.processes = {}
+
+    def sample(self, tracker, names, matcher, metrics):
+        """
+        Samples the running processes whose name is in 'names' and matches 'matcher',
+        reading only the given metrics. Returns the 'samples' of a ResourceSamples.
+        """
+        samples = {}
+        processes = {}
+        for name in names:
+            if not matcher.match(name):
+                continue
+            for pid in tracker.local_pids(name): # Other machines' processes aren't sampled
+                key = (pid, tracker.create_time(pid))
+                process = self.processes.get(key)
+                try:
+                    if process is None:
+                        process = self.backend.Process(pid)
+                    with process.oneshot():
+                        samples[pid] = (
+                            name,
+                            process.cpu_percent() if "cpu" in metrics else None,
+                            process.memory_info().rss if "rss" in metrics else None,
+                            open_files(process) if "files" in metrics else None,
+                        )
+                except (self.backend.NoSuchProcess, self.backend.AccessDenied):
+                    continue
+                processes[key] = process
+        self.processes = processes
+        return samples
+
+
+def open_files(process):
+    """
+    Returns the number of file descriptors (handles on Windows) a process has open.
+    """
+    if hasattr(process, "num_fds"):
+        return process.num_fds()
+    return process.num_handles()
+
+
+def describe_trigger(trigger):
+    """
+    Describes a trigger for display, e.g. "CPU above 80% for 60s".
+    """
+    if trigger.metric == "cpu":
+        threshold = f"CPU above {trigger.threshold:g}%"
+    elif trigger.metric == "files":
+        threshold = f"above {trigger.threshold:g} open files"
+    else:
+        exponent = min(int(math.log(trigger.threshold, 1024)), 3) if trigger.threshold >= 1 else 0
+        threshold = f"memory above {trigger.threshold / 1024 ** exponent:.4g} {('B', 'KB', 'MB', 'GB')[exponent]}"
+    return f"{threshold} for {trigger.window_seconds}s"
@@ -0,0 +1,280 @@
+'''
+Background process scanning, so the Tk event loop never waits on psutil.
+'''
+
+from collections import namedtuple
+import queue
+import selectors
+import socket
+import threading
+import time
+from types import MappingProxyType
+
+from processes import ProcessSnapshot, ProcessTracker
+from proc_events import open_proc_connector, PidfdWatcher, EventsLost
+from resources import ResourceSampler, ResourceSamples, RESOURCE_SAMPLE_SECONDS
+from stats import NullStats
+
+SCAN_BACKOFF_FACTOR = 2 # Each scan that changes nothing of interest stretches the interval by this much
+
+# What the worker publishes after every scan or batch of kernel events that changed something.
+# 'snapshot' is an immutable ProcessSnapshot, 'detected_at' is on the monotonic clock and
+# 'scan_seconds' is how long the worker spent producing the result. 'initial' marks the
+# result of the first scan, published even if empty: its events are the processes that
+# were already running, rather than processes that just started.
+ScanResult = namedtuple("ScanResult", ["events", "snapshot", "detected_at", "scan_seconds", "initial"])
+
+
+def freeze_snapshot(tracker, with_create_times=False):
+    """
+    Copies the tracker's index into an immutable ProcessSnapshot that can be handed to another thread.
+    The create_times of the named processes are only copied when asked for.
+    """
+    create_times = None
+    if with_create_times:
+        create_times = {pid: create_time for pid, (create_time, name) in tracker.processes.items() if name is not None}
+        create_times.update((key, create_time) for key, (create_time, name) in tracker.remote.items())
+        create_times = MappingProxyType(create_times)
+    return ProcessSnapshot(MappingProxyType({name: frozenset(pids) for name, pids in tracker.pids_by_name.items()}), create_times)
+
+
+class ScanWorker(threading.Thread):
+    """
+    Owns the ProcessTracker and keeps it up to date on a background thread, using kernel
+    process events when they are available (see proc_events) and psutil scans otherwise.
+    Results are put on the 'results' queue; the consumer only ever drains it.
+    'clock' stamps the results' detected_at and should be the consumer's monotonic clock.
+    The worker writes the scan metrics of 'stats' (see stats.py).
+
+    The scan fallback is adaptive: it scans every 'interval_seconds' after a change to a
+    process the consumer is interested in, backs off up to 'max_interval_seconds' while
+    nothing changes, rescans just before the consumer's next deadline, and stops scanning
+    altogether while the consumer isn't watching anything (see set_hints).
+
+    While the consumer has resource triggers (see set_resource_triggers), the processes
+    they match are also sampled every RESOURCE_SAMPLE_SECONDS, and a ResourceSamples
+    (see resources.py) is published on the same queue.
+
+    With a 'hub' (a listening remote.RemoteHub), the processes reported by agents on other
+    machines are tracked too, and their starts and exits published like the local ones.
+    """
+    def __init__(self, interval_seconds, use_process_events=True, backend=None, clock=time.monotonic, stats=None, max_interval_seconds=None, hub=None):
+        super().__init__(name="process-scanner", daemon=True)
+        self.min_interval = interval_seconds
+        self.max_interval = max(max_interval_seconds or interval_seconds, interval_seconds)
+        self.interval_seconds = interval_seconds # The current scan interval, between the two above
+        self.active = True # Set by the consumer: scans are suspended while it is False
+        self.next_deadline = None # Set by the consumer: its earliest deadline, on 'clock'
+        self.matcher = None # Set by the consumer: a matcher.ProcessMatcher for the names it watches
+        self.with_create_times = False # Set by the consumer: include the create_times in the snapshots
+        self.on_first_scan = None # Set by the consumer: called on the worker's thread once the first scan is published
+        self.use_process_events = use_process_events
+        self.clock = clock
+        self.stats = stats or NullStats()
+        self.results = queue.Queue()
+        self.watched_names = frozenset() # Replaced (not mutated) by the consumer thread
+        self.backend = backend # None for psutil
+        self.tracker = None # Created by the first scan (see open_tracker)
+        self.sampler = None
+        self.resource_matcher = None # Set by the consumer: the patterns to sample, None while there are none
+        self.resource_metrics = frozenset()
+        self.hub = hub
+        self.stopping = threading.Event()
+        self.wakeup_reader, self.wakeup_writer = socket.socketpair()
+        self.wakeup_writer.setblocking(False)
+
+    def open_tracker(self):
+        """
+        Creates the ProcessTracker on the first scan, rather than with the worker, so
+        psutil is imported on the worker's thread and a front-end can show up without it.
+        """
+        backend = self.backend
+        if backend is None:
+            import psutil
+            backend = psutil
+        self.tracker = ProcessTracker(backend)
+        self.sampler = ResourceSampler(backend)
+
+    def wake(self):
+        try:
+            self.wakeup_writer.send(b"\0")
+        except BlockingIOError:
+            pass # A wakeup is already pending
+
+    def stop(self):
+        self.stopping.set()
+        self.wake()
+
+    def set_hints(self, active, next_deadline):
+        """
+        Tells the worker whether any process is watched at all and when the consumer's
+        next deadline is, waking it up to reschedule its next scan if either changed.
+        """
+        if active == self.active and next_deadline == self.next_deadline:
+            return
+        if active and not self.active:
+            self.interval_seconds = self.min_interval
+        self.active = active
+        self.next_deadline = next_deadline
+        self.wake()
+
+    def set_resource_triggers(self, matcher, metrics):
+        """
+        Tells the worker which processes to sample (a matcher.ProcessMatcher, or None to
+        stop sampling) and which of the RESOURCE_METRICS to read.
+        """
+        start = matcher is not None and self.resource_matcher is None
+        self.resource_metrics = frozenset(metrics)
+        self.resource_matcher = matcher
+        if start:
+            self.wake()
+
+    def next_sample_delay(self, last_sample):
+        """
+        Returns how long until the next resource sample is due, or None while nothing is sampled.
+        """
+        if self.resource_matcher is None or not self.active:
+            return None
+        return max(0, last_sample + RESOURCE_SAMPLE_SECONDS - self.clock())
+
+    def next_scan_delay(self, last_scan, exits_reported):
+        """
+        Returns how long until the next scan is due, or None while scans are suspended.
+        """
+        if not self.active:
+            return None
+        due = last_scan + self.interval_seconds
+        next_deadline = self.next_deadline
+        if next_deadline is not None and not exits_reported:
+            # Rescan just before the deadline, so a process that has exited doesn't get notified for
+            due = min(due, max(next_deadline - self.min_interval / 2, last_scan + self.min_interval))
+        return max(0, due - self.clock())
+
+    def adapt_interval(self, events):
+        """
+        Scans often right after a watched process started or exited, and less and less often while none did.
+        """
+        matcher = self.matcher
+        if any(matcher is None or matcher.match(event.name) for event in events):
+            self.interval_seconds = self.min_interval
+        else:
+            self.interval_seconds = min(self.interval_seconds * SCAN_BACKOFF_FACTOR, self.max_interval)
+
+    def run(self):
+        selector = selectors.DefaultSelector()
+        selector.register(self.wakeup_reader, selectors.EVENT_READ)
+
+        connector = open_proc_connector() if self.use_process_events else None
+        pidfd_watcher = None
+        if connector is not None:
+            selector.register(connector, selectors.EVENT_READ)
+        elif self.use_process_events and PidfdWatcher.is_supported():
+            pidfd_watcher = PidfdWatcher(
+                register=lambda pid, fd: selector.register(fd, selectors.EVENT_READ, pid),
+                unregister=selector.unregister,
+            )
+
+        if self.hub is not None:
+            self.hub.register(selector)
+
+        # With the connector subscribed first, one scan is enough to start from
+        self.scan(pidfd_watcher)
+        if self.on_first_scan is not None:
+            self.on_first_scan()
+        last_scan = last_sample = self.clock()
+        while not self.stopping.is_set():
+            # The connector reports everything, so only the scan fallback needs a timeout
+            scan_delay = None if connector is not None else self.next_scan_delay(last_scan, pidfd_watcher is not None)
+            sample_delay = self.next_sample_delay(last_sample)
+            hub_delay = self.hub.next_timeout() if self.hub is not None else None
+            timeout = min((delay for delay in (scan_delay, sample_delay, hub_delay) if delay is not None), default=None)
+            ready = selector.select(timeout)
+
+            started = time.perf_counter()
+            events = []
+            read_events = False # Only reads of process events count as scans, not wakeups or hints
+            for key, mask in ready:
+                if key.fileobj is self.wakeup_reader:
+                    self.wakeup_reader.recv(64)
+                elif key.fileobj is connector:
+                    read_events = True
+                    try:
+                        events += self.tracker.apply_changes(connector.read_events())
+                    except EventsLost:
+                        events += self.tracker.update() # The kernel dropped events, resynchronise
+                elif self.hub is not None and key.data is self.hub:
+                    remote_events = self.hub.handle(key.fileobj, self.tracker)
+                    read_events = read_events or bool(remote_events)
+                    events += remote_events
+                else:
+                    read_events = True
+                    pidfd_watcher.discard(key.data)
+                    exits = self.tracker.remove_pid(key.data)
+                    if exits:
+                        self.adapt_interval(exits)
+                    events += exits
+            if self.hub is not None:
+                events += self.hub.expire(self.tracker)
+            if events:
+                self.publish(events, started)
+            if read_events:
+                self.record_scan(started)
+
+            if connector is None and self.next_scan_delay(last_scan, pidfd_watcher is not None) == 0:
+                self.scan(pidfd_watcher)
+                last_scan = self.clock()
+            if self.next_sample_delay(last_sample) == 0:
+                self.sample_resources()
+                last_sample = self.clock()
+
+        if connector is not None:
+            connector.close()
+        if pidfd_watcher is not None:
+            pidfd_watcher.close()
+        if self.hub is not None:
+            self.hub.close()
+        selector.close()
+
+    def scan(self, pidfd_watcher=None):
+        """
+        Runs one psutil scan and publishes what changed. Also callable directly,
+        without starting the thread, to drive scans synchronously (see benchmarks/).
+        """
+        started = time.perf_counter()
+        initial = self.tracker is None
+        if initial:
+            self.open_tracker()
+        self.tracker.watched_names = self.watched_names
+        events = self.tracker.update()
+        if pidfd_watcher is not None:
+            watched_pids = set()
+            for name in self.tracker.watched_names:
+                watched_pids |= self.tracker.local_pids(name)
+            pidfd_watcher.sync(watched_pids)
+        self.adapt_interval(events)
+        if events or initial:
+            self.publish(events, started, initial)
+        self.record_scan(started)
+
+    def sample_resources(self):
+        """
+        Samples the processes matching the resource triggers and publishes the samples.
+        Like scan(), also callable directly.
+        """
+        matcher = self.resource_matcher
+        if matcher is None or self.tracker is None:
+            return
+        started = time.perf_counter()
+        samples = self.sampler.sample(self.tracker, self.watched_names, matcher, self.resource_metrics)
+        self.results.put(ResourceSamples(samples, self.clock(), time.perf_counter() - started))
+        self.stats.observe("resource_sample_ms", (time.perf_counter() - started) * 1000)
+        self.stats.incr("resource_samples_total", len(samples))
+
+    def record_scan(self, started):
+        self.stats.observe("scan_ms", (time.perf_counter() - started) * 1000)
+        self.stats.incr("scans_total")
+        self.stats.incr("processes_scanned_total", len(self.tracker.processes))
+        self.stats.set("processes", len(self.tracker.processes))
+
+    def publish(self, events, started, initial=False):
+        self.results.put(ScanResult(events, freeze_snapshot(self.tracker, self.with_create_times), self.clock(), time.perf_counter() - started, initial))
@@ -0,0 +1,75 @@
+'''
+Deadline scheduling for the timers.
+'''
+
+import heapq
+import itertools
+import time
+
+
+class DeadlineScheduler:
+    """
+    Keeps the running timers in a min-heap keyed by their next due time on the
+    monotonic clock, so finding the next timer to fire is O(1) and (re)scheduling
+    one is O(log n). Cancelled entries are left in the heap and skipped when they
+    reach the top. Anything with a 'deadline' attribute can be scheduled.
+    """
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.heap = []  # [deadline, sequence, timer], timer is None once cancelled
+        self.entries = {}  # id(timer) -> its live heap entry
+        self.sequence = itertools.count()  # Breaks ties between equal deadlines
+
+    def __len__(self):
+        return len(self.entries)
+
+    def schedule(self, timer, deadline):
+        """
+        Sets (or moves) the timer's deadline.
+        """
+        self.cancel(timer)
+        entry = [deadline, next(self.sequence), timer]
+        self.entries[id(timer)] = entry
+        heapq.heappush(self.heap, entry)
+        timer.deadline = deadline
+
+    def schedule_in(self, timer, seconds):
+        self.schedule(timer, self.clock() + seconds)
+
+    def cancel(self, timer):
+        """
+        Removes the timer from the schedule, if it was scheduled.
+        """
+        entry = self.entries.pop(id(timer), None)
+        if entry is not None:
+            entry[-1] = None
+        timer.deadline = None
+
+    def clear(self):
+        for entry in self.entries.values():
+            entry[-1].deadline = None
+        self.heap = []
+        self.entries = {}
+
+    def next_deadline(self):
+        """
+        Returns the earliest deadline, or None when nothing is scheduled.
+        """
+        while self.heap and self.heap[0][-1] is None:
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else None
+
+    def pop_due(self, now=None):
+        """
+        Removes and returns the (timer, deadline) pairs whose deadline has passed.
+        """
+        if now is None:
+            now = self.clock()
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            deadline, _, timer = heapq.heappop(self.heap)
+            if timer is not None:
+                del self.entries[id(timer)]
+                timer.deadline = None
+                due.append((timer, deadline))
+        return due
@@ -0,0 +1,193 @@
+'''
+Extra outputs for the notifications, next to the popup (or the console in headless
+mode): a JSON lines log file, a local HTTP webhook and stdout.
+
+Every sink runs on its own thread behind a bounded queue. The notification dispatcher
+only ever does a put_nowait, so a slow or dead sink can't delay the other sinks, the
+timers or the UI: once its queue is full, new notifications for that sink are dropped
+(and counted). Queued notifications are delivered in batches, and a failed batch is
+retried with exponential backoff before it is dropped.
+
+Sink specs on the command line:
+- stdout
+- jsonl:PATH
+- webhook:URL (POSTs a JSON array of notifications)
+'''
+
+import json
+import queue
+import sys
+import threading
+import time
+
+from stats import NullStats
+
+SINK_QUEUE_SIZE = 1000 # Notifications a sink can fall behind by before new ones are dropped
+SINK_BATCH_SIZE = 50 # Most notifications delivered in one go
+SINK_RETRIES = 4 # Retries of a failed batch before it is dropped
+SINK_RETRY_BASE_SECONDS = 0.5 # The first retry delay, doubled on every retry
+SINK_STOP_TIMEOUT_SECONDS = 2 # How long closing waits for a sink to deliver what it has queued
+WEBHOOK_TIMEOUT_SECONDS = 5
+
+SINK_KINDS = ("stdout", "jsonl", "webhook")
+
+
+def parse_sink_spec(spec):
+    """
+    Splits a 'kind' or 'kind:target' sink spec. Raises ValueError if it isn't valid.
+    """
+    kind, _, target = spec.partition(":")
+    if kind not in SINK_KINDS:
+        raise ValueError(f"unknown sink '{kind}' (expected one of: {', '.join(SINK_KINDS)})")
+    if kind != "stdout" and not target:
+        raise ValueError(f"the {kind} sink needs a target, e.g. {kind}:{'notifications.jsonl' if kind == 'jsonl' else 'http://127.0.0.1:8080/'}")
+    return kind, target
+
+
+def create_sinks(specs, stats=None):
+    """
+    Creates (without starting) a sink for each (kind, target) spec. Sinks of the same
+    kind are numbered, so each one gets its own metrics.
+    """
+    classes = {"stdout": StdoutSink, "jsonl": JsonLogSink, "webhook": WebhookSink}
+    sinks = []
+    seen = {}
+    for kind, target in specs:
+        seen[kind] = seen.get(kind, 0) + 1
+        name = kind if seen[kind] == 1 else f"{kind}{seen[kind]}"
+        sinks.append(classes[kind](name, target, stats))
+    return sinks
+
+
+class Sink(threading.Thread):
+    """
+    Delivers notifications on a background thread. Subclasses implement send(batch),
+    which gets a list of notification dicts and raises OSError (or ValueError) on failure.
+
+    Metrics, under sink_<name>_: delivered_total, failed_total (dropped after the retries),
+    retries_total and latency_ms (from submit to delivery) are written by the sink's thread,
+    overflow_total (dropped on a full queue) by the thread that submits.
+    """
+    def __init__(self, name, stats=None):
+        super().__init__(name=f"sink-{name}", daemon=True)
+        self.sink_name = name
+        self.stats = stats or NullStats()
+        self.queue = queue.Queue(maxsize=SINK_QUEUE_SIZE) # (submitted_at, notification), None to stop
+        self.stopping = threading.Event()
+        self.metric = f"sink_{name}_"
+        for kind, suffix, help_text in (
+            ("counter", "delivered_total", f"Notifications delivered by the {name} sink"),
+            ("counter", "failed_total", f"Notifications the {name} sink dropped after retrying"),
+            ("counter", "overflow_total", f"Notifications dropped because the {name} sink's queue was full"),
+            ("counter", "retries_total", f"Retried deliveries of the {name} sink"),
+            ("histogram", "latency_ms", f"Time from a notification to its delivery by the {name} sink"),
+        ):
+            self.stats.add_metric(kind, self.metric + suffix, help_text)
+
+    def submit(self, notification):
+        """
+        Queues a notification for delivery; never blocks.
+        """
+        try:
+            self.queue.put_nowait((time.monotonic(), notification))
+        except queue.Full:
+            self.stats.incr(self.metric + "overflow_total")
+
+    def close(self):
+        """
+        Stops the sink, giving it up to SINK_STOP_TIMEOUT_SECONDS to deliver what is queued.
+        Retries are abandoned once closing.
+        """
+        if not self.is_alive():
+            return
+        self.stopping.set()
+        try:
+            self.queue.put(None, timeout=SINK_STOP_TIMEOUT_SECONDS)
+        except queue.Full:
+            pass
+        self.join(SINK_STOP_TIMEOUT_SECONDS)
+
+    def run(self):
+        stopping = False
+        while not stopping:
+            item = self.queue.get()
+            if item is None:
+                break
+            batch = [item]
+            while len(batch) < SINK_BATCH_SIZE:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self.deliver(batch)
+
+    def deliver(self, batch):
+        notifications = [notification for _, notification in batch]
+        delay = SINK_RETRY_BASE_SECONDS
+        for attempt in range(SINK_RETRIES + 1):
+            try:
+                self.send(notifications)
+                break
+            except (OSError, ValueError) as e:
+                if attempt == SINK_RETRIES or self.stopping.wait(delay):
+                    print(f"Sink {self.sink_name}: dropped {len(batch)} notifications: {e}", file=sys.stderr)
+                    self.stats.incr(self.metric + "failed_total", len(batch))
+                    return
+                self.stats.incr(self.metric + "retries_total")
+                delay *= 2
+        delivered_at = time.monotonic()
+        for submitted_at, _ in batch:
+            self.stats.observe(self.metric + "latency_ms", (delivered_at - submitted_at) * 1000)
+        self.stats.incr(self.metric + "delivered_total", len(batch))
+
+    def send(self, notifications):
+        raise NotImplementedError
+
+
+class StdoutSink(Sink):
+    """
+    Writes every notification to stdout as a JSON line.
+    """
+    def __init__(self, name, target=None, stats=None):
+        super().__init__(name, stats)
+
+    def send(self, notifications):
+        sys.stdout.write("".join(json.dumps(notification) + "\n" for notification in notifications))
+        sys.stdout.flush()
+
+
+class JsonLogSink(Sink):
+    """
+    Appends every notification to a file as a JSON line.
+    """
+    def __init__(self, name, path, stats=None):
+        super().__init__(name, stats)
+        self.path = path
+
+    def send(self, notifications):
+        with open(self.path, "a") as f:
+            f.write("".join(json.dumps(notification) + "\n" for notification in notifications))
+
+
+class WebhookSink(Sink):
+    """
+    POSTs each batch of notifications to a URL as a JSON array.
+    """
+    def __init__(self, name, url, stats=None):
+        super().__init__(name, stats)
+        self.url = url
+
+    def send(self, notifications):
+        # Imported on the sink's thread: they are slow to import, and only webhooks need them
+        import http.client
+        import urllib.request
+        request = urllib.request.Request(self.url, data=json.dumps(notifications).encode(), headers={"Content-Type": "application/json"}, method="POST")
+        try:
+            with urllib.request.urlopen(request, timeout=WEBHOOK_TIMEOUT_SECONDS) as response:
+                response.read()
+        except http.client.HTTPException as e: # A malformed response, e.g. a garbage status line
+            raise OSError(f"bad response from {self.url}: {e!r}") from e
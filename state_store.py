@@ -0,0 +1,165 @@
+'''
+Durable per-timer state (countdown progress and last firing), kept across restarts.
+
+The state lives in two files next to the timers file:
+- a snapshot (JSON object of key -> record), only ever replaced atomically (temp file + rename)
+- an append-only journal of JSON lines, one record per change
+
+Loading reads the snapshot and replays the journal on top. Once the journal holds
+JOURNAL_COMPACT_THRESHOLD records it is folded into a new snapshot and truncated, so
+a change costs one appended line and the journal replayed on startup stays bounded.
+Writing a record that doesn't change anything appends nothing, and compacting with an
+empty journal is skipped, so stopping with idle timers doesn't rewrite the snapshot.
+Records are whole-state upserts, so replaying a journal twice is harmless.
+
+The state is a convenience: if the files can't be read or written (a read-only directory,
+a directory in the way, a full disk), the error is reported on stderr and the timers keep
+running on the state in memory.
+'''
+
+import json
+import os
+import sys
+
+JOURNAL_COMPACT_THRESHOLD = 500
+
+
+def state_paths(timers_file):
+    """
+    Returns the (snapshot, journal) paths used for the given timers file.
+    """
+    base = os.path.splitext(timers_file)[0]
+    return f"{base}_state.json", f"{base}_state.journal"
+
+
+class StateStore:
+    """
+    Maps timer keys to small JSON records, e.g. {"elapsed": 120.0, "last_fired": 1700000000.0}.
+    Without paths, the state is only kept in memory.
+    """
+    def __init__(self, snapshot_path=None, journal_path=None, compact_threshold=JOURNAL_COMPACT_THRESHOLD):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.compact_threshold = compact_threshold
+        self.state = {}
+        self.journal = None
+        self.journal_records = 0
+        self.failing = False # Whether the last write failed; reported once per run of failures
+
+    def load(self):
+        """
+        Reads the snapshot and replays the journal. Missing files mean no state yet;
+        a torn last line (crash mid-write) is ignored.
+        """
+        self.state = {}
+        if self.snapshot_path is None:
+            return self.state
+        try:
+            with open(self.snapshot_path, "r") as f:
+                self.state = json.load(f)
+        except FileNotFoundError:
+            pass
+        except ValueError:
+            pass # A half-written snapshot can't happen with the rename, but don't crash on a bad one
+        except OSError as e:
+            print(f"Failed to read the timer state: {e}", file=sys.stderr)
+        if not isinstance(self.state, dict):
+            self.state = {}
+
+        self.journal_records = 0
+        try:
+            with open(self.journal_path, "r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if isinstance(record, dict) and "key" in record:
+                        self.apply(record)
+                        self.journal_records += 1
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e: # ValueError: not UTF-8
+            print(f"Failed to read the timer state journal: {e}", file=sys.stderr)
+        return self.state
+
+    def apply(self, record):
+        key = record.pop("key")
+        if record.get("removed"):
+            self.state.pop(key, None)
+        else:
+            self.state[key] = record
+
+    def record(self, key, **fields):
+        """
+        Sets the state of one timer and appends it to the journal, if it changed.
+        """
+        if not self.failing and self.state.get(key) == fields:
+            return
+        self.state[key] = fields
+        self.append({"key": key, **fields})
+
+    def remove(self, key):
+        if self.state.pop(key, None) is not None:
+            self.append({"key": key, "removed": True})
+
+    def append(self, record):
+        if self.journal_path is None:
+            return
+        try:
+            if self.journal is None:
+                self.journal = open(self.journal_path, "a")
+            self.journal.write(json.dumps(record, separators=(",", ":")) + "\n")
+            self.journal.flush()
+        except OSError as e:
+            self.close() # Reopened by the next record
+            self.write_failed(e)
+            return
+        self.failing = False
+        self.journal_records += 1
+        if self.journal_records >= self.compact_threshold:
+            self.compact()
+
+    def compact(self):
+        """
+        Writes the whole state to a new snapshot atomically, then empties the journal.
+        Does nothing if the journal is empty, as the snapshot is up to date then.
+        """
+        if self.snapshot_path is None or (self.journal_records == 0 and not self.failing):
+            return
+        temp_path = self.snapshot_path + ".tmp"
+        try:
+            with open(temp_path, "w") as f:
+                json.dump(self.state, f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.snapshot_path)
+        except OSError as e:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            self.write_failed(e) # The journal still holds the changes
+            return
+
+        self.close()
+        try:
+            self.journal = open(self.journal_path, "w")
+        except OSError as e:
+            self.write_failed(e)
+            return
+        self.failing = False
+        self.journal_records = 0
+
+    def write_failed(self, error):
+        if not self.failing:
+            print(f"Failed to save the timer state, progress may be lost on restart: {error}", file=sys.stderr)
+        self.failing = True
+
+    def close(self):
+        if self.journal is not None:
+            try:
+                self.journal.close()
+            except OSError:
+                pass # The failed write was already reported
+            self.journal = None
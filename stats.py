@@ -0,0 +1,188 @@
+'''
+Built-in instrumentation: counters, gauges and latency histograms for the engine,
+with Prometheus text and JSON lines exports.
+
+Every metric has a single writer thread (the scan worker or the engine's thread), so
+no locking is needed. When instrumentation is off the engine gets a NullStats, whose
+methods do nothing.
+'''
+
+import bisect
+import json
+import os
+import time
+
+# Upper bounds (ms) of the histogram buckets; the last bucket is everything above
+BUCKET_BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+HISTOGRAM_HELP = {
+    "scan_ms": "Time the scan worker spent on a process scan or batch of process events",
+    "apply_ms": "Time the engine's thread spent applying scan results",
+    "render_ms": "Time spent rendering the timers list",
+    "scheduling_lag_ms": "How late notifications fired compared with their deadline",
+    "notify_ms": "Time spent dispatching a notification",
+    "resource_sample_ms": "Time the scan worker spent sampling the processes of resource triggers",
+    "tick_ms": "Time spent in an engine tick",
+}
+COUNTER_HELP = {
+    "ticks_total": "Engine ticks",
+    "scans_total": "Process scans and batches of process events",
+    "processes_scanned_total": "Processes seen by the scans",
+    "process_events_total": "Process start and exit events",
+    "resource_samples_total": "Process resource samples taken for resource triggers",
+    "notifications_total": "Notifications fired",
+    "notifications_suppressed_total": "Notifications dropped by the per-timer rate limit",
+}
+GAUGE_HELP = {
+    "timers": "Timers loaded",
+    "scheduled_timers": "Timers counting down",
+    "processes": "Processes in the last scan",
+    "scan_interval_ms": "Current interval of the adaptive process scans (0 while suspended)",
+}
+
+METRIC_PREFIX = "oabd_notifier_"
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value_ms):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS_MS, value_ms)] += 1
+        self.count += 1
+        self.sum += value_ms
+        if value_ms > self.max:
+            self.max = value_ms
+
+    def percentile(self, fraction):
+        """
+        Estimates a percentile as the upper bound of the bucket it falls in.
+        """
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(BUCKET_BOUNDS_MS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class Stats:
+    """
+    Collects the engine's metrics.
+    """
+    enabled = True
+
+    def __init__(self):
+        self.started = time.time()
+        self.counters = dict.fromkeys(COUNTER_HELP, 0)
+        self.gauges = dict.fromkeys(GAUGE_HELP, 0)
+        self.histograms = {name: Histogram() for name in HISTOGRAM_HELP}
+        self.help = {**COUNTER_HELP, **GAUGE_HELP, **HISTOGRAM_HELP}
+
+    def add_metric(self, kind, name, help_text):
+        """
+        Registers a metric that isn't known up front, e.g. one per notification sink.
+        'kind' is 'counter', 'gauge' or 'histogram'. Must be called before the metric's
+        writer thread starts.
+        """
+        self.help[name] = help_text
+        if kind == "histogram":
+            self.histograms[name] = Histogram()
+        elif kind == "gauge":
+            self.gauges[name] = 0
+        else:
+            self.counters[name] = 0
+
+    def incr(self, name, amount=1):
+        self.counters[name] += amount
+
+    def set(self, name, value):
+        self.gauges[name] = value
+
+    def observe(self, name, value_ms):
+        self.histograms[name].observe(value_ms)
+
+    def summary_lines(self):
+        """
+        A short human-readable summary, for the stats panel.
+        """
+        lines = []
+        for name, histogram in self.histograms.items():
+            lines.append(f"{name[:-3]:<16} p50 {histogram.percentile(0.5):7.2f} ms  p99 {histogram.percentile(0.99):7.2f} ms  max {histogram.max:7.2f} ms  (n={histogram.count})")
+        lines.append("  ".join(f"{name}: {value}" for name, value in self.counters.items()))
+        lines.append("  ".join(f"{name}: {value}" for name, value in self.gauges.items()))
+        return lines
+
+    def prometheus_text(self):
+        """
+        Renders the metrics in the Prometheus text exposition format.
+        """
+        out = []
+        for name, value in self.counters.items():
+            out += [f"# HELP {METRIC_PREFIX}{name} {self.help[name]}", f"# TYPE {METRIC_PREFIX}{name} counter", f"{METRIC_PREFIX}{name} {value}"]
+        for name, value in self.gauges.items():
+            out += [f"# HELP {METRIC_PREFIX}{name} {self.help[name]}", f"# TYPE {METRIC_PREFIX}{name} gauge", f"{METRIC_PREFIX}{name} {value}"]
+        for name, histogram in self.histograms.items():
+            metric = METRIC_PREFIX + name
+            out += [f"# HELP {metric} {self.help[name]}", f"# TYPE {metric} histogram"]
+            cumulative = 0
+            for bound, count in zip(BUCKET_BOUNDS_MS, histogram.counts):
+                cumulative += count
+                out.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+            out.append(f'{metric}_bucket{{le="+Inf"}} {histogram.count}')
+            out.append(f"{metric}_sum {histogram.sum}")
+            out.append(f"{metric}_count {histogram.count}")
+        return "\n".join(out) + "\n"
+
+    def json_line(self):
+        """
+        Renders the metrics as one JSON line.
+        """
+        return json.dumps({
+            "time": time.time(),
+            "counters": self.counters,
+            "gauges": self.gauges,
+            "histograms": {
+                name: {"count": h.count, "sum": h.sum, "max": h.max, "p50": h.percentile(0.5), "p99": h.percentile(0.99)}
+                for name, h in self.histograms.items()
+            },
+        }, separators=(",", ":")) + "\n"
+
+    def export(self, path, export_format):
+        """
+        Writes the metrics to 'path': 'prometheus' replaces the file atomically (for a
+        textfile collector), 'jsonl' appends a line.
+        """
+        if export_format == "prometheus":
+            temp_path = path + ".tmp"
+            with open(temp_path, "w") as f:
+                f.write(self.prometheus_text())
+            os.replace(temp_path, path)
+        else:
+            with open(path, "a") as f:
+                f.write(self.json_line())
+
+
+class NullStats:
+    """
+    Stands in for Stats when instrumentation is off.
+    """
+    enabled = False
+
+    def add_metric(self, kind, name, help_text):
+        pass
+
+    def incr(self, name, amount=1):
+        pass
+
+    def set(self, name, value):
+        pass
+
+    def observe(self, name, value_ms):
+        pass
@@ -0,0 +1,99 @@
+'''
+Incremental rendering of the timers listbox.
+'''
+
+import tkinter as tk
+
+from resources import describe_trigger
+
+
+def format_remaining(seconds):
+    """
+    Formats a number of seconds as H:MM:SS, the way str(timedelta) does, without the fraction.
+    """
+    hours, rest = divmod(max(int(seconds), 0), 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02}:{seconds:02}"
+
+
+def timer_row_text(engine, i, timer):
+    """
+    Builds the listbox text of a single timer.
+    """
+    status = "Inactive"
+    time_remaining_str = ""
+    
+    if timer.is_active:
+        is_running = engine.is_process_running(timer.process_name)
+        if is_running:
+            status = "Active"
+            instances = engine.instance_count(timer)
+            if instances > 1:
+                status += f", {instances} instances"
+            if timer.trigger is not None:
+                return f"{i+1}. {timer.process_name} - {timer.message} - {timer.interval_minutes} min. ({status} - on {describe_trigger(timer.trigger)})"
+            
+            # Calculate time remaining until the deadline
+            seconds_to_next = engine.seconds_to_next(timer) or 0
+
+            time_remaining_str = f" - Next: {format_remaining(seconds_to_next)}" # Format as H:MM:SS
+        else:
+            status = "Monitoring..."
+
+    return f"{i+1}. {timer.process_name} - {timer.message} - {timer.interval_minutes} min. ({status}){time_remaining_str}"
+
+
+class TimerListView:
+    """
+    Keeps a Listbox in sync with the timers by rewriting only the rows whose text changed.
+    The rows live in the listbox's -listvariable and are edited in place with lset, so the
+    listbox keeps its selection and scroll position without being told again. Row text is
+    only computed for the rows that are currently visible; the others are brought up to
+    date when they are scrolled into view.
+    """
+    def __init__(self, listbox, row_text):
+        self.listbox = listbox
+        self.row_text = row_text # function(index, timer) -> str
+        self.rows = [] # Text currently shown in each row
+        self.timers = []
+        self.render_pending = False
+
+        self.listvar = tk.StringVar(listbox)
+        self.listbox.config(listvariable=self.listvar, yscrollcommand=self.on_view_changed)
+        self.listbox.bind("<Configure>", self.on_view_changed, add="+")
+
+    def render(self, timers):
+        """
+        Brings the listbox up to date with the given timers.
+        """
+        self.timers = timers
+        # Match the row count first; new rows start empty and are filled in below
+        if len(self.rows) > len(timers):
+            del self.rows[len(timers):]
+            self.listbox.delete(len(timers), tk.END)
+        elif len(self.rows) < len(timers):
+            added = len(timers) - len(self.rows)
+            self.rows.extend([""] * added)
+            self.listbox.insert(tk.END, *([""] * added))
+
+        if not timers:
+            return
+        first = self.listbox.nearest(0)
+        last = self.listbox.nearest(self.listbox.winfo_height())
+        for index in range(first, min(last, len(timers) - 1) + 1):
+            text = self.row_text(index, timers[index])
+            if text != self.rows[index]:
+                self.rows[index] = text
+                self.listbox.tk.call("lset", str(self.listvar), index, text)
+
+    def on_view_changed(self, *args):
+        """
+        Re-renders once the listbox is scrolled or resized, to fill in rows that became visible.
+        """
+        if not self.render_pending:
+            self.render_pending = True
+            self.listbox.after_idle(self.render_after_view_change)
+
+    def render_after_view_change(self):
+        self.render_pending = False
+        self.render(self.timers)